@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+from typing import List, Literal, Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.auth import require_api_key
+from app.core.database import get_async_db
+from app.core.time import naive_local
+from app.crud import usage as usage_crud
+from app.schemas.usage import PersonaUsage
+
+router = APIRouter(
+    dependencies=[Depends(require_api_key)], default_response_class=ORJSONResponse
+)
+
+DEFAULT_RANGE = timedelta(days=7)
+
+
+@router.get("/usage", response_model=List[PersonaUsage])
+async def get_usage(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    granularity: Literal["hour", "day"] = "day",
+    persona_id: Optional[UUID] = Query(None),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Sessions, messages, characters, tokens and response latency per persona
+    and hour or day, read from the usage rollups (`app.jobs.rollups`).
+    Defaults to the last 7 days. The current hour is only complete once the
+    rollup has caught up with it.
+    """
+    until = naive_local(until) or datetime.now()
+    since = naive_local(since) or until - DEFAULT_RANGE
+    if since >= until:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="since must be before until",
+        )
+    return await usage_crud.aget_usage(
+        db, since, until, granularity=granularity, persona_id=persona_id
+    )
@@ -1,12 +1,15 @@
 from app.crud import session as session_crud
 from app.crud import persona as persona_crud
-from fastapi import APIRouter, Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
-from app.core.database import get_db
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_async_db
 from app.schemas.chat import ChatInvoke, ChatInit
 from fastapi.responses import StreamingResponse
-from app.services.chat.agent import conversation
-from app.models import ChatMessage
+from app.services.chat.admission import AdmissionRejected, admission
+from app.services.chat.sse import SSE_HEADERS, sse_event, with_keepalive
+from app.services.chat.turns import ATTACHED, FramesExpired, Turn, turns
+from app.services.chat.writer import message_writer
+from typing import Optional
 from uuid import UUID
 from app.core.security import limiter
 from app.core.config import settings
@@ -16,15 +19,17 @@ router = APIRouter()
 
 @router.get("/init/{persona_id}", response_model=ChatInit)
 @limiter.limit([settings.RATE_LIMIT])
-def chat_init(persona_id: UUID, request: Request, db: Session = Depends(get_db)):
+async def chat_init(
+    persona_id: UUID, request: Request, db: AsyncSession = Depends(get_async_db)
+):
 
-    persona = persona_crud.get(db, persona_id=persona_id)
+    persona = await persona_crud.aget_cached(db, persona_id=persona_id)
     if not persona:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Persona not found"
         )
 
-    session = session_crud.create_session(db, persona_id=persona.id)
+    session = await session_crud.acreate_session(db, persona_id=persona.id)
     if not session:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Session not created"
@@ -33,31 +38,150 @@ def chat_init(persona_id: UUID, request: Request, db: Session = Depends(get_db))
     return ChatInit(session_id=str(session.id))
 
 
+def _event_id(value: Optional[str]) -> int:
+    try:
+        return max(int(value), 0) if value else 0
+    except ValueError:
+        return 0
+
+
+async def _frames(turn: Turn, after: int):
+    try:
+        async for frame in turn.frames(after):
+            yield frame
+    except FramesExpired:
+        yield sse_event(
+            "error", {"message": "Part of the reply is no longer available"}
+        )
+
+
+def _attach(turn: Turn, after: int, kind: str, status_code: int) -> StreamingResponse:
+    if not turn.can_resume(after):
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Part of the reply is no longer available",
+        )
+    ATTACHED.inc(kind=kind)
+    return StreamingResponse(
+        with_keepalive(_frames(turn, after), settings.SSE_KEEPALIVE_INTERVAL),
+        status_code=status_code,
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+
+def _admission_error(exc: AdmissionRejected) -> HTTPException:
+    if exc.reason == "session_busy":
+        return HTTPException(status_code=status.HTTP_409_CONFLICT, detail=exc.detail)
+    # Draining: retry against another worker. Full or timed out: back off.
+    status_code = (
+        status.HTTP_503_SERVICE_UNAVAILABLE
+        if exc.reason == "draining"
+        else status.HTTP_429_TOO_MANY_REQUESTS
+    )
+    return HTTPException(
+        status_code=status_code,
+        detail=exc.detail,
+        headers={"Retry-After": str(int(exc.retry_after or 1))},
+    )
+
+
 @router.post("/stream/{session_id}", status_code=status.HTTP_201_CREATED)
 @limiter.limit([settings.RATE_LIMIT])
-def chat_stream(
-    session_id: str,
+async def chat_stream(
+    session_id: UUID,
     chat_in: ChatInvoke,
     request: Request,
-    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, max_length=128),
+    last_event_id: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db),
 ):
+    """
+    Start a reply and stream it. The reply is generated in the background,
+    independent of this connection; see `GET /stream/{session_id}` to
+    re-attach. Repeating a request with the same `Idempotency-Key` attaches
+    to the turn it started instead of starting another one, or gets a 409
+    if that turn ran in another worker.
+    """
+    row = await session_crud.aget_session_with_persona(db, session_id=session_id)
 
-    session = session_crud.get_session(db, session_id=session_id)
-
-    if not session:
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Session not found"
         )
 
-    persona_id = session.persona_id
+    session, persona = row
     session_id = str(session.id)
 
-    session_crud.save_message(
-        db,
-        ChatMessage(session_id=session_id, role="user", content=chat_in.input_message),
-    )
+    if idempotency_key:
+        turn = turns.find(session_id, idempotency_key)
+        if turn is not None:
+            return _attach(
+                turn,
+                _event_id(last_event_id),
+                "idempotent",
+                status.HTTP_201_CREATED,
+            )
 
-    return StreamingResponse(
-        conversation(persona_id, chat_in.input_message, session_id),
-        media_type="text/event-stream",
+    persona = persona_crud.cache_snapshot(persona)
+    persona_id = persona.id
+
+    try:
+        ticket = await admission.acquire(persona_id, session_id)
+    except AdmissionRejected as exc:
+        raise _admission_error(exc)
+
+    # Loaded by the lifespan, not at import (see app.main)
+    from app.services.chat.agent import conversation
+
+    # Holding the session's ticket, so no other turn of it is starting. The
+    # claim is shared by all workers: a repeat that reached another worker
+    # than the first request is refused instead of generating again.
+    try:
+        if idempotency_key and not await session_crud.aclaim_turn_key(
+            db, session.id, idempotency_key
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="This request was already submitted",
+            )
+        try:
+            await message_writer.save(session.id, "user", chat_in.input_message)
+        except Exception:
+            if idempotency_key:
+                await session_crud.arelease_turn_key(db, session.id, idempotency_key)
+            raise
+    except BaseException:
+        ticket.release()
+        raise
+
+    # The turn owns the ticket and releases it when the reply is finished,
+    # whether or not anyone is still attached.
+    turn = turns.start(
+        session_id,
+        idempotency_key,
+        lambda: conversation(persona, chat_in.input_message, session_id),
+        ticket,
     )
+    return _attach(turn, 0, "new", status.HTTP_201_CREATED)
+
+
+@router.get("/stream/{session_id}")
+@limiter.limit([settings.RATE_LIMIT])
+async def resume_chat_stream(
+    session_id: UUID,
+    request: Request,
+    offset: Optional[int] = Query(None, ge=0, description="Last event id received"),
+    last_event_id: Optional[str] = Header(None),
+):
+    """
+    Re-attach to the session's current or just-finished reply, receiving the
+    events after `Last-Event-ID` (or `offset`) without generating it again.
+    """
+    turn = turns.get(str(session_id))
+    if turn is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="No reply to resume"
+        )
+    after = offset if offset is not None else _event_id(last_event_id)
+    return _attach(turn, after, "resume", status.HTTP_200_OK)
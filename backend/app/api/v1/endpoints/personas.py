@@ -1,7 +1,8 @@
-from typing import List
+from typing import List, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
 
 from app.core.auth import require_api_key
@@ -12,11 +13,27 @@ from app.schemas.persona import (
     PersonaResponse,
     PersonaUpdate,
     PersonaLatestResponse,
+    PersonaListItem,
 )
 from app.core.security import limiter
 from app.core.config import settings
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
+
+
+def _etag(persona: PersonaResponse) -> str:
+    # Weak: the same version may be sent gzipped or not.
+    return f'W/"{persona.id.hex}-{int(persona.updated_at.timestamp() * 1_000_000)}"'
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag.removeprefix("W/") in tags
 
 
 @router.post(
@@ -36,26 +53,87 @@ def create_persona(persona_in: PersonaCreate, db: Session = Depends(get_db)):
 
 
 @router.get(
-    "/", response_model=List[PersonaResponse], dependencies=[Depends(require_api_key)]
+    "/",
+    response_model=List[PersonaListItem],
+    response_model_exclude_unset=True,
+    dependencies=[Depends(require_api_key)],
 )
 def list_personas(
-    skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    skip: Optional[int] = Query(
+        None, ge=0, deprecated=True, description="Use `cursor` instead"
+    ),
+    fields: Optional[str] = Query(
+        None, description="Comma-separated fields to return, e.g. username,bio"
+    ),
     active_only: bool = False,
     db: Session = Depends(get_db),
 ):
-    return persona_crud.get_multi(db, skip=skip, limit=limit, active_only=active_only)
+    """
+    Personas, newest first. Pass the `X-Next-Cursor` response header back as
+    `cursor` to fetch the next page; it is absent on the last page.
+
+    `skip` still pages by OFFSET for older clients, and can't be combined
+    with `cursor`. Its responses carry a `Deprecation` header.
+    """
+    if skip is not None and cursor is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Pass either skip or cursor, not both",
+        )
+    selected = None
+    if fields:
+        selected = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = set(selected) - set(persona_crud.PAGE_FIELDS)
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"Unknown fields: {', '.join(sorted(unknown))}",
+            )
+    try:
+        personas, next_cursor = persona_crud.get_page(
+            db,
+            limit=limit,
+            cursor=cursor,
+            active_only=active_only,
+            fields=selected,
+            offset=skip or 0,
+        )
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+    # The rows are plain dicts of JSON-native values: serialize them directly
+    # instead of validating every item against the response model.
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    if skip is not None:
+        headers["Deprecation"] = "true"
+    return ORJSONResponse(personas, headers=headers)
 
 
 @router.get("/latest", response_model=PersonaLatestResponse)
 @limiter.limit([settings.RATE_LIMIT])
-def get_latest_persona(request: Request, db: Session = Depends(get_db)):
-    persona = persona_crud.get_latest(db)
+def get_latest_persona(
+    request: Request, response: Response, db: Session = Depends(get_db)
+):
+    """
+    The public persona. Cacheable by browsers and proxies for
+    `PERSONA_CACHE_CONTROL`, and revalidated with `If-None-Match`.
+    """
+    persona = persona_crud.get_latest_cached(db)
     if not persona:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Persona not found",
         )
+    headers = {
+        "ETag": _etag(persona),
+        "Cache-Control": settings.PERSONA_CACHE_CONTROL,
+    }
+    if _etag_matches(request, headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
     return persona
 
 
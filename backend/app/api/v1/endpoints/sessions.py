@@ -0,0 +1,146 @@
+from datetime import datetime
+from typing import List, Literal, Optional
+from uuid import UUID
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.auth import require_api_key
+from app.core.database import AsyncSessionLocal, get_async_db
+from app.core.time import naive_local
+from app.crud import persona as persona_crud
+from app.crud import session as session_crud
+from app.schemas.session import ChatMessageResponse, MessageSearchHit, SessionResponse
+
+router = APIRouter(dependencies=[Depends(require_api_key)])
+
+# Rows fetched per round trip by the export cursor, and lines per chunk sent
+EXPORT_BATCH_SIZE = 1000
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_sessions(persona_id: UUID, db: AsyncSession = Depends(get_async_db)):
+    """
+    Stream every session and message of a persona as NDJSON, one line per
+    message (sessions without messages get one line with null fields).
+    """
+    if not await persona_crud.aget(db, persona_id=persona_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Persona not found"
+        )
+
+    async def lines():
+        async with AsyncSessionLocal() as export_db:
+            batch = []
+            async for row in session_crud.astream_persona_export(
+                export_db, persona_id, batch_size=EXPORT_BATCH_SIZE
+            ):
+                batch.append(orjson.dumps(row))
+                if len(batch) >= EXPORT_BATCH_SIZE:
+                    yield b"\n".join(batch) + b"\n"
+                    batch = []
+            if batch:
+                yield b"\n".join(batch) + b"\n"
+
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={
+            "Content-Disposition": f'attachment; filename="sessions-{persona_id}.ndjson"'
+        },
+    )
+
+
+@router.get(
+    "/messages/search",
+    response_model=List[MessageSearchHit],
+    response_model_exclude_none=True,
+)
+async def search_messages(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    mode: Literal["text", "substring"] = "text",
+    persona_id: Optional[UUID] = None,
+    role: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Search chat messages across sessions.
+
+    `mode=text` (default) is a full-text search in web search syntax
+    (`"exact phrase"`, `or`, `-word`), most relevant first. `mode=substring`
+    matches a case-insensitive substring of at least 3 characters, newest
+    first. Pass the `X-Next-Cursor` response header back as `cursor` for the
+    next page.
+    """
+    if mode == "substring" and len(q) < 3:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Substring searches need at least 3 characters",
+        )
+    try:
+        hits, next_cursor = await session_crud.asearch_messages(
+            db,
+            q,
+            substring=mode == "substring",
+            persona_id=persona_id,
+            role=role,
+            since=naive_local(since),
+            until=naive_local(until),
+            limit=limit,
+            cursor=cursor,
+        )
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return hits
+
+
+@router.get("/{session_id}", response_model=SessionResponse)
+async def get_session(session_id: UUID, db: AsyncSession = Depends(get_async_db)):
+    session = await session_crud.aget_session(db, session_id=session_id)
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Session not found"
+        )
+    return session
+
+
+@router.get("/{session_id}/messages", response_model=List[ChatMessageResponse])
+async def get_session_messages(
+    session_id: UUID,
+    response: Response,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    A session's transcript, oldest first. Pass the `X-Next-Cursor` response
+    header back as `cursor` to fetch the next page; it is absent on the last
+    page.
+    """
+    session = await session_crud.aget_session(db, session_id=session_id)
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Session not found"
+        )
+    try:
+        messages, next_cursor = await session_crud.aget_messages_page(
+            db, session_id=session_id, limit=limit, cursor=cursor
+        )
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return messages
@@ -0,0 +1,66 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from app.core import metrics
+from app.core import instrumentation, lifecycle
+from app.core.auth import require_api_key
+from app.core.database import async_engine, engine
+from app.crud import persona as persona_crud
+from app.services.chat.admission import admission
+
+router = APIRouter()
+
+
+def _sqlalchemy_pool_stats(pool) -> dict:
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+    }
+
+
+@router.get("/ready")
+def readiness():
+    """Unauthenticated readiness probe; 503 once the worker starts draining."""
+    if lifecycle.is_draining():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Draining"
+        )
+    return {"status": "ready"}
+
+
+@router.get("/pools", dependencies=[Depends(require_api_key)])
+def pool_stats():
+    from app.memory.checkpointers import get_pool_stats
+
+    return {
+        "checkpointer": get_pool_stats(),
+        "database": _sqlalchemy_pool_stats(engine.pool),
+        "database_async": _sqlalchemy_pool_stats(async_engine.pool),
+        "chat_admission": admission.stats(),
+    }
+
+
+@router.get("/startup", dependencies=[Depends(require_api_key)])
+def startup_timing():
+    return lifecycle.startup_report()
+
+
+@router.get("/caches", dependencies=[Depends(require_api_key)])
+def cache_stats():
+    return {"persona": persona_crud.cache_stats()}
+
+
+@router.get("/metrics", dependencies=[Depends(require_api_key)])
+def metrics_snapshot():
+    return metrics.snapshot()
+
+
+@router.get("/profiles/{profile_id}", dependencies=[Depends(require_api_key)])
+def get_profile(profile_id: str):
+    profile = instrumentation.get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found"
+        )
+    return profile
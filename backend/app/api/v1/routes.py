@@ -1,9 +1,12 @@
 from fastapi import APIRouter, Depends
 
-from app.api.v1.endpoints import personas, chat
+from app.api.v1.endpoints import analytics, personas, chat, sessions, system
 from app.core.auth import require_api_key
 
 api_router = APIRouter()
 
 api_router.include_router(personas.router, prefix="/personas", tags=["personas"])
 api_router.include_router(chat.router, prefix="/chat", tags=["chat"])
+api_router.include_router(sessions.router, prefix="/sessions", tags=["sessions"])
+api_router.include_router(system.router, prefix="/system", tags=["system"])
+api_router.include_router(analytics.router, prefix="/analytics", tags=["analytics"])
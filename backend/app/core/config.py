@@ -1,3 +1,5 @@
+from sqlalchemy.engine import make_url
+
 from .base_config import BaseConfig
 
 
@@ -9,7 +11,132 @@ class Settings(BaseConfig):
     GOOGLE_API_KEY: str
     GEMINI_CHAT_LLM: str = "gemini-2.5-flash"
 
+    # Local fake LLM provider (llm_provider="fake"), for load tests
+    FAKE_LLM_LATENCY_MS: float = 300.0
+    FAKE_LLM_TOKENS_PER_SECOND: float = 50.0
+    FAKE_LLM_RESPONSE_TOKENS: int = 60
+
     RATE_LIMIT: str = "50/minute"
+    # memory:// is per worker; use redis:// or postgresql:// (or any `limits`
+    # storage URI) to share counters when running more than one worker.
+    # Shared storages are checked off the event loop.
+    RATE_LIMIT_STORAGE_URI: str = "memory://"
+
+    # Request instrumentation: slow request log threshold and the sampling
+    # profiler used for requests sent with `X-Profile: 1` and an API key
+    SLOW_REQUEST_SECONDS: float = 10.0
+    PROFILE_INTERVAL_MS: float = 5.0
+    PROFILE_KEEP: int = 20
+
+    # HTTP caching of the public persona (/v1/personas/latest), and gzip for
+    # responses larger than GZIP_MINIMUM_SIZE bytes (event streams excluded)
+    PERSONA_CACHE_CONTROL: str = "public, max-age=60, stale-while-revalidate=300"
+    GZIP_MINIMUM_SIZE: int = 1000
+    GZIP_COMPRESS_LEVEL: int = 6
+
+    # Persona read-through cache (per worker, invalidated via LISTEN/NOTIFY)
+    PERSONA_CACHE_MAXSIZE: int = 256
+    PERSONA_CACHE_TTL: float = 300.0
+
+    # Seconds of silence before a keepalive comment is sent on a chat stream
+    SSE_KEEPALIVE_INTERVAL: float = 15.0
+    # Streamed tokens are merged until this many bytes or milliseconds
+    STREAM_COALESCE_BYTES: int = 64
+    STREAM_COALESCE_MS: float = 40.0
+
+    # Conversation history kept in the checkpoint (0 disables a limit);
+    # overridable per persona via custom_settings.history. Past the turn
+    # limit the newest HISTORY_KEEP_TURNS turns are kept (0 = the limit, i.e.
+    # trim a turn at a time; lower values trim less often)
+    HISTORY_MAX_TURNS: int = 20
+    HISTORY_MAX_TOKENS: int = 0
+    HISTORY_KEEP_TURNS: int = 0
+    HISTORY_SUMMARIZE: bool = False
+
+    # Semantic response cache (enabled per persona via custom_settings)
+    SEMANTIC_CACHE_EMBEDDER: str = "google"  # or "hash" for the offline stub
+    SEMANTIC_CACHE_EMBEDDING_MODEL: str = "models/gemini-embedding-001"
+    SEMANTIC_CACHE_THRESHOLD: float = 0.92
+    # Entries kept per persona version by the retention job (most used first)
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 1000
+
+    # Explicit provider context caching of the system prompt; overridable
+    # per persona via custom_settings.context_cache
+    CONTEXT_CACHE_ENABLED: bool = False
+    CONTEXT_CACHE_TTL: int = 3600
+
+    # Chat admission control (0 disables a stream limit). The stream limits
+    # are per instance and split evenly between its WEB_CONCURRENCY workers;
+    # the queue is per worker. CHAT_SESSION_LOCKS enforces one turn per
+    # session across workers with a Postgres advisory lock.
+    CHAT_MAX_STREAMS: int = 64
+    CHAT_MAX_STREAMS_PER_PERSONA: int = 16
+    CHAT_MAX_WAITING: int = 128
+    CHAT_ADMISSION_TIMEOUT: float = 10.0
+    CHAT_SESSION_LOCKS: bool = True
+
+    # Worker processes per instance (uvicorn reads the same variable)
+    WEB_CONCURRENCY: int = 1
+
+    # Detached chat turns: frames buffered per turn for re-attaching clients,
+    # and how long a finished turn stays available (per worker)
+    CHAT_TURN_BUFFER_FRAMES: int = 2048
+    CHAT_TURN_RETENTION: float = 120.0
+
+    # Build agents for this many of the newest active personas before a
+    # worker starts serving (0 disables the warmup)
+    STARTUP_WARMUP_PERSONAS: int = 0
+
+    # On SIGTERM, how long in-flight chat turns get to finish before they are
+    # cancelled, and then how long partial replies and queued messages get to
+    # be written. Together with the 5s cancel grace they must fit in the
+    # orchestrator's stop grace period (35s in docker-compose.yml).
+    SHUTDOWN_DRAIN_TIMEOUT: float = 20.0
+    SHUTDOWN_WRITE_TIMEOUT: float = 5.0
+
+    # Chat message write-behind queue
+    CHAT_WRITE_BATCH_SIZE: int = 100
+    CHAT_WRITE_FLUSH_INTERVAL: float = 0.2
+    CHAT_WRITE_MAX_QUEUE: int = 10000
+    CHAT_WRITE_STRICT: bool = False
+
+    # Retention job (python -m app.jobs.retention)
+    RETENTION_SESSION_TTL_DAYS: int = 90
+    RETENTION_BATCH_SIZE: int = 500
+    # Threads checkpointed this recently are not pruned
+    RETENTION_GRACE_MINUTES: int = 60
+
+    # Usage rollups (app.jobs.rollups): tried by each API worker every
+    # ROLLUP_INTERVAL_SECONDS (0 disables), one run at a time under an
+    # advisory lock, skipping rows inserted within the settle window
+    ROLLUP_INTERVAL_SECONDS: float = 60.0
+    ROLLUP_SETTLE_SECONDS: float = 60.0
+    ROLLUP_BATCH_SIZE: int = 5000
+
+    # Checkpointer connection pool
+    CHECKPOINTER_POOL_MIN_SIZE: int = 2
+    CHECKPOINTER_POOL_MAX_SIZE: int = 10
+    CHECKPOINTER_POOL_TIMEOUT: float = 30.0
+    CHECKPOINTER_POOL_MAX_IDLE: float = 600.0
+    CHECKPOINTER_POOL_RECONNECT_TIMEOUT: float = 300.0
+
+    @property
+    def async_database_url(self) -> str:
+        """DATABASE_URL rewritten for the asyncpg SQLAlchemy dialect."""
+        return (
+            make_url(self.DATABASE_URL)
+            .set(drivername="postgresql+asyncpg")
+            .render_as_string(hide_password=False)
+        )
+
+    @property
+    def psycopg_database_url(self) -> str:
+        """DATABASE_URL as a plain libpq conninfo for psycopg (checkpointer)."""
+        return (
+            make_url(self.DATABASE_URL)
+            .set(drivername="postgresql")
+            .render_as_string(hide_password=False)
+        )
 
 
 settings = Settings()
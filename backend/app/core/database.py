@@ -1,6 +1,7 @@
-from typing import Generator
+from typing import AsyncGenerator, Generator
 
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
 
 from .config import settings
@@ -18,6 +19,18 @@ SessionLocal = sessionmaker(
     expire_on_commit=False,
 )
 
+async_engine = create_async_engine(
+    settings.async_database_url,
+    pool_pre_ping=True,
+    echo=False,
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
 
 def get_db() -> Generator[Session, None, None]:
     """
@@ -36,3 +49,17 @@ def get_db() -> Generator[Session, None, None]:
         yield session
     finally:
         session.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    FastAPI dependency for async database sessions.
+
+    Used by the async endpoints (chat) so that database I/O never blocks
+    the event loop or pins a threadpool thread.
+
+    Yields:
+        AsyncSession: An async database session that automatically closes.
+    """
+    async with AsyncSessionLocal() as session:
+        yield session
@@ -0,0 +1,223 @@
+"""
+Per-request instrumentation.
+
+Every HTTP request gets a `RequestStats` in a context variable. SQLAlchemy
+event hooks count and time its queries, `span()` times named stages, and
+`InstrumentationMiddleware` reports the totals in a `Server-Timing` header
+and logs requests slower than `SLOW_REQUEST_SECONDS` with a breakdown.
+
+Requests sent with `X-Profile: 1` and a valid API key are also run under a
+sampling profiler; the collapsed stacks are kept in memory and served by
+`/v1/system/profiles/{profile_id}`.
+"""
+
+import logging
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core import metrics
+from app.core.auth import require_api_key
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-profile"
+
+QUERY_TIME = metrics.Histogram(
+    "db_query_seconds",
+    "SQLAlchemy query execution time",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+SPAN_TIME = metrics.Histogram("span_seconds", "Time spent in instrumented stages")
+REQUEST_TIME = metrics.Histogram("http_request_seconds", "HTTP request duration")
+
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    query_time: float = 0.0
+    spans: Dict[str, float] = field(default_factory=dict)
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_stats() -> Optional[RequestStats]:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str):
+    """Time a stage, adding it to the current request and `span_seconds`."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - started)
+
+
+def record_span(name: str, elapsed: float) -> None:
+    SPAN_TIME.observe(elapsed, name=name)
+    stats = _current.get()
+    if stats is not None:
+        stats.spans[name] = stats.spans.get(name, 0.0) + elapsed
+
+
+def instrument_engine(engine: Engine, name: str) -> None:
+    """Count and time every statement run through a (sync) engine."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        QUERY_TIME.observe(elapsed, engine=name)
+        stats = _current.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.query_time += elapsed
+
+
+class SamplingProfiler:
+    """
+    Samples the event loop thread's stack at a fixed interval.
+
+    The loop is shared, so samples cover everything running on it while the
+    profiled request is in flight, not only that request.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> str:
+        """Stop sampling and return the stacks in collapsed (flamegraph) format."""
+        self._stop.set()
+        self._thread.join()
+        return "\n".join(
+            f"{stack} {count}" for stack, count in self.samples.most_common()
+        )
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_filename}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+
+_profile_lock = threading.Lock()
+_profiles: "OrderedDict[str, dict]" = OrderedDict()
+
+
+def get_profile(profile_id: str) -> Optional[dict]:
+    return _profiles.get(profile_id)
+
+
+def _store_profile(profile_id: str, profile: dict) -> None:
+    _profiles[profile_id] = profile
+    while len(_profiles) > settings.PROFILE_KEEP:
+        _profiles.popitem(last=False)
+
+
+def _wants_profile(headers: Dict[str, str]) -> bool:
+    if headers.get(PROFILE_HEADER) != "1":
+        return False
+    try:
+        require_api_key(headers.get("x-api-key"))
+    except HTTPException:
+        return False
+    return True
+
+
+class InstrumentationMiddleware:
+    """Pure ASGI middleware so streamed responses are timed to their end."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        headers = {
+            k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]
+        }
+
+        profiler = None
+        profile_id = None
+        if _wants_profile(headers) and _profile_lock.acquire(blocking=False):
+            profile_id = uuid.uuid4().hex
+            profiler = SamplingProfiler(
+                threading.get_ident(), settings.PROFILE_INTERVAL_MS / 1000
+            )
+            profiler.start()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                timing = (
+                    f'db;dur={stats.query_time * 1000:.1f};desc="{stats.queries} queries", '
+                    f"app;dur={(time.perf_counter() - started) * 1000:.1f}"
+                )
+                extra = [(b"server-timing", timing.encode())]
+                if profile_id is not None:
+                    extra.append((b"x-profile-id", profile_id.encode()))
+                message["headers"] = [*message.get("headers", []), *extra]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            path = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_TIME.observe(elapsed, method=scope["method"], path=path)
+            _current.reset(token)
+
+            if profiler is not None:
+                _store_profile(
+                    profile_id,
+                    {
+                        "path": scope["path"],
+                        "duration_seconds": round(elapsed, 4),
+                        "interval_ms": settings.PROFILE_INTERVAL_MS,
+                        "stacks": profiler.stop(),
+                    },
+                )
+                _profile_lock.release()
+
+            if elapsed >= settings.SLOW_REQUEST_SECONDS:
+                logger.warning(
+                    "Slow request %s %s: %.3fs, %d queries in %.3fs, spans %s",
+                    scope["method"],
+                    scope["path"],
+                    elapsed,
+                    stats.queries,
+                    stats.query_time,
+                    {name: round(value, 4) for name, value in stats.spans.items()},
+                )
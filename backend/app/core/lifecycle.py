@@ -0,0 +1,93 @@
+"""
+Startup timing and drain mode for graceful shutdown.
+
+`startup_phase()` times the stages of the lifespan startup; they are logged,
+exported as `app_startup_seconds` and served by `/v1/system/startup`.
+
+Uvicorn stops listening as soon as it gets SIGTERM and only runs the
+lifespan shutdown once every connection has closed, so there is no point
+at which the app can still answer "not ready" while finishing its work.
+`install_drain_handler` runs first instead: the first SIGTERM/SIGINT marks
+the worker as draining and runs the drain callback, and only then hands the
+signal to uvicorn. A second signal is passed on straight away.
+"""
+
+import asyncio
+import logging
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, Set
+
+from app.core import metrics
+
+logger = logging.getLogger(__name__)
+
+STARTUP_TIME = metrics.Gauge("app_startup_seconds", "Time spent in each startup phase")
+
+_startup: Dict[str, float] = {}
+
+_draining = False
+_tasks: Set[asyncio.Task] = set()
+
+
+@contextmanager
+def startup_phase(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_startup_phase(name, time.perf_counter() - started)
+
+
+def record_startup_phase(name: str, elapsed: float) -> None:
+    _startup[name] = round(elapsed, 4)
+    STARTUP_TIME.set(elapsed, phase=name)
+
+
+def startup_report() -> Dict[str, float]:
+    return dict(_startup)
+
+
+def is_draining() -> bool:
+    return _draining
+
+
+def install_drain_handler(drain: Callable[[], Awaitable[None]]) -> None:
+    # Signal handlers can only be set from the main thread (not e.g. under
+    # a test client's portal thread); shutdown then works as before.
+    if threading.current_thread() is not threading.main_thread():
+        return
+
+    loop = asyncio.get_running_loop()
+
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        previous = signal.getsignal(sig)
+        if not callable(previous):
+            continue
+
+        def handler(signum, frame, previous=previous):
+            global _draining
+            if _draining:
+                previous(signum, frame)
+                return
+            _draining = True
+            logger.info("Received %s, draining", signal.Signals(signum).name)
+            loop.call_soon_threadsafe(_start_drain, drain, previous, signum)
+
+        signal.signal(sig, handler)
+
+
+def _start_drain(drain, previous, signum) -> None:
+    async def run():
+        try:
+            await drain()
+        except Exception:
+            logger.exception("Drain failed")
+        finally:
+            previous(signum, None)
+
+    task = asyncio.create_task(run())
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
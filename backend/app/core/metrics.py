@@ -0,0 +1,140 @@
+"""
+Minimal in-process metrics registry.
+
+Counters, gauges and histograms keyed by label values. Metrics are per
+worker process; `snapshot()` returns everything as plain data.
+"""
+
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry: List["_Metric"] = []
+
+
+def _key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, description: str):
+        super().__init__(name, description)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = _key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[dict]:
+        with self._lock:
+            return [
+                {"labels": dict(key), "value": value}
+                for key, value in self._values.items()
+            ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[_key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, description: str, buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, description)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[LabelKey, dict] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = _key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                self._values[key] = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def samples(self) -> List[dict]:
+        with self._lock:
+            return [
+                {
+                    "labels": dict(key),
+                    "buckets": dict(zip(self.buckets, series["buckets"])),
+                    "sum": series["sum"],
+                    "count": series["count"],
+                }
+                for key, series in self._values.items()
+            ]
+
+
+def _format_labels(labels: Dict[str, object]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in sorted(labels.items())
+    )
+    return "{" + pairs + "}"
+
+
+def render_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.description}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for sample in metric.samples():
+            labels = sample["labels"]
+            if metric.kind != "histogram":
+                lines.append(f"{metric.name}{_format_labels(labels)} {sample['value']}")
+                continue
+            for bound, count in sample["buckets"].items():
+                bucket_labels = _format_labels({**labels, "le": bound})
+                lines.append(f"{metric.name}_bucket{bucket_labels} {count}")
+            inf_labels = _format_labels({**labels, "le": "+Inf"})
+            lines.append(f"{metric.name}_bucket{inf_labels} {sample['count']}")
+            lines.append(f"{metric.name}_sum{_format_labels(labels)} {sample['sum']}")
+            lines.append(
+                f"{metric.name}_count{_format_labels(labels)} {sample['count']}"
+            )
+    return "\n".join(lines) + "\n"
+
+
+def snapshot() -> Dict[str, dict]:
+    return {
+        metric.name: {
+            "type": metric.kind,
+            "description": metric.description,
+            "samples": metric.samples(),
+        }
+        for metric in _registry
+    }
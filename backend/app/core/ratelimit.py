@@ -0,0 +1,92 @@
+import time
+from typing import Optional
+
+from limits.storage import Storage
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError
+
+_INCR = text("""
+    INSERT INTO rate_limit_counters AS c (key, value, expires_at)
+    VALUES (:key, :amount, now() + make_interval(secs => :expiry))
+    ON CONFLICT (key) DO UPDATE SET
+        value = CASE WHEN c.expires_at <= now()
+                     THEN EXCLUDED.value ELSE c.value + EXCLUDED.value END,
+        expires_at = CASE WHEN c.expires_at <= now()
+                          THEN EXCLUDED.expires_at ELSE c.expires_at END
+    RETURNING value
+    """)
+
+_GET = text(
+    "SELECT value, extract(epoch FROM expires_at) AS expires_at "
+    "FROM rate_limit_counters WHERE key = :key AND expires_at > now()"
+)
+
+_CLEAR = text("DELETE FROM rate_limit_counters WHERE key = :key")
+
+_RESET = text("DELETE FROM rate_limit_counters")
+
+
+class PostgresStorage(Storage):
+    """
+    Fixed-window rate limit counters kept in Postgres.
+
+    Lets every worker process enforce one shared `RATE_LIMIT` instead of each
+    keeping its own in-memory counters. Use `postgresql://` to share the
+    application's engine, or a full URL to point at another database.
+    """
+
+    STORAGE_SCHEME = ["postgresql"]
+
+    def __init__(self, uri: Optional[str] = None, wrap_exceptions: bool = False, **_):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions)
+        self._uri = uri
+        self._engine: Optional[Engine] = None
+
+    @property
+    def base_exceptions(self):
+        return SQLAlchemyError
+
+    @property
+    def engine(self) -> Engine:
+        # Resolved lazily so the limiter can be built at import time
+        if self._engine is None:
+            if self._uri is None or not make_url(self._uri).host:
+                from app.core.database import engine
+
+                self._engine = engine
+            else:
+                self._engine = create_engine(self._uri, pool_pre_ping=True)
+        return self._engine
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        with self.engine.begin() as conn:
+            params = {"key": key, "amount": amount, "expiry": expiry}
+            return conn.execute(_INCR, params).scalar_one()
+
+    def get(self, key: str) -> int:
+        with self.engine.connect() as conn:
+            row = conn.execute(_GET, {"key": key}).first()
+        return row.value if row else 0
+
+    def get_expiry(self, key: str) -> float:
+        with self.engine.connect() as conn:
+            row = conn.execute(_GET, {"key": key}).first()
+        return float(row.expires_at) if row else time.time()
+
+    def check(self) -> bool:
+        try:
+            with self.engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            return True
+        except SQLAlchemyError:
+            return False
+
+    def reset(self) -> Optional[int]:
+        with self.engine.begin() as conn:
+            return conn.execute(_RESET).rowcount
+
+    def clear(self, key: str) -> None:
+        with self.engine.begin() as conn:
+            conn.execute(_CLEAR, {"key": key})
@@ -1,8 +1,21 @@
-from fastapi import Request
+import asyncio
+import functools
+import logging
+import time
+from typing import List, Optional
+
+from fastapi import HTTPException, Request, status
+from limits import RateLimitItem, parse_many
+from limits.errors import StorageError
+from limits.storage import MemoryStorage, storage_from_string
+from limits.strategies import FixedWindowRateLimiter
 from slowapi import Limiter
 
 from slowapi.util import get_remote_address
 from app.core.config import settings
+from app.core import ratelimit  # noqa: F401 registers the postgresql:// storage
+
+logger = logging.getLogger(__name__)
 
 
 def get_real_ip(request: Request):
@@ -14,4 +27,73 @@ def get_real_ip(request: Request):
         return get_remote_address(request)
 
 
-limiter = Limiter(key_func=get_real_ip, default_limits=[settings.RATE_LIMIT])
+class OffloopLimiter(Limiter):
+    """
+    slowapi checks limits synchronously, also for async endpoints. With a
+    shared storage (postgresql://, redis://, ...) that is a network round
+    trip on the event loop, so for async endpoints the limits are checked
+    here instead, in a thread, with the `limits` strategy slowapi uses by
+    default (fixed window) over the same storage URI. Counters are kept per
+    client and endpoint, and fall back to memory while the storage is down.
+    In-memory counters and sync endpoints are left to slowapi.
+    """
+
+    def __init__(self, key_func, *args, storage_uri: str = "memory://", **kwargs):
+        super().__init__(key_func, *args, storage_uri=storage_uri, **kwargs)
+        self._offloop_key = key_func
+        self._offloop: Optional[FixedWindowRateLimiter] = None
+        if not storage_uri.startswith("memory://"):
+            self._offloop = FixedWindowRateLimiter(
+                storage_from_string(storage_uri, wrap_exceptions=True)
+            )
+            self._offloop_fallback = FixedWindowRateLimiter(MemoryStorage())
+
+    def limit(self, limit_value, *args, **kwargs):
+        decorate = super().limit(limit_value, *args, **kwargs)
+        if self._offloop is None or callable(limit_value):
+            return decorate
+        values = [limit_value] if isinstance(limit_value, str) else limit_value
+        items = [item for value in values for item in parse_many(value)]
+
+        def decorator(func):
+            if not asyncio.iscoroutinefunction(func):
+                return decorate(func)
+            scope = f"{func.__module__}.{func.__name__}"
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                request = kwargs.get("request")
+                if self.enabled and isinstance(request, Request):
+                    key = self._offloop_key(request)
+                    await asyncio.to_thread(self._hit, items, key, scope)
+                return await func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def _hit(self, items: List[RateLimitItem], key: str, scope: str) -> None:
+        try:
+            self._check(self._offloop, items, key, scope)
+        except StorageError:
+            logger.warning("Rate limit storage unavailable, using memory")
+            self._check(self._offloop_fallback, items, key, scope)
+
+    @staticmethod
+    def _check(strategy, items, key: str, scope: str) -> None:
+        for item in items:
+            if not strategy.hit(item, key, scope):
+                reset = strategy.get_window_stats(item, key, scope).reset_time
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail=f"Rate limit exceeded: {item}",
+                    headers={"Retry-After": str(max(int(reset - time.time()), 1))},
+                )
+
+
+limiter = OffloopLimiter(
+    key_func=get_real_ip,
+    default_limits=[settings.RATE_LIMIT],
+    storage_uri=settings.RATE_LIMIT_STORAGE_URI,
+    in_memory_fallback_enabled=True,
+)
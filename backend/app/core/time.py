@@ -0,0 +1,12 @@
+from datetime import datetime
+from typing import Optional
+
+
+def naive_local(value: Optional[datetime]) -> Optional[datetime]:
+    """
+    `value` as naive local time, the way message, session and rollup
+    timestamps are stored. Naive values (and None) are returned as they are.
+    """
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone().replace(tzinfo=None)
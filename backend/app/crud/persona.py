@@ -1,17 +1,126 @@
-from typing import List, Optional
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
 from uuid import UUID
 
+from cachetools import TTLCache
+from psycopg import AsyncConnection
+from sqlalchemy import select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
+from app.crud.pagination import decode_cursor, encode_cursor
 from app.models.persona import Persona
-from app.schemas.persona import PersonaCreate, PersonaUpdate
+from app.schemas.persona import PersonaCreate, PersonaResponse, PersonaUpdate
+
+logger = logging.getLogger(__name__)
+
+# Postgres channel used to tell every worker that a persona changed.
+INVALIDATION_CHANNEL = "persona_changed"
+
+_LATEST = "latest"
+
+# Columns a persona listing may select
+PAGE_FIELDS = tuple(PersonaResponse.model_fields)
+
+# Read-through cache of immutable persona snapshots, keyed by persona id
+# (plus a single entry for the latest active persona). The TTL bounds
+# staleness if a notification is ever missed.
+_cache = TTLCache(
+    maxsize=settings.PERSONA_CACHE_MAXSIZE, ttl=settings.PERSONA_CACHE_TTL
+)
+_cache_lock = threading.Lock()
+_stats: Dict[str, int] = {"hits": 0, "misses": 0, "invalidations": 0}
+_invalidation_hooks: List[Callable[[Optional[UUID]], None]] = []
+
+
+def register_invalidation_hook(hook: Callable[[Optional[UUID]], None]) -> None:
+    """Run `hook(persona_id)` whenever a persona is invalidated (None = all)."""
+    _invalidation_hooks.append(hook)
+
+
+def invalidate(persona_id: Optional[UUID] = None) -> None:
+    with _cache_lock:
+        if persona_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(persona_id, None)
+            _cache.pop(_LATEST, None)
+        _stats["invalidations"] += 1
+    for hook in _invalidation_hooks:
+        hook(persona_id)
+
+
+def cache_stats() -> dict:
+    with _cache_lock:
+        return {
+            **_stats,
+            "size": len(_cache),
+            "maxsize": _cache.maxsize,
+            "ttl": _cache.ttl,
+        }
+
+
+def _cache_get(key):
+    with _cache_lock:
+        snapshot = _cache.get(key)
+        _stats["hits" if snapshot is not None else "misses"] += 1
+    return snapshot
+
+
+def _cache_put(key, persona: Optional[Persona]) -> Optional[PersonaResponse]:
+    if persona is None:
+        return None
+    snapshot = PersonaResponse.model_validate(persona)
+    with _cache_lock:
+        _cache[key] = snapshot
+    return snapshot
+
+
+def _notify(db: Session, persona_id: UUID) -> None:
+    """Queue a NOTIFY for other workers; Postgres delivers it on commit."""
+    db.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": INVALIDATION_CHANNEL, "payload": str(persona_id)},
+    )
+
+
+async def listen_for_invalidations() -> None:
+    """
+    Apply persona invalidations published by any worker.
+
+    Runs for the lifetime of the app (started in the lifespan). The whole
+    cache is dropped after every (re)connect because notifications sent
+    while disconnected are lost.
+    """
+    while True:
+        try:
+            conn = await AsyncConnection.connect(
+                settings.psycopg_database_url, autocommit=True
+            )
+            async with conn:
+                await conn.execute(f"LISTEN {INVALIDATION_CHANNEL}")
+                invalidate()
+                async for notify in conn.notifies():
+                    invalidate(UUID(notify.payload))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Persona invalidation listener failed, reconnecting")
+            await asyncio.sleep(5)
 
 
 def create(db: Session, obj_in: PersonaCreate) -> Persona:
     db_obj = Persona(**obj_in.model_dump())
     db.add(db_obj)
+    db.flush()
+    _notify(db, db_obj.id)
     db.commit()
     db.refresh(db_obj)
+    invalidate(db_obj.id)
     return db_obj
 
 
@@ -19,27 +128,91 @@ def get(db: Session, persona_id: UUID) -> Optional[Persona]:
     return db.query(Persona).filter(Persona.id == persona_id).first()
 
 
+async def aget(db: AsyncSession, persona_id: UUID) -> Optional[Persona]:
+    result = await db.execute(select(Persona).where(Persona.id == persona_id))
+    return result.scalars().first()
+
+
+async def aget_active(db: AsyncSession, limit: int) -> List[Persona]:
+    """The newest active personas."""
+    result = await db.execute(
+        select(Persona)
+        .where(Persona.is_active == True)
+        .order_by(Persona.created_at.desc(), Persona.id.desc())
+        .limit(limit)
+    )
+    return list(result.scalars())
+
+
+def cache_snapshot(persona: Persona) -> PersonaResponse:
+    """Snapshot a persona loaded elsewhere (e.g. joined) and cache it."""
+    return _cache_put(persona.id, persona)
+
+
+async def aget_cached(db: AsyncSession, persona_id: UUID) -> Optional[PersonaResponse]:
+    """Read-only persona snapshot, served from the cache when possible."""
+    snapshot = _cache_get(persona_id)
+    if snapshot is None:
+        snapshot = _cache_put(persona_id, await aget(db, persona_id))
+    return snapshot
+
+
 def get_latest(db: Session) -> Optional[Session]:
     return (
         db.query(Persona)
         .filter(Persona.is_active == True)
-        .order_by(Persona.created_at.desc())
+        .order_by(Persona.created_at.desc(), Persona.id.desc())
         .limit(1)
         .first()
     )
 
 
+def get_latest_cached(db: Session) -> Optional[PersonaResponse]:
+    snapshot = _cache_get(_LATEST)
+    if snapshot is None:
+        snapshot = _cache_put(_LATEST, get_latest(db))
+    return snapshot
+
+
 def get_by_username(db: Session, username: str) -> Optional[Persona]:
     return db.query(Persona).filter(Persona.username == username).first()
 
 
-def get_multi(
-    db: Session, skip: int = 0, limit: int = 100, active_only: bool = False
-) -> List[Persona]:
-    query = db.query(Persona)
+def get_page(
+    db: Session,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    active_only: bool = False,
+    fields: Optional[Sequence[str]] = None,
+    offset: int = 0,
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    One page of personas, newest first, by keyset on (created_at, id).
+
+    `fields` limits the selected columns (id and created_at are always
+    included as they form the cursor). `offset` skips rows in the same order,
+    for the deprecated `skip` parameter only. Returns the rows as dicts and
+    the cursor for the next page, or None on the last page. Raises
+    ValueError for a malformed cursor.
+    """
+    names = list(dict.fromkeys(["id", "created_at", *(fields or PAGE_FIELDS)]))
+    query = select(*(getattr(Persona, name) for name in names))
     if active_only:
-        query = query.filter(Persona.is_active == True)
-    return query.offset(skip).limit(limit).all()
+        query = query.where(Persona.is_active == True)
+    if cursor is not None:
+        created_at, persona_id = decode_cursor(cursor, 2)
+        key = (datetime.fromisoformat(created_at), UUID(persona_id))
+        query = query.where(tuple_(Persona.created_at, Persona.id) < key)
+    query = query.order_by(Persona.created_at.desc(), Persona.id.desc())
+    if offset:
+        query = query.offset(offset)
+
+    rows = [dict(row._mapping) for row in db.execute(query.limit(limit + 1))]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+    return rows, next_cursor
 
 
 def update(db: Session, db_obj: Persona, obj_in: PersonaUpdate) -> Persona:
@@ -47,8 +220,10 @@ def update(db: Session, db_obj: Persona, obj_in: PersonaUpdate) -> Persona:
     for field, value in update_data.items():
         setattr(db_obj, field, value)
     db.add(db_obj)
+    _notify(db, db_obj.id)
     db.commit()
     db.refresh(db_obj)
+    invalidate(db_obj.id)
     return db_obj
 
 
@@ -56,5 +231,7 @@ def delete(db: Session, persona_id: UUID) -> Optional[Persona]:
     db_obj = get(db, persona_id)
     if db_obj:
         db.delete(db_obj)
+        _notify(db, persona_id)
         db.commit()
+        invalidate(persona_id)
     return db_obj
@@ -0,0 +1,133 @@
+from datetime import datetime
+from typing import List, Optional
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+# Vectors are bound as text and cast server-side, so no driver codec for the
+# pgvector type has to be registered on the connection.
+#
+# The search is exact over the persona version's own entries, found by the
+# (persona_id, persona_version) index. MATERIALIZED keeps the planner from
+# filtering the nearest neighbours of every persona instead, which misses
+# matches once other personas dominate the table; the retention job caps
+# the entries per persona so the scan stays small.
+_CANDIDATES = """
+    WITH candidates AS MATERIALIZED (
+        SELECT id, embedding <=> CAST(CAST(:embedding AS TEXT) AS vector) AS distance
+        FROM semantic_cache_entries
+        WHERE persona_id = :persona_id AND persona_version = :persona_version
+    )
+"""
+
+_LOOKUP = text(f"""
+    {_CANDIDATES}
+    UPDATE semantic_cache_entries SET hits = hits + 1
+    WHERE id = (
+        SELECT id FROM candidates
+        WHERE distance <= :max_distance
+        ORDER BY distance
+        LIMIT 1
+    )
+    RETURNING answer
+    """)
+
+# Skipped when an entry within `max_distance` exists already, e.g. stored by
+# a concurrent turn that missed on the same question.
+_STORE = text(f"""
+    {_CANDIDATES}
+    INSERT INTO semantic_cache_entries
+        (persona_id, persona_version, question, answer, embedding, hits)
+    SELECT :persona_id, :persona_version, :question, :answer,
+           CAST(CAST(:embedding AS TEXT) AS vector), 0
+    WHERE NOT EXISTS (SELECT 1 FROM candidates WHERE distance <= :max_distance)
+    """)
+
+_DELETE_STALE = text("""
+    DELETE FROM semantic_cache_entries e
+    USING personas p
+    WHERE e.persona_id = p.id AND e.persona_version <> p.updated_at
+    """)
+
+# Keeps the most used, then the newest, entries of every persona version
+_TRIM = text("""
+    DELETE FROM semantic_cache_entries e
+    USING (
+        SELECT id, row_number() OVER (
+            PARTITION BY persona_id, persona_version
+            ORDER BY hits DESC, created_at DESC, id DESC
+        ) AS rank
+        FROM semantic_cache_entries
+    ) ranked
+    WHERE e.id = ranked.id AND ranked.rank > :max_entries
+    """)
+
+
+def _vector(embedding: List[float]) -> str:
+    return "[" + ",".join(f"{value:.7g}" for value in embedding) + "]"
+
+
+async def alookup(
+    db: AsyncSession,
+    persona_id: UUID,
+    persona_version: datetime,
+    embedding: List[float],
+    max_distance: float,
+) -> Optional[str]:
+    """Answer of the nearest entry within `max_distance` (cosine), if any."""
+    result = await db.execute(
+        _LOOKUP,
+        {
+            "persona_id": persona_id,
+            "persona_version": persona_version,
+            "embedding": _vector(embedding),
+            "max_distance": max_distance,
+        },
+    )
+    answer = result.scalar()
+    await db.commit()
+    return answer
+
+
+async def astore(
+    db: AsyncSession,
+    persona_id: UUID,
+    persona_version: datetime,
+    question: str,
+    answer: str,
+    embedding: List[float],
+    max_distance: float,
+) -> bool:
+    """
+    Store an answer unless an entry within `max_distance` exists already.
+    Returns whether it was stored.
+    """
+    result = await db.execute(
+        _STORE,
+        {
+            "persona_id": persona_id,
+            "persona_version": persona_version,
+            "question": question,
+            "answer": answer,
+            "embedding": _vector(embedding),
+            "max_distance": max_distance,
+        },
+    )
+    await db.commit()
+    return result.rowcount > 0
+
+
+def delete_stale(db: Session) -> int:
+    """Delete entries recorded against an older version of their persona."""
+    deleted = db.execute(_DELETE_STALE).rowcount
+    db.commit()
+    return deleted
+
+
+def trim(db: Session, max_entries: int) -> int:
+    """Delete all but `max_entries` entries of every persona version."""
+    deleted = db.execute(_TRIM, {"max_entries": max_entries}).rowcount
+    db.commit()
+    return deleted
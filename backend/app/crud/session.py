@@ -1,4 +1,18 @@
-from app.models.session import Session as SessionModel, ChatMessage
+import uuid
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
+
+from app.crud.pagination import decode_cursor, encode_cursor
+from app.models.persona import Persona
+from app.models.session import (
+    SEARCH_CONFIG,
+    Session as SessionModel,
+    ChatMessage,
+    ChatTurnKey,
+)
+from sqlalchemy import delete, func, literal_column, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 
@@ -17,3 +31,191 @@ def create_session(db: Session, persona_id: str) -> SessionModel:
 def save_message(db: Session, message: ChatMessage) -> None:
     db.add(message)
     db.commit()
+
+
+async def aget_session(db: AsyncSession, session_id) -> Optional[SessionModel]:
+    result = await db.execute(select(SessionModel).where(SessionModel.id == session_id))
+    return result.scalars().first()
+
+
+async def aget_session_with_persona(
+    db: AsyncSession, session_id
+) -> Optional[Tuple[SessionModel, Persona]]:
+    """A session and its persona in a single joined query."""
+    result = await db.execute(
+        select(SessionModel, Persona)
+        .join(Persona, Persona.id == SessionModel.persona_id)
+        .where(SessionModel.id == session_id)
+    )
+    return result.first()
+
+
+async def acreate_session(db: AsyncSession, persona_id) -> SessionModel:
+    # Keys and timestamps are set here rather than by defaults so the row is
+    # complete without a refresh SELECT after the commit.
+    new_session = SessionModel(
+        id=uuid.uuid4(), persona_id=persona_id, created_at=datetime.now()
+    )
+    db.add(new_session)
+    await db.commit()
+    return new_session
+
+
+async def aclaim_turn_key(db: AsyncSession, session_id, key: str) -> bool:
+    """
+    Claim an Idempotency-Key for a new turn of the session. False if it was
+    already claimed, by this worker or another one.
+    """
+    result = await db.execute(
+        insert(ChatTurnKey)
+        .values(session_id=session_id, key=key)
+        .on_conflict_do_nothing()
+        .returning(ChatTurnKey.key)
+    )
+    claimed = result.first() is not None
+    await db.commit()
+    return claimed
+
+
+async def arelease_turn_key(db: AsyncSession, session_id, key: str) -> None:
+    """Give back a key whose turn never started."""
+    await db.execute(
+        delete(ChatTurnKey).where(
+            ChatTurnKey.session_id == session_id, ChatTurnKey.key == key
+        )
+    )
+    await db.commit()
+
+
+async def aget_messages_page(
+    db: AsyncSession, session_id, limit: int = 100, cursor: Optional[str] = None
+) -> Tuple[List[ChatMessage], Optional[str]]:
+    """
+    One page of a session's transcript in chronological order, by keyset on
+    (timestamp, id). Returns the messages and the cursor for the next page,
+    or None on the last page. Raises ValueError for a malformed cursor.
+    """
+    query = select(ChatMessage).where(ChatMessage.session_id == session_id)
+    if cursor is not None:
+        timestamp, message_id = decode_cursor(cursor, 2)
+        key = (datetime.fromisoformat(timestamp), int(message_id))
+        query = query.where(tuple_(ChatMessage.timestamp, ChatMessage.id) > key)
+    query = query.order_by(ChatMessage.timestamp, ChatMessage.id).limit(limit + 1)
+
+    messages = list((await db.execute(query)).scalars())
+    next_cursor = None
+    if len(messages) > limit:
+        messages = messages[:limit]
+        next_cursor = encode_cursor(messages[-1].timestamp, messages[-1].id)
+    return messages, next_cursor
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+async def asearch_messages(
+    db: AsyncSession,
+    query: str,
+    substring: bool = False,
+    persona_id=None,
+    role: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Messages matching `query`, with the persona of their session.
+
+    By default `query` is a full-text search (web search syntax, e.g.
+    `"exact phrase" -word`) over the GIN-indexed `search_vector`, ranked by
+    relevance with a keyset on (rank, id). With `substring=True` it matches
+    the content case-insensitively through the trigram index, newest first
+    with a keyset on (timestamp, id). Returns the rows and the cursor for the
+    next page, or None on the last page. Raises ValueError for a malformed
+    cursor.
+    """
+    stmt = select(
+        ChatMessage.id,
+        ChatMessage.session_id,
+        SessionModel.persona_id,
+        ChatMessage.role,
+        ChatMessage.content,
+        ChatMessage.timestamp,
+    ).join(SessionModel, SessionModel.id == ChatMessage.session_id)
+    if persona_id is not None:
+        stmt = stmt.where(SessionModel.persona_id == persona_id)
+    if role is not None:
+        stmt = stmt.where(ChatMessage.role == role)
+    if since is not None:
+        stmt = stmt.where(ChatMessage.timestamp >= since)
+    if until is not None:
+        stmt = stmt.where(ChatMessage.timestamp < until)
+
+    if substring:
+        stmt = stmt.where(
+            ChatMessage.content.ilike(f"%{_escape_like(query)}%", escape="\\")
+        )
+        sort = (ChatMessage.timestamp, ChatMessage.id)
+        if cursor is not None:
+            timestamp, message_id = decode_cursor(cursor, 2)
+            key = (datetime.fromisoformat(timestamp), int(message_id))
+            stmt = stmt.where(tuple_(*sort) < key)
+    else:
+        tsquery = func.websearch_to_tsquery(
+            literal_column(f"'{SEARCH_CONFIG}'::regconfig"), query
+        )
+        rank = func.ts_rank(ChatMessage.search_vector, tsquery)
+        stmt = stmt.add_columns(rank.label("rank")).where(
+            ChatMessage.search_vector.bool_op("@@")(tsquery)
+        )
+        sort = (rank, ChatMessage.id)
+        if cursor is not None:
+            value, message_id = decode_cursor(cursor, 2)
+            stmt = stmt.where(tuple_(*sort) < (float(value), int(message_id)))
+    stmt = stmt.order_by(*(column.desc() for column in sort)).limit(limit + 1)
+
+    rows = [dict(row) for row in (await db.execute(stmt)).mappings()]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(
+            last["timestamp"] if substring else last["rank"], last["id"]
+        )
+    return rows, next_cursor
+
+
+async def astream_persona_export(
+    db: AsyncSession, persona_id, batch_size: int = 1000
+) -> AsyncIterator[dict]:
+    """
+    Every session of a persona with its messages, one row per message
+    (sessions without messages yield a single row with null message fields).
+
+    Rows are read through a server-side cursor `batch_size` at a time, so
+    memory stays flat however large the export is.
+    """
+    query = (
+        select(
+            SessionModel.id.label("session_id"),
+            SessionModel.persona_id,
+            SessionModel.created_at,
+            ChatMessage.role,
+            ChatMessage.content,
+            ChatMessage.timestamp,
+        )
+        .outerjoin(ChatMessage, ChatMessage.session_id == SessionModel.id)
+        .where(SessionModel.persona_id == persona_id)
+        .order_by(
+            SessionModel.created_at,
+            SessionModel.id,
+            ChatMessage.timestamp,
+            ChatMessage.id,
+        )
+        .execution_options(yield_per=batch_size)
+    )
+    result = await db.stream(query)
+    async for row in result.mappings():
+        yield dict(row)
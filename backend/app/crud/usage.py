@@ -0,0 +1,277 @@
+from collections import Counter
+from datetime import datetime
+from typing import List, Optional
+from uuid import UUID
+
+from sqlalchemy import Integer, func, literal_column, select, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.usage import LATENCY_BUCKETS_MS, PersonaUsageHourly
+
+STATE = "persona_usage"
+
+PERCENTILES = (50, 90, 99)
+
+GRANULARITIES = ("hour", "day")
+
+_COUNTERS = (
+    "sessions",
+    "user_messages",
+    "assistant_messages",
+    "user_chars",
+    "assistant_chars",
+    "input_tokens",
+    "output_tokens",
+    "latency_ms_sum",
+    "latency_count",
+)
+
+
+def _bucket_counts() -> str:
+    bounds = (0,) + LATENCY_BUCKETS_MS
+    counts = [
+        f"count(m.latency_ms) FILTER (WHERE m.latency_ms > {low}"
+        f" AND m.latency_ms <= {high})"
+        for low, high in zip(bounds, bounds[1:])
+    ]
+    counts.append(f"count(m.latency_ms) FILTER (WHERE m.latency_ms > {bounds[-1]})")
+    return "ARRAY[" + ",\n               ".join(counts) + "]::integer[]"
+
+
+_LOCK_STATE = text("""
+    SELECT last_message_id, sessions_until FROM usage_rollup_state
+    WHERE name = :name
+    FOR UPDATE
+    """)
+
+_CREATE_STATE = text("""
+    INSERT INTO usage_rollup_state (name) VALUES (:name)
+    ON CONFLICT (name) DO NOTHING
+    """)
+
+# Ids are assigned before commit, so a lower id can become visible after a
+# higher one. Only messages inserted more than `settle` seconds ago (and
+# below the first newer one) are taken, which gives concurrent writers time
+# to commit. Insert time, not `timestamp`: messages can sit in the
+# write-behind queue for longer than the settle window.
+_NEXT_MESSAGES_UPTO = text("""
+    SELECT max(id), count(*) FROM (
+        SELECT id FROM chat_messages
+        WHERE id > :after
+          AND id < coalesce(
+            (SELECT id FROM chat_messages
+             WHERE id > :after
+               AND inserted_at >= now() - make_interval(secs => :settle)
+             ORDER BY id LIMIT 1),
+            9223372036854775807
+          )
+        ORDER BY id
+        LIMIT :limit
+    ) batch
+    """)
+
+_ROLL_UP_MESSAGES = text(f"""
+    INSERT INTO persona_usage_hourly AS u (
+        persona_id, hour, user_messages, assistant_messages,
+        user_chars, assistant_chars, input_tokens, output_tokens,
+        latency_ms_sum, latency_count, latency_buckets
+    )
+    SELECT s.persona_id,
+           date_trunc('hour', m.timestamp),
+           count(*) FILTER (WHERE m.role = 'user'),
+           count(*) FILTER (WHERE m.role = 'assistant'),
+           coalesce(sum(char_length(m.content)) FILTER (WHERE m.role = 'user'), 0),
+           coalesce(
+             sum(char_length(m.content)) FILTER (WHERE m.role = 'assistant'), 0
+           ),
+           coalesce(sum(m.input_tokens), 0),
+           coalesce(sum(m.output_tokens), 0),
+           coalesce(sum(m.latency_ms), 0),
+           count(m.latency_ms),
+           {_bucket_counts()}
+    FROM chat_messages m
+    JOIN sessions s ON s.id = m.session_id
+    WHERE m.id > :after AND m.id <= :upto AND m.timestamp IS NOT NULL
+    GROUP BY 1, 2
+    ON CONFLICT (persona_id, hour) DO UPDATE SET
+        user_messages = u.user_messages + excluded.user_messages,
+        assistant_messages = u.assistant_messages + excluded.assistant_messages,
+        user_chars = u.user_chars + excluded.user_chars,
+        assistant_chars = u.assistant_chars + excluded.assistant_chars,
+        input_tokens = u.input_tokens + excluded.input_tokens,
+        output_tokens = u.output_tokens + excluded.output_tokens,
+        latency_ms_sum = u.latency_ms_sum + excluded.latency_ms_sum,
+        latency_count = u.latency_count + excluded.latency_count,
+        latency_buckets = (
+            SELECT array_agg(a + b ORDER BY i)
+            FROM unnest(u.latency_buckets, excluded.latency_buckets)
+                WITH ORDINALITY AS t(a, b, i)
+        )
+    """)
+
+_ROLL_UP_SESSIONS = text("""
+    INSERT INTO persona_usage_hourly AS u (persona_id, hour, sessions)
+    SELECT persona_id, date_trunc('hour', created_at), count(*)
+    FROM sessions
+    WHERE created_at >= :since AND created_at < :until
+    GROUP BY 1, 2
+    ON CONFLICT (persona_id, hour) DO UPDATE SET
+        sessions = u.sessions + excluded.sessions
+    """)
+
+_UPDATE_STATE = text("""
+    UPDATE usage_rollup_state
+    SET last_message_id = :last_message_id, sessions_until = :sessions_until
+    WHERE name = :name
+    """)
+
+_RESET = (
+    text("DELETE FROM persona_usage_hourly"),
+    text("DELETE FROM usage_rollup_state WHERE name = :name"),
+)
+
+
+def _lock_state(conn: Connection):
+    state = conn.execute(_LOCK_STATE, {"name": STATE}).one_or_none()
+    if state is None:
+        conn.execute(_CREATE_STATE, {"name": STATE})
+        state = conn.execute(_LOCK_STATE, {"name": STATE}).one()
+    return state
+
+
+def roll_up_sessions(conn: Connection, cutoff: datetime) -> int:
+    """
+    Count sessions created since the last run and before `cutoff` into their
+    hours. Runs in the caller's transaction; returns the hours touched.
+    """
+    state = _lock_state(conn)
+    since = state.sessions_until or datetime.min
+    if since >= cutoff:
+        return 0
+    result = conn.execute(_ROLL_UP_SESSIONS, {"since": since, "until": cutoff})
+    conn.execute(
+        _UPDATE_STATE,
+        {
+            "name": STATE,
+            "last_message_id": state.last_message_id,
+            "sessions_until": cutoff,
+        },
+    )
+    return result.rowcount
+
+
+def roll_up_messages(conn: Connection, settle: float, batch_size: int) -> int:
+    """
+    Add the next batch of at most `batch_size` messages inserted more than
+    `settle` seconds ago to the rollups. Runs in the caller's transaction;
+    returns the messages read, 0 once there is nothing left to read.
+    """
+    state = _lock_state(conn)
+    after = state.last_message_id
+    upto, count = conn.execute(
+        _NEXT_MESSAGES_UPTO, {"after": after, "settle": settle, "limit": batch_size}
+    ).one()
+    if upto is None:
+        return 0
+    conn.execute(_ROLL_UP_MESSAGES, {"after": after, "upto": upto})
+    conn.execute(
+        _UPDATE_STATE,
+        {
+            "name": STATE,
+            "last_message_id": upto,
+            "sessions_until": state.sessions_until,
+        },
+    )
+    return count
+
+
+def reset(conn: Connection) -> None:
+    """Drop all rollups and watermarks, so the next run starts from scratch."""
+    for statement in _RESET:
+        conn.execute(statement, {"name": STATE})
+
+
+def _percentiles(buckets: List[int]) -> dict:
+    """
+    Percentiles as the upper bound of the bucket they fall in; for the
+    overflow bucket that is None (slower than the last bound).
+    """
+    total = sum(buckets)
+    result = {}
+    for p in PERCENTILES:
+        value = None
+        if total:
+            rank, seen = total * p / 100, 0
+            for i, count in enumerate(buckets):
+                seen += count
+                if seen >= rank:
+                    value = (
+                        LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else None
+                    )
+                    break
+        result[f"latency_p{p}_ms"] = value
+    return result
+
+
+async def aget_usage(
+    db: AsyncSession,
+    since: datetime,
+    until: datetime,
+    granularity: str = "hour",
+    persona_id: Optional[UUID] = None,
+) -> List[dict]:
+    """
+    Usage per persona and hour (or day) over the hours overlapping
+    [since, until), from the rollups only. `granularity` is a `date_trunc`
+    field: "hour" or "day".
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unsupported granularity: {granularity}")
+    # Rows are keyed by the start of their hour, so a range starting
+    # mid-hour would otherwise leave out its first hour
+    since = since.replace(minute=0, second=0, microsecond=0)
+    # Inlined rather than bound, so the GROUP BY matches the select list
+    period = func.date_trunc(
+        literal_column(f"'{granularity}'"), PersonaUsageHourly.hour
+    ).label("period")
+    query = (
+        select(
+            PersonaUsageHourly.persona_id,
+            period,
+            *(func.sum(getattr(PersonaUsageHourly, c)).label(c) for c in _COUNTERS),
+            func.array_agg(
+                PersonaUsageHourly.latency_buckets,
+                type_=ARRAY(Integer, dimensions=2),
+            ).label("buckets"),
+        )
+        .where(PersonaUsageHourly.hour >= since, PersonaUsageHourly.hour < until)
+        .group_by(PersonaUsageHourly.persona_id, period)
+        .order_by(period, PersonaUsageHourly.persona_id)
+    )
+    if persona_id is not None:
+        query = query.where(PersonaUsageHourly.persona_id == persona_id)
+
+    usage = []
+    for row in (await db.execute(query)).mappings():
+        item = {c: int(row[c]) for c in _COUNTERS}
+        merged: Counter = Counter()
+        for buckets in row["buckets"]:
+            merged.update(dict(enumerate(buckets)))
+        item.update(
+            persona_id=row["persona_id"],
+            period=row["period"],
+            avg_user_chars=_ratio(item["user_chars"], item["user_messages"]),
+            avg_assistant_chars=_ratio(
+                item["assistant_chars"], item["assistant_messages"]
+            ),
+            avg_latency_ms=_ratio(item["latency_ms_sum"], item["latency_count"]),
+            **_percentiles([merged[i] for i in range(len(LATENCY_BUCKETS_MS) + 1)]),
+        )
+        usage.append(item)
+    return usage
+
+
+def _ratio(total: int, count: int) -> Optional[float]:
+    return round(total / count, 1) if count else None
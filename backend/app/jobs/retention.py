@@ -0,0 +1,323 @@
+"""
+Retention and compaction for chat history and LangGraph checkpoints.
+
+    python -m app.jobs.retention [--session-ttl-days 90] [--batch-size 500]
+                                 [--grace-minutes 60] [--cache-max-entries 1000]
+                                 [--archive sessions.ndjson] [--dry-run]
+
+1. Prunes superseded checkpoint versions, keeping only the latest
+   checkpoint of every thread (plus the blobs and writes it references).
+   Threads checkpointed within the grace period are left alone.
+2. Deletes sessions idle for longer than the TTL together with their
+   messages and checkpoints, optionally archiving them as NDJSON first.
+3. Deletes semantic cache entries recorded against an older persona version
+   or beyond the per-persona cap (the least used go first), and expired
+   rate limit counters.
+
+Work is done in bounded batches, one transaction per batch, and a JSON
+report of the rows deleted and table sizes is printed at the end.
+"""
+
+import argparse
+import json
+import logging
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, TextIO
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.core.config import settings
+from app.core.database import SessionLocal, engine
+from app.crud import semantic_cache as semantic_cache_crud
+
+logger = logging.getLogger(__name__)
+
+TABLES = (
+    "checkpoints",
+    "checkpoint_blobs",
+    "checkpoint_writes",
+    "chat_messages",
+    "chat_turn_keys",
+    "sessions",
+    "semantic_cache_entries",
+    "rate_limit_counters",
+)
+
+# Threads checkpointed within the grace window are skipped: the saver writes
+# a checkpoint's blobs before the checkpoint row, and a thread that is being
+# written to is left for the next run.
+_NEXT_THREADS = text("""
+    SELECT DISTINCT c.thread_id FROM checkpoints c
+    WHERE c.thread_id > :after
+      AND NOT EXISTS (
+        SELECT 1 FROM checkpoints r
+        WHERE r.thread_id = c.thread_id
+          AND (r.checkpoint ->> 'ts')::timestamptz >= :active_since
+      )
+    ORDER BY c.thread_id
+    LIMIT :limit
+    """)
+
+_PRUNE_CHECKPOINTS = text("""
+    WITH latest AS (
+        SELECT DISTINCT ON (thread_id, checkpoint_ns)
+            thread_id, checkpoint_ns, checkpoint_id
+        FROM checkpoints
+        WHERE thread_id = ANY(:threads)
+        ORDER BY thread_id, checkpoint_ns, checkpoint_id DESC
+    )
+    DELETE FROM checkpoints c
+    USING latest l
+    WHERE c.thread_id = l.thread_id
+      AND c.checkpoint_ns = l.checkpoint_ns
+      AND c.checkpoint_id < l.checkpoint_id
+    """)
+
+_PRUNE_WRITES = text("""
+    DELETE FROM checkpoint_writes w
+    WHERE w.thread_id = ANY(:threads)
+      AND NOT EXISTS (
+        SELECT 1 FROM checkpoints c
+        WHERE c.thread_id = w.thread_id
+          AND c.checkpoint_ns = w.checkpoint_ns
+          AND c.checkpoint_id = w.checkpoint_id
+      )
+    """)
+
+# Channel versions start with a zero-padded counter, so they compare as
+# text. Only blobs older than a version some checkpoint holds are deleted;
+# blobs of a checkpoint still being written are newer than all of them.
+_PRUNE_BLOBS = text("""
+    DELETE FROM checkpoint_blobs b
+    WHERE b.thread_id = ANY(:threads)
+      AND EXISTS (
+        SELECT 1 FROM checkpoints c
+        WHERE c.thread_id = b.thread_id
+          AND c.checkpoint_ns = b.checkpoint_ns
+          AND (c.checkpoint -> 'channel_versions' ->> b.channel) COLLATE "C"
+              > b.version COLLATE "C"
+      )
+      AND NOT EXISTS (
+        SELECT 1
+        FROM checkpoints c,
+             jsonb_each_text(c.checkpoint -> 'channel_versions') AS v(channel, version)
+        WHERE c.thread_id = b.thread_id
+          AND c.checkpoint_ns = b.checkpoint_ns
+          AND v.channel = b.channel
+          AND v.version = b.version
+      )
+    """)
+
+_IDLE_SESSIONS = text("""
+    SELECT s.id FROM sessions s
+    WHERE s.created_at < :cutoff
+      AND NOT EXISTS (
+        SELECT 1 FROM chat_messages m
+        WHERE m.session_id = s.id AND m.timestamp >= :cutoff
+      )
+    ORDER BY s.created_at
+    LIMIT :limit
+    """)
+
+_ARCHIVE_MESSAGES = text("""
+    SELECT s.id AS session_id, s.persona_id, s.created_at,
+           m.role, m.content, m.timestamp
+    FROM sessions s
+    LEFT JOIN chat_messages m ON m.session_id = s.id
+    WHERE s.id = ANY(:sessions)
+    ORDER BY s.id, m.timestamp, m.id
+    """)
+
+_DELETE_SESSIONS = (
+    (
+        "chat_messages",
+        text("DELETE FROM chat_messages WHERE session_id = ANY(:sessions)"),
+    ),
+    (
+        "chat_turn_keys",
+        text("DELETE FROM chat_turn_keys WHERE session_id = ANY(:sessions)"),
+    ),
+    ("checkpoints", text("DELETE FROM checkpoints WHERE thread_id = ANY(:threads)")),
+    (
+        "checkpoint_blobs",
+        text("DELETE FROM checkpoint_blobs WHERE thread_id = ANY(:threads)"),
+    ),
+    (
+        "checkpoint_writes",
+        text("DELETE FROM checkpoint_writes WHERE thread_id = ANY(:threads)"),
+    ),
+    ("sessions", text("DELETE FROM sessions WHERE id = ANY(:sessions)")),
+)
+
+_EXPIRE_RATE_LIMITS = text("DELETE FROM rate_limit_counters WHERE expires_at <= now()")
+
+
+def _table_sizes(conn: Connection) -> dict:
+    return {
+        table: conn.execute(
+            text("SELECT pg_total_relation_size(to_regclass(:table))"),
+            {"table": table},
+        ).scalar()
+        for table in TABLES
+    }
+
+
+def prune_checkpoints(
+    batch_size: int, grace: timedelta, dry_run: bool = False
+) -> Counter:
+    """
+    Keep only the latest checkpoint (and what it references) per thread,
+    skipping threads checkpointed within `grace`.
+    """
+    deleted: Counter = Counter()
+    after = ""
+    active_since = datetime.now(timezone.utc) - grace
+    while True:
+        with engine.connect() as conn:
+            threads = list(
+                conn.execute(
+                    _NEXT_THREADS,
+                    {"after": after, "active_since": active_since, "limit": batch_size},
+                ).scalars()
+            )
+            if not threads:
+                break
+            params = {"threads": threads}
+            deleted["checkpoints"] += conn.execute(_PRUNE_CHECKPOINTS, params).rowcount
+            deleted["checkpoint_writes"] += conn.execute(_PRUNE_WRITES, params).rowcount
+            deleted["checkpoint_blobs"] += conn.execute(_PRUNE_BLOBS, params).rowcount
+            if dry_run:
+                conn.rollback()
+            else:
+                conn.commit()
+        after = threads[-1]
+    return deleted
+
+
+def _archive(conn: Connection, sessions: List, out: TextIO) -> None:
+    for row in conn.execute(_ARCHIVE_MESSAGES, {"sessions": sessions}).mappings():
+        out.write(json.dumps(dict(row), default=str) + "\n")
+
+
+def expire_sessions(
+    ttl: timedelta,
+    batch_size: int,
+    archive: Optional[TextIO] = None,
+    dry_run: bool = False,
+) -> Counter:
+    """Delete sessions with no activity within `ttl`, oldest first."""
+    deleted: Counter = Counter()
+    cutoff = datetime.now() - ttl
+    seen = set()
+    while True:
+        with engine.connect() as conn:
+            sessions = [
+                session_id
+                for session_id in conn.execute(
+                    _IDLE_SESSIONS, {"cutoff": cutoff, "limit": batch_size}
+                ).scalars()
+                if session_id not in seen
+            ]
+            if not sessions:
+                break
+            if archive is not None and not dry_run:
+                _archive(conn, sessions, archive)
+            params = {"sessions": sessions, "threads": [str(s) for s in sessions]}
+            for table, statement in _DELETE_SESSIONS:
+                deleted[table] += conn.execute(statement, params).rowcount
+            if dry_run:
+                # Rolled back, so the same rows would be selected again.
+                seen.update(sessions)
+                conn.rollback()
+            else:
+                conn.commit()
+    return deleted
+
+
+def run(
+    session_ttl_days: int,
+    batch_size: int,
+    grace_minutes: int = settings.RETENTION_GRACE_MINUTES,
+    archive: Optional[TextIO] = None,
+    dry_run: bool = False,
+    cache_max_entries: int = settings.SEMANTIC_CACHE_MAX_ENTRIES,
+) -> dict:
+    started = time.perf_counter()
+    with engine.connect() as conn:
+        size_before = _table_sizes(conn)
+
+    deleted = prune_checkpoints(
+        batch_size, timedelta(minutes=grace_minutes), dry_run=dry_run
+    )
+    deleted.update(
+        expire_sessions(
+            timedelta(days=session_ttl_days), batch_size, archive, dry_run=dry_run
+        )
+    )
+
+    if not dry_run:
+        with SessionLocal() as db:
+            deleted["semantic_cache_entries"] = semantic_cache_crud.delete_stale(
+                db
+            ) + semantic_cache_crud.trim(db, cache_max_entries)
+        with engine.begin() as conn:
+            deleted["rate_limit_counters"] = conn.execute(_EXPIRE_RATE_LIMITS).rowcount
+
+    with engine.connect() as conn:
+        size_after = _table_sizes(conn)
+
+    return {
+        "dry_run": dry_run,
+        "session_ttl_days": session_ttl_days,
+        "rows_deleted": dict(deleted),
+        "bytes_before": size_before,
+        # Space held by deleted rows is reused after (auto)vacuum; the files
+        # only shrink after VACUUM FULL.
+        "bytes_after": size_after,
+        "duration_seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--session-ttl-days", type=int, default=settings.RETENTION_SESSION_TTL_DAYS
+    )
+    parser.add_argument("--batch-size", type=int, default=settings.RETENTION_BATCH_SIZE)
+    parser.add_argument(
+        "--grace-minutes",
+        type=int,
+        default=settings.RETENTION_GRACE_MINUTES,
+        help="skip threads checkpointed this recently",
+    )
+    parser.add_argument(
+        "--cache-max-entries",
+        type=int,
+        default=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+        help="semantic cache entries kept per persona",
+    )
+    parser.add_argument(
+        "--archive",
+        type=argparse.FileType("a"),
+        help="append expired sessions as NDJSON",
+    )
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    report = run(
+        args.session_ttl_days,
+        args.batch_size,
+        args.grace_minutes,
+        args.archive,
+        args.dry_run,
+        args.cache_max_entries,
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Per-persona usage rollups (`persona_usage_hourly`).
+
+    python -m app.jobs.rollups [--batch-size 5000] [--settle-seconds 60]
+                               [--rebuild]
+
+Only rows added since the previous run are read: messages after the last
+rolled-up id and sessions created after the last cutoff, both watermarks
+kept in `usage_rollup_state`. Rows newer than the settle window (messages
+by their insert time) are left for the next run so writes still in flight
+aren't skipped. Messages are read in bounded batches, one transaction per
+batch. A run holds an advisory lock, so concurrent runs skip instead of
+doing the same work.
+
+The API workers try the same rollup every ROLLUP_INTERVAL_SECONDS; the CLI
+is for one-off runs and for `--rebuild`, which recomputes the rollups from
+the messages and sessions still in the database (history already removed
+by the retention job can't be recovered).
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import engine
+from app.crud import usage as usage_crud
+
+logger = logging.getLogger(__name__)
+
+# Session-level advisory lock held for a whole run, so only one process rolls
+# up at a time; the others skip. Released with the connection if one dies.
+LOCK_KEY = 7_412_301_025
+
+_TRY_LOCK = text("SELECT pg_try_advisory_lock(:key)")
+
+_UNLOCK = text("SELECT pg_advisory_unlock(:key)")
+
+
+def run(batch_size: int, settle_seconds: float, rebuild: bool = False) -> dict:
+    """
+    Roll up what was added since the last run. Returns a report, with
+    `skipped` set when another process (an API worker or the CLI) holds the
+    rollup lock.
+    """
+    started = time.perf_counter()
+    # Sessions are inserted as soon as they're created, so their own
+    # timestamp can be used; messages settle by insert time (see the crud).
+    cutoff = datetime.now() - timedelta(seconds=settle_seconds)
+
+    with engine.connect() as lock_conn:
+        if not lock_conn.execute(_TRY_LOCK, {"key": LOCK_KEY}).scalar():
+            return {"skipped": True}
+        lock_conn.commit()
+        try:
+            if rebuild:
+                with engine.begin() as conn:
+                    usage_crud.reset(conn)
+
+            with engine.begin() as conn:
+                session_hours = usage_crud.roll_up_sessions(conn, cutoff)
+
+            messages = 0
+            while True:
+                with engine.begin() as conn:
+                    read = usage_crud.roll_up_messages(conn, settle_seconds, batch_size)
+                if not read:
+                    break
+                messages += read
+        finally:
+            lock_conn.execute(_UNLOCK, {"key": LOCK_KEY})
+            lock_conn.commit()
+
+    return {
+        "skipped": False,
+        "rebuild": rebuild,
+        "session_cutoff": cutoff.isoformat(),
+        "session_hours_updated": session_hours,
+        "messages_read": messages,
+        "duration_seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+async def run_periodically(interval: float) -> None:
+    """
+    Roll up every `interval` seconds until cancelled. Every API worker runs
+    this loop, but the advisory lock lets only one of them work at a time.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            report = await asyncio.to_thread(
+                run, settings.ROLLUP_BATCH_SIZE, settings.ROLLUP_SETTLE_SECONDS
+            )
+        except Exception:
+            logger.exception("Usage rollup failed")
+        else:
+            logger.debug("Usage rollup: %s", report)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--batch-size", type=int, default=settings.ROLLUP_BATCH_SIZE)
+    parser.add_argument(
+        "--settle-seconds", type=float, default=settings.ROLLUP_SETTLE_SECONDS
+    )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="recompute the rollups from the rows still in the database",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    report = run(args.batch_size, args.settle_seconds, args.rebuild)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
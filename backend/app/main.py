@@ -1,27 +1,96 @@
-from contextlib import asynccontextmanager
+import time
 
-from fastapi import FastAPI
+# Measured from here, i.e. the import of the app and everything it loads
+_import_started = time.perf_counter()
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager, suppress
+
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse
 from slowapi.errors import RateLimitExceeded
 from slowapi import _rate_limit_exceeded_handler
 
+from app.core import lifecycle, metrics
+from app.core.auth import require_api_key
 from app.core.config import settings
+from app.core.database import async_engine, engine
+from app.core.instrumentation import InstrumentationMiddleware, instrument_engine
 from app.api.v1.routes import api_router
-from app.memory.checkpointers import pg_checkpointer
+from app.crud import persona as persona_crud
+from app.jobs.rollups import run_periodically as run_rollups
 from app.core.security import limiter
+from app.services.chat.admission import admission
+from app.services.chat.writer import message_writer
+
+logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
     Manages the application's lifespan events.
+
+    The LangChain/LangGraph stack is not imported with the app; it is loaded
+    here, before the worker accepts requests, along with the optional warmup.
+
+    On SIGTERM the worker drains first (see `app.core.lifecycle`); by the
+    time the shutdown half runs no chat turn is streaming, and it only has
+    to flush pending writes and close the pools.
     """
-    pg_checkpointer.setup()
+    started = time.perf_counter()
+    with lifecycle.startup_phase("load_chat_stack"):
+        from app.memory.checkpointers import close_checkpointer, open_checkpointer
+        from app.services.chat.agent import wait_for_partial_writes
+        from app.services.chat.warmup import warm_up
+
+    with lifecycle.startup_phase("open_checkpointer"):
+        await open_checkpointer()
+    message_writer.start()
+    listener = asyncio.create_task(persona_crud.listen_for_invalidations())
+    rollups = None
+    if settings.ROLLUP_INTERVAL_SECONDS:
+        rollups = asyncio.create_task(run_rollups(settings.ROLLUP_INTERVAL_SECONDS))
+    lifecycle.install_drain_handler(
+        lambda: admission.drain(settings.SHUTDOWN_DRAIN_TIMEOUT)
+    )
+
+    if settings.STARTUP_WARMUP_PERSONAS:
+        with lifecycle.startup_phase("warmup"):
+            try:
+                warmed = await warm_up(settings.STARTUP_WARMUP_PERSONAS)
+            except Exception:
+                logger.exception("Warmup failed")
+            else:
+                logger.info("Warmed up %d personas", warmed)
+
+    lifecycle.record_startup_phase("lifespan", time.perf_counter() - started)
+    logger.info("Started: %s", lifecycle.startup_report())
     yield
+    for task in (listener, rollups):
+        if task is not None:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+    # Partial replies queue their messages on the writer, so both share it
+    deadline = time.perf_counter() + settings.SHUTDOWN_WRITE_TIMEOUT
+    await wait_for_partial_writes(timeout=settings.SHUTDOWN_WRITE_TIMEOUT)
+    await message_writer.close(timeout=max(deadline - time.perf_counter(), 0))
+    if admission.session_locks is not None:
+        await admission.session_locks.close()
+    await close_checkpointer()
+    await async_engine.dispose()
+    engine.dispose()
 
 
 app = FastAPI(title="AMA API", lifespan=lifespan)
 
+instrument_engine(engine, "sync")
+instrument_engine(async_engine.sync_engine, "async")
+
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
@@ -33,11 +102,34 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+app.add_middleware(
+    GZipMiddleware,
+    minimum_size=settings.GZIP_MINIMUM_SIZE,
+    compresslevel=settings.GZIP_COMPRESS_LEVEL,
+)
+
+app.add_middleware(InstrumentationMiddleware)
+
 app.include_router(api_router, prefix="/v1")
 
+lifecycle.record_startup_phase("import", time.perf_counter() - _import_started)
+
 
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the AMA API"}
+
+
+@app.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    dependencies=[Depends(require_api_key)],
+    include_in_schema=False,
+)
+def prometheus_metrics():
+    return PlainTextResponse(
+        metrics.render_prometheus(), media_type="text/plain; version=0.0.4"
+    )
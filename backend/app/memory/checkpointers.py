@@ -1,8 +1,117 @@
-from langgraph.checkpoint.postgres import PostgresSaver
-from psycopg import Connection
+import logging
+from contextlib import nullcontext
+from typing import Any, Dict, Optional
+
+from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+
 from app.core.config import settings
+from app.core.instrumentation import span
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary key shared by every worker so only one runs the setup DDL at a time
+SETUP_LOCK_KEY = 0x616D615F63687074
+
+_pool: Optional[AsyncConnectionPool] = None
+_checkpointer: Optional[AsyncPostgresSaver] = None
+
+
+class PooledPostgresSaver(AsyncPostgresSaver):
+    """
+    AsyncPostgresSaver backed by a connection pool.
+
+    The upstream saver guards every cursor with a process-wide asyncio.Lock,
+    which is only needed when a single connection is shared. Each cursor here
+    checks out its own pooled connection, so the lock is dropped and
+    checkpoint reads/writes from different sessions run concurrently.
+    """
+
+    def __init__(self, pool: AsyncConnectionPool, **kwargs):
+        super().__init__(pool, **kwargs)
+        self.lock = nullcontext()
+
+    async def aget_tuple(self, config):
+        with span("checkpoint.get"):
+            return await super().aget_tuple(config)
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        with span("checkpoint.put"):
+            return await super().aput(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        with span("checkpoint.put_writes"):
+            return await super().aput_writes(config, writes, task_id, task_path)
+
+
+async def _on_reconnect_failed(pool: AsyncConnectionPool) -> None:
+    logger.error("Checkpointer pool %s could not reconnect to Postgres", pool.name)
+
+
+async def setup_checkpointer(pool: AsyncConnectionPool) -> None:
+    """
+    Create or migrate the checkpoint tables.
+
+    Every worker calls this on startup, so the DDL runs under a Postgres
+    advisory lock: the first worker migrates, the rest wait and then find
+    nothing left to do.
+    """
+    async with pool.connection() as conn:
+        await conn.execute("SELECT pg_advisory_lock(%s)", (SETUP_LOCK_KEY,))
+        try:
+            await AsyncPostgresSaver(conn).setup()
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock(%s)", (SETUP_LOCK_KEY,))
+
+
+async def open_checkpointer() -> AsyncPostgresSaver:
+    """
+    Open the checkpointer connection pool and create its tables.
+
+    Called from the application lifespan; nothing connects at import time.
+    Connections are health-checked on checkout and the pool reconnects in the
+    background if Postgres goes away.
+    """
+    global _pool, _checkpointer
+
+    _pool = AsyncConnectionPool(
+        settings.psycopg_database_url,
+        name="checkpointer",
+        min_size=settings.CHECKPOINTER_POOL_MIN_SIZE,
+        max_size=settings.CHECKPOINTER_POOL_MAX_SIZE,
+        timeout=settings.CHECKPOINTER_POOL_TIMEOUT,
+        max_idle=settings.CHECKPOINTER_POOL_MAX_IDLE,
+        reconnect_timeout=settings.CHECKPOINTER_POOL_RECONNECT_TIMEOUT,
+        reconnect_failed=_on_reconnect_failed,
+        check=AsyncConnectionPool.check_connection,
+        kwargs={"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row},
+        open=False,
+    )
+    await _pool.open(wait=True)
+
+    await setup_checkpointer(_pool)
+    _checkpointer = PooledPostgresSaver(_pool)
+    return _checkpointer
+
+
+async def close_checkpointer() -> None:
+    global _pool, _checkpointer
+
+    if _pool is not None:
+        await _pool.close()
+    _pool = None
+    _checkpointer = None
+
+
+def get_checkpointer() -> AsyncPostgresSaver:
+    if _checkpointer is None:
+        raise RuntimeError("Checkpointer is not open; it is created in the lifespan")
+    return _checkpointer
 
-conn = Connection.connect(settings.DATABASE_URL)
-conn.autocommit = True
 
-pg_checkpointer = PostgresSaver(conn)
+def get_pool_stats() -> Dict[str, Any]:
+    """Connection pool metrics (psycopg_pool stats plus configured bounds)."""
+    if _pool is None:
+        return {"open": False}
+    return {"open": not _pool.closed, **_pool.get_stats()}
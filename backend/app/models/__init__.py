@@ -1,10 +1,18 @@
 from .base import Base
 from .persona import Persona
-from .session import Session, ChatMessage
+from .session import Session, ChatMessage, ChatTurnKey
+from .semantic_cache import SemanticCacheEntry
+from .rate_limit import RateLimitCounter
+from .usage import PersonaUsageHourly, UsageRollupState
 
 __all__ = [
     "Base",
     "Persona",
     "Session",
     "ChatMessage",
+    "ChatTurnKey",
+    "SemanticCacheEntry",
+    "RateLimitCounter",
+    "PersonaUsageHourly",
+    "UsageRollupState",
 ]
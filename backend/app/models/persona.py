@@ -4,6 +4,7 @@ from sqlalchemy import (
     Column,
     DateTime,
     Float,
+    Index,
     Integer,
     String,
     Text,
@@ -58,5 +59,16 @@ class Persona(Base):
         nullable=False,
     )
 
+    __table_args__ = (
+        # Keyset pagination (newest first) and the latest active persona
+        Index("ix_personas_created_at_id", "created_at", "id"),
+        Index(
+            "ix_personas_active_created_at_id",
+            "created_at",
+            "id",
+            postgresql_where=is_active,
+        ),
+    )
+
     def __repr__(self):
         return f"<Persona(id={self.id}, username={self.username})>"
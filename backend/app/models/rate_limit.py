@@ -0,0 +1,23 @@
+from sqlalchemy import Column, DateTime, Integer, Text
+
+from app.models.base import Base
+
+
+class RateLimitCounter(Base):
+    """
+    A fixed-window counter used by the Postgres rate limit storage.
+
+    The table is UNLOGGED: counters are cheap to lose on a crash and are
+    written on every rate-limited request.
+    """
+
+    __tablename__ = "rate_limit_counters"
+
+    key = Column(Text, primary_key=True)
+    value = Column(Integer, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    def __repr__(self):
+        return f"<RateLimitCounter(key={self.key}, value={self.value})>"
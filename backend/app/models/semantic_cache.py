@@ -0,0 +1,47 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, Text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+from pgvector.sqlalchemy import VECTOR
+
+from app.models.base import Base
+
+EMBEDDING_DIMENSIONS = 768
+
+
+class SemanticCacheEntry(Base):
+    """
+    A previously generated answer to a persona's first-turn question.
+
+    Entries are only served while `persona_version` matches the persona's
+    `updated_at`, so editing a persona implicitly invalidates its cache.
+    Lookups scan a persona version's entries exactly (see the crud), so
+    there is no vector index; the retention job caps entries per persona.
+    """
+
+    __tablename__ = "semantic_cache_entries"
+
+    id = Column(Integer, primary_key=True)
+    persona_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("personas.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    persona_version = Column(DateTime(timezone=True), nullable=False)
+    question = Column(Text, nullable=False)
+    answer = Column(Text, nullable=False)
+    embedding = Column(VECTOR(EMBEDDING_DIMENSIONS), nullable=False)
+    hits = Column(Integer, default=0, nullable=False)
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+    __table_args__ = (
+        Index(
+            "ix_semantic_cache_entries_persona_version",
+            "persona_id",
+            "persona_version",
+        ),
+    )
+
+    def __repr__(self):
+        return f"<SemanticCacheEntry(id={self.id}, persona_id={self.persona_id})>"
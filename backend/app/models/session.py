@@ -2,9 +2,23 @@ import uuid
 from datetime import datetime
 
 from .base import Base
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
-from sqlalchemy.orm import relationship
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import (
+    Column,
+    Computed,
+    Integer,
+    String,
+    DateTime,
+    ForeignKey,
+    Index,
+    Text,
+)
+from sqlalchemy.orm import deferred, relationship
+from sqlalchemy.sql import func
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
+
+# Text search configuration of `chat_messages.search_vector`; queries must
+# use the same one for the GIN index to apply.
+SEARCH_CONFIG = "english"
 
 
 class Session(Base):
@@ -12,13 +26,33 @@ class Session(Base):
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     persona_id = Column(UUID(as_uuid=True), ForeignKey("personas.id"), nullable=False)
-    created_at = Column(DateTime, default=datetime.now, nullable=False)
-    messages = relationship("ChatMessage", back_populates="session", lazy="dynamic")
+    created_at = Column(DateTime, default=datetime.now, nullable=False, index=True)
+    messages = relationship("ChatMessage", back_populates="session", lazy="write_only")
+
+    __table_args__ = (
+        Index("ix_sessions_persona_id_created_at", "persona_id", "created_at", "id"),
+    )
 
     def __repr__(self):
         return f"<Session(id='{self.id}', persona_id='{self.persona_id}')>"
 
 
+class ChatTurnKey(Base):
+    """
+    An Idempotency-Key claimed by a chat turn. Shared by every worker, so a
+    repeated request can't start a second reply when it reaches a worker
+    other than the one running (or that ran) the first.
+    """
+
+    __tablename__ = "chat_turn_keys"
+
+    session_id = Column(UUID(as_uuid=True), ForeignKey("sessions.id"), primary_key=True)
+    key = Column(String(128), primary_key=True)
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
 
@@ -28,5 +62,39 @@ class ChatMessage(Base):
     role = Column(String(50))
     content = Column(Text)
     timestamp = Column(DateTime, default=datetime.now, index=True)
+    # Assistant replies only: token usage and time to the full reply
+    input_tokens = Column(Integer, nullable=True)
+    output_tokens = Column(Integer, nullable=True)
+    latency_ms = Column(Integer, nullable=True)
+    # Set by Postgres when the row is written; `timestamp` is taken when the
+    # message is queued, which can be well before (see MessageWriter)
+    inserted_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    # Maintained by Postgres; deferred so transcripts don't load it
+    search_vector = deferred(
+        Column(
+            TSVECTOR,
+            Computed(
+                f"to_tsvector('{SEARCH_CONFIG}', coalesce(content, ''))",
+                persisted=True,
+            ),
+        )
+    )
 
     session = relationship("Session", back_populates="messages")
+
+    __table_args__ = (
+        # Transcript pages by keyset on (timestamp, id) within a session
+        Index("ix_chat_messages_session_id_timestamp", "session_id", "timestamp", "id"),
+        # Full-text search, and substring (ILIKE) search via trigrams
+        Index(
+            "ix_chat_messages_search_vector", "search_vector", postgresql_using="gin"
+        ),
+        Index(
+            "ix_chat_messages_content_trgm",
+            "content",
+            postgresql_using="gin",
+            postgresql_ops={"content": "gin_trgm_ops"},
+        ),
+    )
@@ -0,0 +1,52 @@
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Integer, String
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+
+from app.models.base import Base
+
+# Upper bounds (ms) of the response latency histogram buckets; the last
+# bucket counts everything slower.
+LATENCY_BUCKETS_MS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+
+class PersonaUsageHourly(Base):
+    """
+    Per-persona traffic for one hour, maintained incrementally by the usage
+    rollup (`app.jobs.rollups`). Every column is additive, including the
+    latency histogram, so days and ranges are sums of hours.
+    """
+
+    __tablename__ = "persona_usage_hourly"
+
+    persona_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("personas.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    hour = Column(DateTime, primary_key=True, index=True)
+    sessions = Column(Integer, nullable=False, server_default="0")
+    user_messages = Column(Integer, nullable=False, server_default="0")
+    assistant_messages = Column(Integer, nullable=False, server_default="0")
+    user_chars = Column(BigInteger, nullable=False, server_default="0")
+    assistant_chars = Column(BigInteger, nullable=False, server_default="0")
+    input_tokens = Column(BigInteger, nullable=False, server_default="0")
+    output_tokens = Column(BigInteger, nullable=False, server_default="0")
+    latency_ms_sum = Column(BigInteger, nullable=False, server_default="0")
+    latency_count = Column(Integer, nullable=False, server_default="0")
+    latency_buckets = Column(
+        ARRAY(Integer),
+        nullable=False,
+        server_default="{" + ",".join("0" * (len(LATENCY_BUCKETS_MS) + 1)) + "}",
+    )
+
+    def __repr__(self):
+        return f"<PersonaUsageHourly(persona_id={self.persona_id}, hour={self.hour})>"
+
+
+class UsageRollupState(Base):
+    """How far the usage rollup has read `chat_messages` and `sessions`."""
+
+    __tablename__ = "usage_rollup_state"
+
+    name = Column(String(50), primary_key=True)
+    last_message_id = Column(BigInteger, nullable=False, server_default="0")
+    sessions_until = Column(DateTime, nullable=True)
@@ -33,6 +33,28 @@ class PersonaLatestResponse(BaseModel):
     social_links: Optional[Dict[str, Any]] = None
 
 
+class PersonaListItem(BaseModel):
+    """A persona in a listing; only the requested fields are present."""
+
+    id: UUID
+    created_at: datetime
+    username: Optional[str] = None
+    public_name: Optional[str] = None
+    bio: Optional[str] = None
+    tagline: Optional[str] = None
+    prompt: Optional[str] = None
+    welcome_message: Optional[str] = None
+    temperature: Optional[float] = None
+    max_tokens: Optional[int] = None
+    llm_provider: Optional[str] = None
+    llm_model: Optional[str] = None
+    profile_image_url: Optional[str] = None
+    social_links: Optional[Dict[str, Any]] = None
+    custom_settings: Optional[Dict[str, Any]] = None
+    is_active: Optional[bool] = None
+    updated_at: Optional[datetime] = None
+
+
 class PersonaCreate(PersonaBase):
     pass
 
@@ -0,0 +1,35 @@
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from pydantic import BaseModel
+
+
+class SessionResponse(BaseModel):
+    id: UUID
+    persona_id: UUID
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class ChatMessageResponse(BaseModel):
+    id: int
+    role: Optional[str] = None
+    content: Optional[str] = None
+    timestamp: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class MessageSearchHit(BaseModel):
+    id: int
+    session_id: UUID
+    persona_id: UUID
+    role: Optional[str] = None
+    content: Optional[str] = None
+    timestamp: Optional[datetime] = None
+    # Full-text relevance; absent for substring searches
+    rank: Optional[float] = None
@@ -0,0 +1,25 @@
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from pydantic import BaseModel
+
+
+class PersonaUsage(BaseModel):
+    persona_id: UUID
+    period: datetime
+    sessions: int
+    user_messages: int
+    assistant_messages: int
+    user_chars: int
+    assistant_chars: int
+    avg_user_chars: Optional[float] = None
+    avg_assistant_chars: Optional[float] = None
+    input_tokens: int
+    output_tokens: int
+    latency_count: int
+    avg_latency_ms: Optional[float] = None
+    # Upper bound of the histogram bucket; null when slower than the last one
+    latency_p50_ms: Optional[int] = None
+    latency_p90_ms: Optional[int] = None
+    latency_p99_ms: Optional[int] = None
@@ -0,0 +1,331 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import Hashable, Optional, Set
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, create_async_engine
+
+from app.core import metrics
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+ACTIVE = metrics.Gauge("chat_admission_active", "Chat turns currently streaming")
+WAITING = metrics.Gauge("chat_admission_waiting", "Chat turns queued for a slot")
+WAIT_TIME = metrics.Histogram(
+    "chat_admission_wait_seconds", "Time spent queued before a turn was admitted"
+)
+REJECTED = metrics.Counter("chat_admission_rejected_total", "Rejected turns by reason")
+
+# How long cancelled turns get to wind down, and their session locks to be
+# released, at the end of a drain
+CANCEL_GRACE = 5.0
+
+# First key of the session advisory locks, so they can't collide with other
+# advisory locks taken by the app (the two-key form has its own key space)
+_LOCK_NAMESPACE = 7_412_301
+
+_TRY_LOCK = text("SELECT pg_try_advisory_lock(:namespace, hashtext(:session_id))")
+
+_UNLOCK = text("SELECT pg_advisory_unlock_all()")
+
+
+class AdmissionRejected(Exception):
+    """Raised when a turn cannot be admitted; `reason` is used as a metric label."""
+
+    def __init__(self, reason: str, detail: str, retry_after: Optional[float] = None):
+        super().__init__(detail)
+        self.reason = reason
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """A granted slot. `release()` is idempotent so every exit path may call it."""
+
+    def __init__(self, controller: "AdmissionController", persona_id, session_id):
+        self._controller = controller
+        self.persona_id = persona_id
+        self.session_id = session_id
+        # The request task streaming this turn, cancelled if a drain times out
+        self.task = asyncio.current_task()
+        # Connection holding the session's advisory lock, if locks are shared
+        self.lock: Optional[AsyncConnection] = None
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller._release(self)
+
+
+class SessionLocks:
+    """
+    One in-flight turn per session across worker processes: a Postgres
+    advisory lock on the session id, held on its own connection for the
+    whole turn. A worker that dies takes its locks with it.
+
+    Connections come from a dedicated pool, so locks never compete with
+    queries for the request pool; only admitted turns hold one.
+    """
+
+    def __init__(self, url: str):
+        self._url = url
+        self._engine: Optional[AsyncEngine] = None
+
+    @property
+    def engine(self) -> AsyncEngine:
+        # Created lazily, on the event loop that uses it
+        if self._engine is None:
+            self._engine = create_async_engine(
+                self._url, pool_size=5, max_overflow=-1, pool_pre_ping=True
+            )
+        return self._engine
+
+    async def acquire(self, session_id) -> Optional[AsyncConnection]:
+        """The connection holding the lock, or None if another turn holds it."""
+        conn = await self.engine.connect()
+        try:
+            locked = await conn.scalar(
+                _TRY_LOCK,
+                {"namespace": _LOCK_NAMESPACE, "session_id": str(session_id)},
+            )
+            await conn.commit()
+        except BaseException:
+            # Whether the lock was taken is unknown; closing for good drops it
+            await conn.invalidate()
+            await conn.close()
+            raise
+        if not locked:
+            await conn.close()
+            return None
+        return conn
+
+    async def release(self, conn: AsyncConnection) -> None:
+        try:
+            await conn.execute(_UNLOCK)
+            await conn.commit()
+        except Exception:
+            logger.warning("Could not unlock a chat session", exc_info=True)
+            await conn.invalidate()
+        finally:
+            await conn.close()
+
+    async def close(self) -> None:
+        if self._engine is not None:
+            await self._engine.dispose()
+            self._engine = None
+
+
+class AdmissionController:
+    """
+    Admission control for chat turns, per worker process.
+
+    Caps concurrent streams globally and per persona, allows one in-flight
+    turn per session, and queues up to `max_waiting` turns for at most
+    `wait_timeout` seconds before rejecting them. A stream limit of 0 disables
+    it; `max_waiting=0` rejects instead of queueing.
+
+    The caps and the queue are this worker's; the one-turn-per-session rule
+    only holds across workers when `session_locks` is given. Admitted turns
+    take the session lock before they start, so a turn queued in one worker
+    is only refused once it is admitted if another worker runs the session.
+
+    `drain()` is used on shutdown: it refuses new turns and waits for the
+    in-flight ones to finish.
+    """
+
+    def __init__(
+        self,
+        max_streams: int,
+        max_streams_per_persona: int,
+        max_waiting: int,
+        wait_timeout: float,
+        session_locks: Optional[SessionLocks] = None,
+    ):
+        self.max_streams = max_streams
+        self.max_streams_per_persona = max_streams_per_persona
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self._active = 0
+        self._per_persona: Counter = Counter()
+        self._sessions: Set[Hashable] = set()
+        self._waiting = 0
+        self._tickets: Set[Ticket] = set()
+        self._changed = asyncio.Event()
+        self.session_locks = session_locks
+        self._unlocking: Set[asyncio.Task] = set()
+        self.draining = False
+
+    def _has_capacity(self, persona_id) -> bool:
+        if self.max_streams and self._active >= self.max_streams:
+            return False
+        if (
+            self.max_streams_per_persona
+            and self._per_persona[persona_id] >= self.max_streams_per_persona
+        ):
+            return False
+        return True
+
+    def _reject(self, reason: str, detail: str, retry_after=None) -> AdmissionRejected:
+        REJECTED.inc(reason=reason)
+        return AdmissionRejected(reason, detail, retry_after)
+
+    async def acquire(self, persona_id, session_id) -> Ticket:
+        if self.draining:
+            raise self._reject("draining", "The server is shutting down", 1)
+        if session_id in self._sessions:
+            raise self._reject("session_busy", "A reply is already in progress")
+
+        # Reserve the session up front so an overlapping request is refused
+        # even while this one is still queued.
+        self._sessions.add(session_id)
+        try:
+            if not self._has_capacity(persona_id):
+                await self._wait(persona_id)
+        except BaseException:
+            self._sessions.discard(session_id)
+            raise
+
+        # Counted before taking the lock, so the slot can't be given away
+        # while the lock is being taken
+        self._active += 1
+        self._per_persona[persona_id] += 1
+        ACTIVE.set(self._active)
+        ticket = Ticket(self, persona_id, session_id)
+        self._tickets.add(ticket)
+        if self.session_locks is not None:
+            try:
+                ticket.lock = await self.session_locks.acquire(session_id)
+            except BaseException:
+                ticket.release()
+                raise
+            if ticket.lock is None:
+                ticket.release()
+                raise self._reject("session_busy", "A reply is already in progress")
+        return ticket
+
+    async def _wait(self, persona_id) -> None:
+        if self._waiting >= self.max_waiting:
+            raise self._reject(
+                "queue_full", "Too many replies in progress", self.wait_timeout
+            )
+
+        self._waiting += 1
+        WAITING.set(self._waiting)
+        started = time.perf_counter()
+        deadline = started + self.wait_timeout
+        try:
+            while not self._has_capacity(persona_id):
+                if self.draining:
+                    raise self._reject("draining", "The server is shutting down", 1)
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    raise self._reject(
+                        "timeout",
+                        "Timed out waiting for a free slot",
+                        self.wait_timeout,
+                    )
+                changed = self._changed
+                try:
+                    await asyncio.wait_for(changed.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._waiting -= 1
+            WAITING.set(self._waiting)
+        WAIT_TIME.observe(time.perf_counter() - started)
+
+    def _release(self, ticket: Ticket) -> None:
+        self._active -= 1
+        self._per_persona[ticket.persona_id] -= 1
+        if self._per_persona[ticket.persona_id] <= 0:
+            del self._per_persona[ticket.persona_id]
+        self._sessions.discard(ticket.session_id)
+        self._tickets.discard(ticket)
+        if ticket.lock is not None:
+            task = asyncio.get_running_loop().create_task(
+                self.session_locks.release(ticket.lock)
+            )
+            self._unlocking.add(task)
+            task.add_done_callback(self._unlocking.discard)
+        ACTIVE.set(self._active)
+        self._notify()
+
+    def _notify(self) -> None:
+        # Wake every waiter; each rechecks capacity for its own persona.
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def drain(self, timeout: float) -> None:
+        """
+        Refuse new and queued turns, then wait up to `timeout` seconds for the
+        in-flight ones. Turns still streaming after that are cancelled; they
+        persist what they have streamed so far.
+        """
+        self.draining = True
+        self._notify()
+        if await self._wait_idle(timeout):
+            await self._wait_unlocked(CANCEL_GRACE)
+            return
+        logger.warning(
+            "Cancelling %d chat turns still streaming after %.0fs",
+            len(self._tickets),
+            timeout,
+        )
+        for ticket in list(self._tickets):
+            if ticket.task is not None:
+                ticket.task.cancel()
+        deadline = time.perf_counter() + CANCEL_GRACE
+        await self._wait_idle(CANCEL_GRACE)
+        await self._wait_unlocked(max(deadline - time.perf_counter(), 0))
+
+    async def _wait_unlocked(self, timeout: float) -> None:
+        if self._unlocking:
+            await asyncio.wait(set(self._unlocking), timeout=timeout)
+
+    async def _wait_idle(self, timeout: float) -> bool:
+        deadline = time.perf_counter() + timeout
+        while self._active:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return False
+            try:
+                await asyncio.wait_for(self._changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "active": self._active,
+            "waiting": self._waiting,
+            "sessions": len(self._sessions),
+            "per_persona": {str(k): v for k, v in self._per_persona.items()},
+            "max_streams": self.max_streams,
+            "max_streams_per_persona": self.max_streams_per_persona,
+            "max_waiting": self.max_waiting,
+            "draining": self.draining,
+        }
+
+
+def per_worker(limit: int, workers: int) -> int:
+    """This worker's share of a deployment-wide stream limit (0 stays 0)."""
+    return -(-limit // max(workers, 1))
+
+
+admission = AdmissionController(
+    max_streams=per_worker(settings.CHAT_MAX_STREAMS, settings.WEB_CONCURRENCY),
+    max_streams_per_persona=per_worker(
+        settings.CHAT_MAX_STREAMS_PER_PERSONA, settings.WEB_CONCURRENCY
+    ),
+    max_waiting=settings.CHAT_MAX_WAITING,
+    wait_timeout=settings.CHAT_ADMISSION_TIMEOUT,
+    session_locks=(
+        SessionLocks(settings.async_database_url)
+        if settings.CHAT_SESSION_LOCKS
+        else None
+    ),
+)
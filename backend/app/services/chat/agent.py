@@ -1,18 +1,51 @@
+import asyncio
+import logging
+import threading
+import time
 from dataclasses import dataclass
-from datetime import datetime, timezone, timedelta
-from cachetools import TTLCache, cached
-from cachetools.keys import hashkey
+from typing import Set
+from uuid import UUID
+from cachetools import LRUCache
 from langchain.agents import create_agent
-from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.messages.ai import add_usage
 
 from app.core.config import settings
-from app.core.database import SessionLocal
+from app.core import metrics
+from app.core.instrumentation import record_span, span
 from app.crud import persona as persona_crud
-from app.crud import session as session_crud
-from app.memory.checkpointers import pg_checkpointer
-from app.models import ChatMessage
+from app.memory.checkpointers import get_checkpointer
+from app.schemas.persona import PersonaResponse
+from app.services.chat import semantic_cache
+from app.services.chat.history import HistoryMiddleware, HistoryPolicy
+from app.services.chat.prompts import PromptMiddleware, stable_prefix
+from app.services.chat.sse import sse_event
+from app.services.chat.streaming import coalesce
+from app.services.chat.writer import message_writer
+from app.services.llm import providers
+from app.services.llm.context_cache import ContextCachePolicy
 
-ist = timezone(timedelta(hours=5, minutes=30))
+logger = logging.getLogger(__name__)
+
+STREAM_TTFT = metrics.Histogram(
+    "chat_stream_ttft_seconds", "Time from stream start to first token"
+)
+STREAM_DURATION = metrics.Histogram(
+    "chat_stream_duration_seconds", "Total duration of a chat stream"
+)
+STREAM_TOKEN_RATE = metrics.Histogram(
+    "chat_stream_tokens_per_second",
+    "Output tokens per second after the first token",
+    buckets=(5, 10, 25, 50, 100, 200, 400, 800),
+)
+STREAM_BYTES = metrics.Counter("chat_stream_bytes_total", "Bytes sent on chat streams")
+STREAMS = metrics.Counter("chat_streams_total", "Chat streams by outcome")
+INPUT_TOKENS = metrics.Counter(
+    "llm_input_tokens_total", "Prompt tokens sent to the LLM"
+)
+CACHED_INPUT_TOKENS = metrics.Counter(
+    "llm_cached_input_tokens_total", "Prompt tokens served from the provider's cache"
+)
 
 
 @dataclass
@@ -20,62 +53,246 @@ class Context:
     persona_id: str
 
 
-@cached(
-    cache=TTLCache(maxsize=100, ttl=3600), key=lambda persona_id: hashkey(persona_id)
-)
-def get_model(persona_id) -> ChatGoogleGenerativeAI:
+_agent_lock = threading.Lock()
+
+# Compiled agents keyed by (persona_id, updated_at): an edited persona gets a
+# new key, so a stale graph is never served even before it is invalidated.
+_agent_cache = LRUCache(maxsize=100)
+
 
-    print(f"Cache miss: Getting model for persona_id: {persona_id}")
+def get_agent(persona: PersonaResponse):
+    key = (persona.id, persona.updated_at)
+    with _agent_lock:
+        agent = _agent_cache.get(key)
+    if agent is not None:
+        return agent
 
-    with SessionLocal() as db:
-        persona = persona_crud.get(db, persona_id=persona_id)
+    with span("agent.build"):
+        agent = _build_agent(persona)
+    with _agent_lock:
+        _agent_cache[key] = agent
+    return agent
 
-    model = ChatGoogleGenerativeAI(
-        model=persona.llm_model or "gemini-2.5-flash-lite",
-        google_api_key=settings.GOOGLE_API_KEY,
-        temperature=persona.temperature or 0.7,
+
+def _build_agent(persona: PersonaResponse):
+    logger.debug("Building agent for persona %s", persona.id)
+    model = providers.get_chat_model(persona)
+    middleware = [
+        providers.ModelSettingsMiddleware(providers.call_settings(persona)),
+        PromptMiddleware(persona, ContextCachePolicy.from_persona(persona)),
+    ]
+    policy = HistoryPolicy.from_persona(persona)
+    if policy.enabled:
+        middleware.insert(0, HistoryMiddleware(policy, model=model))
+
+    return create_agent(
+        model=model,
+        system_prompt=stable_prefix(persona),
+        context_schema=Context,
+        checkpointer=get_checkpointer(),
+        middleware=middleware,
     )
 
-    return model
+
+def invalidate_persona(persona_id) -> None:
+    """Drop the compiled agents of a persona (None = all)."""
+    with _agent_lock:
+        for key in [
+            key for key in _agent_cache if persona_id is None or key[0] == persona_id
+        ]:
+            _agent_cache.pop(key, None)
+
+
+persona_crud.register_invalidation_hook(invalidate_persona)
+
+
+async def _callback_handler(session_id: str, role: str, message: str, **stats) -> None:
+    await message_writer.save(UUID(session_id), role, message, **stats)
 
 
-def _callback_handler(session_id: str, role: str, message: str) -> None:
-    message = ChatMessage(
-        session_id=session_id,
-        role=role,
-        content=message,
+def _coalesce_settings(persona: PersonaResponse):
+    """Coalescing thresholds, overridable per persona via custom_settings.stream."""
+    stream = (persona.custom_settings or {}).get("stream") or {}
+    return (
+        int(stream.get("coalesce_bytes", settings.STREAM_COALESCE_BYTES)),
+        float(stream.get("coalesce_ms", settings.STREAM_COALESCE_MS)),
     )
-    with SessionLocal() as db:
-        session_crud.save_message(db, message)
 
 
-def conversation(persona_id: str, input_message: str, session_id: str):
-    model = get_model(persona_id)
+async def _is_first_turn(config: dict) -> bool:
+    return await get_checkpointer().aget_tuple(config) is None
 
-    with SessionLocal() as db:
-        persona = persona_crud.get(db, persona_id=persona_id)
 
-    prompt = persona.prompt + f"\nThe current time is {datetime.now(ist)} IST"
+# Partial replies being saved after their stream was cancelled
+_partial_writes: Set[asyncio.Task] = set()
 
-    agent = create_agent(
-        model=model,
-        system_prompt=prompt,
-        context_schema=Context,
-        checkpointer=pg_checkpointer,
+
+def _persist_partial(agent, config, session_id, input_message, answer) -> None:
+    """
+    Save a reply that was cut short (e.g. a drain timed out), so
+    the message history and the checkpoint keep matching what was streamed.
+    Runs as its own task since the caller is being cancelled.
+    """
+    task = asyncio.create_task(
+        _write_partial(agent, config, session_id, input_message, answer)
     )
+    _partial_writes.add(task)
+    task.add_done_callback(_partial_writes.discard)
+
+
+async def _write_partial(agent, config, session_id, input_message, answer) -> None:
+    try:
+        state = await agent.aget_state(config)
+        messages = state.values.get("messages") or []
+        last = messages[-1] if messages else None
+        # The model node never finished, so the checkpoint has no reply yet
+        if not isinstance(last, AIMessage):
+            update = [AIMessage(answer)]
+            if not (isinstance(last, HumanMessage) and last.text == input_message):
+                update.insert(0, HumanMessage(input_message))
+            await agent.aupdate_state(config, {"messages": update}, as_node="model")
+        await _callback_handler(session_id=session_id, role="assistant", message=answer)
+    except Exception:
+        logger.exception("Could not save the partial reply for session %s", session_id)
+
+
+async def wait_for_partial_writes(timeout: float) -> None:
+    if _partial_writes:
+        await asyncio.wait(list(_partial_writes), timeout=timeout)
+
+
+async def conversation(persona: PersonaResponse, input_message: str, session_id: str):
+    """
+    Run one chat turn and yield it as Server-Sent Events.
 
+    Emits `token` events (with incrementing ids), then a single `done` event
+    carrying token usage, or an `error` event if generation fails.
+
+    For personas with the semantic cache enabled, the first question of a
+    session may be answered from a near-duplicate cached answer instead of
+    calling the LLM; the turn is still recorded in the checkpoint.
+
+    If the stream is cancelled part-way, the text streamed so far is saved
+    as the reply.
+    """
+    persona_id = str(persona.id)
     config = {"configurable": {"thread_id": session_id, "persona_id": persona_id}}
+    labels = {
+        "persona": persona.username,
+        "model": providers.model_name(persona),
+    }
+
+    coalesce_bytes, coalesce_ms = _coalesce_settings(persona)
+
+    started = time.perf_counter()
+    first_token_at = None
+    sent_bytes = 0
+    usage = None
+    chunks = 0
+    event_id = 0
+    parts = []
+    persisted = False
+    outcome = "error"
+
+    async def tokens():
+        nonlocal usage, chunks
+        # Includes the checkpoint reads/writes LangGraph does around the call
+        llm_started = time.perf_counter()
+        async for token, metadata in agent.astream(
+            input={
+                "messages": [{"role": "user", "content": input_message}],
+            },
+            stream_mode="messages",
+            config=config,
+            context=Context(persona_id=persona_id),
+        ):
+            # Only the answer itself is streamed, not e.g. history summaries.
+            if metadata.get("langgraph_node") != "model":
+                continue
+            if getattr(token, "usage_metadata", None):
+                usage = add_usage(usage, token.usage_metadata)
+            text = token.text
+            if text:
+                if not chunks:
+                    record_span("llm.first_token", time.perf_counter() - llm_started)
+                chunks += 1
+                yield text
+        record_span("llm.stream", time.perf_counter() - llm_started)
+
+    try:
+        agent = get_agent(persona)
+        cache_policy = semantic_cache.SemanticCachePolicy.from_persona(persona)
+        embedding = cached_answer = None
+        if cache_policy.enabled and await _is_first_turn(config):
+            with span("semantic_cache.lookup"):
+                embedding, cached_answer = await semantic_cache.lookup(
+                    persona, input_message, cache_policy
+                )
+        if cached_answer is not None:
+            labels["model"] = "semantic-cache"
+            source = semantic_cache.replay(cached_answer)
+        else:
+            source = tokens()
+
+        async for text in coalesce(source, coalesce_bytes, coalesce_ms / 1000):
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+                STREAM_TTFT.observe(first_token_at - started, **labels)
+            parts.append(text)
+            event_id += 1
+            frame = sse_event("token", {"text": text}, event_id)
+            sent_bytes += len(frame.encode())
+            yield frame
+
+        answer = "".join(parts)
+        with span("persist"):
+            if cached_answer is not None:
+                await agent.aupdate_state(
+                    config,
+                    {"messages": [HumanMessage(input_message), AIMessage(answer)]},
+                    as_node="model",
+                )
+            await _callback_handler(
+                session_id=session_id,
+                role="assistant",
+                message=answer,
+                input_tokens=(usage or {}).get("input_tokens"),
+                output_tokens=(usage or {}).get("output_tokens"),
+                latency_ms=round((time.perf_counter() - started) * 1000),
+            )
+        persisted = True
+        frame = sse_event(
+            "done", {"usage": usage, "cached": cached_answer is not None}, event_id + 1
+        )
+        outcome = "completed"
+        sent_bytes += len(frame.encode())
+        yield frame
 
-    response = ""
-    for token, _ in agent.stream(
-        input={
-            "messages": [{"role": "user", "content": input_message}],
-        },
-        stream_mode="messages",
-        config=config,
-        context=Context(persona_id=persona_id),
-    ):
-        response += token.content
-        yield token.content
-
-    _callback_handler(session_id=session_id, role="assistant", message=response)
+        if embedding is not None and cached_answer is None and answer:
+            await semantic_cache.store(
+                persona, input_message, embedding, answer, cache_policy
+            )
+    except (asyncio.CancelledError, GeneratorExit):
+        outcome = "cancelled"
+        if parts and not persisted:
+            _persist_partial(agent, config, session_id, input_message, "".join(parts))
+        raise
+    except Exception:
+        logger.exception("Chat stream failed for session %s", session_id)
+        frame = sse_event("error", {"message": "Failed to generate a response"})
+        sent_bytes += len(frame.encode())
+        yield frame
+    finally:
+        finished = time.perf_counter()
+        STREAM_DURATION.observe(finished - started, **labels)
+        STREAM_BYTES.inc(sent_bytes, **labels)
+        STREAMS.inc(outcome=outcome, **labels)
+        if usage:
+            INPUT_TOKENS.inc(usage.get("input_tokens") or 0, **labels)
+            cache_read = (usage.get("input_token_details") or {}).get("cache_read")
+            CACHED_INPUT_TOKENS.inc(cache_read or 0, **labels)
+        if first_token_at is not None and finished > first_token_at:
+            output_tokens = (usage or {}).get("output_tokens") or chunks
+            STREAM_TOKEN_RATE.observe(
+                output_tokens / (finished - first_token_at), **labels
+            )
@@ -0,0 +1,60 @@
+import hashlib
+import math
+import re
+from functools import lru_cache
+from typing import List, Protocol
+
+from app.core.config import settings
+from app.models.semantic_cache import EMBEDDING_DIMENSIONS
+
+
+class Embedder(Protocol):
+    async def aembed(self, text: str) -> List[float]: ...
+
+
+class HashEmbedder:
+    """
+    Deterministic, offline embedder.
+
+    Hashes word unigrams and bigrams into a fixed-size signed vector, so
+    identical questions match exactly and rephrasings that share most words
+    score high. Meant for tests, load tests and local development.
+    """
+
+    def __init__(self, dimensions: int = EMBEDDING_DIMENSIONS):
+        self.dimensions = dimensions
+
+    async def aembed(self, text: str) -> List[float]:
+        words = re.findall(r"\w+", text.lower())
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        vector = [0.0] * self.dimensions
+        for feature in features:
+            digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dimensions
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+
+class GoogleEmbedder:
+    def __init__(self, model: str, dimensions: int = EMBEDDING_DIMENSIONS):
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+        self.dimensions = dimensions
+        self._client = GoogleGenerativeAIEmbeddings(
+            model=model, google_api_key=settings.GOOGLE_API_KEY
+        )
+
+    async def aembed(self, text: str) -> List[float]:
+        return await self._client.aembed_query(
+            text,
+            task_type="SEMANTIC_SIMILARITY",
+            output_dimensionality=self.dimensions,
+        )
+
+
+@lru_cache(maxsize=1)
+def get_embedder() -> Embedder:
+    if settings.SEMANTIC_CACHE_EMBEDDER == "hash":
+        return HashEmbedder()
+    return GoogleEmbedder(settings.SEMANTIC_CACHE_EMBEDDING_MODEL)
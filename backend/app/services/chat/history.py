@@ -0,0 +1,134 @@
+from dataclasses import dataclass
+from typing import Any, List, Optional
+
+from langchain.agents.middleware import AgentMiddleware, AgentState
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AnyMessage, HumanMessage, RemoveMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langgraph.constants import TAG_NOSTREAM
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+from langgraph.runtime import Runtime
+
+from app.core.config import settings
+from app.schemas.persona import PersonaResponse
+
+SUMMARY_MESSAGE_ID = "history-summary"
+
+SUMMARY_PROMPT = (
+    "Summarize the conversation below between a visitor and the assistant. "
+    "Keep facts the visitor shared, questions already answered and any "
+    "commitments made. Reply with the summary only.\n\n{messages}"
+)
+
+
+@dataclass(frozen=True)
+class HistoryPolicy:
+    """
+    How much conversation history a persona keeps in its checkpointed state.
+
+    `max_turns` / `max_tokens` of 0 disable that limit. Past `max_turns`
+    the history is cut back to the newest `keep_turns` turns (counting the
+    one being answered; 0 means `max_turns`). A lower `keep_turns` trims
+    (and summarizes) every few turns instead of on every turn, at the cost
+    of a shorter window right after a trim. Past `max_tokens` it is cut
+    back to half the budget.
+    """
+
+    max_turns: int = 0
+    max_tokens: int = 0
+    keep_turns: int = 0
+    summarize: bool = False
+
+    @classmethod
+    def from_persona(cls, persona: PersonaResponse) -> "HistoryPolicy":
+        """Read `custom_settings.history`, falling back to the global settings."""
+        history = (persona.custom_settings or {}).get("history") or {}
+        return cls(
+            max_turns=int(history.get("max_turns", settings.HISTORY_MAX_TURNS)),
+            max_tokens=int(history.get("max_tokens", settings.HISTORY_MAX_TOKENS)),
+            keep_turns=int(history.get("keep_turns", settings.HISTORY_KEEP_TURNS)),
+            summarize=bool(history.get("summarize", settings.HISTORY_SUMMARIZE)),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_turns > 0 or self.max_tokens > 0
+
+    @property
+    def turns_after_trim(self) -> int:
+        if not 0 < self.keep_turns < self.max_turns:
+            return self.max_turns
+        return self.keep_turns
+
+
+def _is_summary(message: AnyMessage) -> bool:
+    return message.id == SUMMARY_MESSAGE_ID
+
+
+def _cutoff(messages: List[AnyMessage], policy: HistoryPolicy) -> int:
+    """Index of the first message to keep (0 when nothing has to go)."""
+    start = 1 if messages and _is_summary(messages[0]) else 0
+    turns = [
+        i for i in range(start, len(messages)) if isinstance(messages[i], HumanMessage)
+    ]
+
+    keep_from = start
+    if policy.max_turns and len(turns) > policy.max_turns:
+        keep_from = turns[-policy.turns_after_trim]
+
+    if policy.max_tokens and (
+        count_tokens_approximately(messages[keep_from:]) > policy.max_tokens
+    ):
+        budget = policy.max_tokens // 2
+        for i in turns:
+            if i < keep_from:
+                continue
+            keep_from = i
+            if count_tokens_approximately(messages[i:]) <= budget:
+                break
+
+    if keep_from == start or not turns:
+        return 0
+    # Never drop the turn that is currently being answered.
+    return min(keep_from, turns[-1])
+
+
+class HistoryMiddleware(AgentMiddleware):
+    """
+    Bound the checkpointed message list with a sliding window.
+
+    Dropped turns are either discarded or folded into a rolling summary
+    message that stays at the head of the history.
+    """
+
+    def __init__(self, policy: HistoryPolicy, model: Optional[BaseChatModel] = None):
+        super().__init__()
+        self.policy = policy
+        self.model = model
+
+    async def abefore_model(
+        self, state: AgentState, runtime: Runtime
+    ) -> Optional[dict[str, Any]]:
+        messages = state["messages"]
+        cutoff = _cutoff(messages, self.policy)
+        if cutoff <= 0:
+            return None
+
+        kept = messages[cutoff:]
+        if self.policy.summarize and self.model is not None:
+            kept = [await self._summarize(messages[:cutoff]), *kept]
+
+        return {"messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES), *kept]}
+
+    async def _summarize(self, dropped: List[AnyMessage]) -> HumanMessage:
+        transcript = "\n".join(
+            f"{message.type}: {message.text}" for message in dropped if message.text
+        )
+        response = await self.model.ainvoke(
+            SUMMARY_PROMPT.format(messages=transcript),
+            config={"tags": [TAG_NOSTREAM]},
+        )
+        return HumanMessage(
+            content=f"Summary of the earlier conversation:\n{response.text.strip()}",
+            id=SUMMARY_MESSAGE_ID,
+        )
@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from langchain.agents.middleware import AgentMiddleware, ModelRequest
+from langchain_core.messages import AnyMessage, HumanMessage
+
+from app.schemas.persona import PersonaResponse
+from app.services.llm import context_cache
+from app.services.llm.context_cache import ContextCachePolicy
+
+ist = timezone(timedelta(hours=5, minutes=30))
+
+
+def stable_prefix(persona: PersonaResponse) -> str:
+    """
+    The system prompt: only fields that change when the persona is edited,
+    so it is byte-identical across turns and cacheable by the provider.
+    """
+    parts = [persona.prompt or ""]
+    if persona.bio:
+        parts.append(f"About you:\n{persona.bio}")
+    if persona.welcome_message:
+        parts.append(f"Visitors are greeted with:\n{persona.welcome_message}")
+    return "\n\n".join(part for part in parts if part)
+
+
+def volatile_context(now: Optional[datetime] = None) -> str:
+    now = now or datetime.now(ist)
+    return f"(The current time is {now:%Y-%m-%d %H:%M} IST.)"
+
+
+def _with_volatile_context(messages: List[AnyMessage]) -> List[AnyMessage]:
+    """Append the volatile context to the latest user message, for this call only."""
+    for index in range(len(messages) - 1, -1, -1):
+        message = messages[index]
+        if isinstance(message, HumanMessage):
+            if isinstance(message.content, str):
+                content = f"{message.content}\n\n{volatile_context()}"
+            else:
+                content = [
+                    *message.content,
+                    {"type": "text", "text": volatile_context()},
+                ]
+            return [
+                *messages[:index],
+                message.model_copy(update={"content": content}),
+                *messages[index + 1 :],
+            ]
+    return messages
+
+
+class PromptMiddleware(AgentMiddleware):
+    """
+    Keep the prompt prefix stable and the volatile parts at the end.
+
+    The time is added to the current user message in the model request only,
+    so it is never checkpointed and never changes the prefix. With a context
+    cache policy the system prompt is replaced by a provider cache handle.
+    """
+
+    def __init__(self, persona: PersonaResponse, policy: ContextCachePolicy):
+        super().__init__()
+        self.persona = persona
+        self.policy = policy
+
+    def wrap_model_call(self, request: ModelRequest, handler):
+        return handler(
+            request.override(messages=_with_volatile_context(request.messages))
+        )
+
+    async def awrap_model_call(self, request: ModelRequest, handler):
+        request = request.override(messages=_with_volatile_context(request.messages))
+        if self.policy.enabled and request.system_prompt:
+            handle = await context_cache.get_handle(
+                self.persona, request.system_prompt, self.policy
+            )
+            if handle is not None:
+                request = request.override(
+                    system_prompt=None,
+                    model_settings={**request.model_settings, "cached_content": handle},
+                )
+        return await handler(request)
@@ -0,0 +1,93 @@
+import logging
+import re
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.crud import semantic_cache as semantic_cache_crud
+from app.schemas.persona import PersonaResponse
+from app.services.chat.embeddings import get_embedder
+
+logger = logging.getLogger(__name__)
+
+LOOKUPS = metrics.Counter(
+    "semantic_cache_lookups_total", "Semantic cache lookups by result"
+)
+
+
+@dataclass(frozen=True)
+class SemanticCachePolicy:
+    """Opt-in per persona via `custom_settings.semantic_cache`."""
+
+    enabled: bool = False
+    threshold: float = 0.92
+
+    @classmethod
+    def from_persona(cls, persona: PersonaResponse) -> "SemanticCachePolicy":
+        options = (persona.custom_settings or {}).get("semantic_cache") or {}
+        return cls(
+            enabled=bool(options.get("enabled", False)),
+            threshold=float(
+                options.get("threshold", settings.SEMANTIC_CACHE_THRESHOLD)
+            ),
+        )
+
+
+async def lookup(
+    persona: PersonaResponse, question: str, policy: SemanticCachePolicy
+) -> tuple[Optional[List[float]], Optional[str]]:
+    """
+    Embed `question` and find a cached answer for the current persona version.
+
+    Returns `(embedding, answer)`; the embedding is reused to store the
+    generated answer on a miss. Failures are logged and treated as a miss
+    without an embedding, so the cache never breaks a chat turn.
+    """
+    try:
+        embedding = await get_embedder().aembed(question)
+        async with AsyncSessionLocal() as db:
+            answer = await semantic_cache_crud.alookup(
+                db,
+                persona_id=persona.id,
+                persona_version=persona.updated_at,
+                embedding=embedding,
+                max_distance=1 - policy.threshold,
+            )
+    except Exception:
+        logger.exception("Semantic cache lookup failed for persona %s", persona.id)
+        LOOKUPS.inc(persona=persona.username, result="error")
+        return None, None
+
+    LOOKUPS.inc(persona=persona.username, result="hit" if answer else "miss")
+    return embedding, answer
+
+
+async def store(
+    persona: PersonaResponse,
+    question: str,
+    embedding: List[float],
+    answer: str,
+    policy: SemanticCachePolicy,
+) -> None:
+    """Store a generated answer, unless a near-duplicate is already cached."""
+    try:
+        async with AsyncSessionLocal() as db:
+            await semantic_cache_crud.astore(
+                db,
+                persona_id=persona.id,
+                persona_version=persona.updated_at,
+                question=question,
+                answer=answer,
+                embedding=embedding,
+                max_distance=1 - policy.threshold,
+            )
+    except Exception:
+        logger.exception("Failed to store semantic cache entry for %s", persona.id)
+
+
+async def replay(answer: str) -> AsyncIterator[str]:
+    """Yield a cached answer word by word, like a model stream."""
+    for word in re.findall(r"\s*\S+\s*", answer):
+        yield word
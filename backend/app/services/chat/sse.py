@@ -0,0 +1,46 @@
+import asyncio
+from typing import AsyncIterator, Optional
+
+import orjson
+
+from app.services.chat.streaming import END, Relay
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Tell nginx (and compatible proxies) not to buffer the stream.
+    "X-Accel-Buffering": "no",
+}
+
+
+def sse_event(event: str, data: dict, event_id: Optional[int] = None) -> str:
+    """Format one Server-Sent Event with a JSON payload."""
+    frame = f"event: {event}\ndata: {orjson.dumps(data).decode()}\n\n"
+    if event_id is not None:
+        frame = f"id: {event_id}\n{frame}"
+    return frame
+
+
+def sse_comment(text: str) -> str:
+    return f": {text}\n\n"
+
+
+async def with_keepalive(
+    frames: AsyncIterator[str], interval: float
+) -> AsyncIterator[str]:
+    """
+    Relay `frames`, emitting a comment line whenever the source has been
+    silent for `interval` seconds so proxies and clients keep the connection.
+    """
+    relay = Relay(frames)
+    try:
+        while True:
+            try:
+                frame = await relay.get(interval)
+            except asyncio.TimeoutError:
+                yield sse_comment("keepalive")
+                continue
+            if frame is END:
+                break
+            yield frame
+    finally:
+        await relay.aclose()
@@ -0,0 +1,95 @@
+import asyncio
+from contextlib import aclosing
+from typing import AsyncIterator, List, Optional
+
+END = object()
+
+
+class Relay:
+    """
+    Drain an async iterator from a background task into a queue.
+
+    Lets a consumer wait for the next item with a timeout without
+    cancelling (and so breaking) the source generator.
+    """
+
+    def __init__(self, source: AsyncIterator, maxsize: int = 1):
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._task = asyncio.create_task(self._pump(source))
+
+    async def _pump(self, source: AsyncIterator) -> None:
+        try:
+            async with aclosing(source):
+                async for item in source:
+                    await self._queue.put(item)
+            await self._queue.put(END)
+        except Exception as exc:
+            await self._queue.put(exc)
+
+    async def get(self, timeout: Optional[float] = None):
+        """Next item, END when exhausted; raises TimeoutError or the source's error."""
+        item = await asyncio.wait_for(self._queue.get(), timeout)
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    async def aclose(self) -> None:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+async def coalesce(
+    chunks: AsyncIterator[str], max_bytes: int, max_delay: float
+) -> AsyncIterator[str]:
+    """
+    Merge small text chunks into larger ones.
+
+    A merged chunk is released once it reaches `max_bytes` or has been held
+    for `max_delay` seconds, whichever comes first. The very first chunk is
+    released immediately so time-to-first-token is unaffected.
+    """
+    if max_bytes <= 1 or max_delay <= 0:
+        async with aclosing(chunks):
+            async for chunk in chunks:
+                yield chunk
+        return
+
+    loop = asyncio.get_running_loop()
+    relay = Relay(chunks, maxsize=0)
+    buffer: List[str] = []
+    size = 0
+    deadline = 0.0
+    first = True
+    try:
+        while True:
+            timeout = max(deadline - loop.time(), 0) if buffer else None
+            try:
+                chunk = await relay.get(timeout)
+            except asyncio.TimeoutError:
+                yield "".join(buffer)
+                buffer, size = [], 0
+                continue
+            except Exception:
+                if buffer:
+                    yield "".join(buffer)
+                raise
+            if chunk is END:
+                break
+            if first:
+                first = False
+                yield chunk
+                continue
+            if not buffer:
+                deadline = loop.time() + max_delay
+            buffer.append(chunk)
+            size += len(chunk.encode())
+            if size >= max_bytes or loop.time() >= deadline:
+                yield "".join(buffer)
+                buffer, size = [], 0
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        await relay.aclose()
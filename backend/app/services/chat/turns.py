@@ -0,0 +1,139 @@
+"""
+Detached chat turns.
+
+A turn runs `conversation()` in its own task and appends the SSE frames it
+produces to a bounded per-turn buffer. HTTP responses only attach to the
+buffer: a client that disconnects doesn't stop (or waste) the generation,
+and it can re-attach with `Last-Event-ID` to receive the rest. Finished
+turns are kept for `retention` seconds so late re-attaches and repeated
+submits with the same `Idempotency-Key` still find them.
+
+Turns live in the worker process that started them; with several workers
+a re-attach only succeeds when it reaches the same worker. Idempotency keys
+are also claimed in Postgres (`chat_turn_keys`), so a repeated submit that
+reaches another worker is refused rather than generated twice.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import AsyncIterator, Callable, Deque, Dict, Optional, Tuple
+
+from app.core import metrics
+from app.core.config import settings
+from app.services.chat.admission import Ticket
+
+ATTACHED = metrics.Counter("chat_turn_attaches_total", "Chat stream attaches by kind")
+
+
+class FramesExpired(Exception):
+    """The frames after the requested event id are no longer buffered."""
+
+
+class Turn:
+    def __init__(self, session_id: str, idempotency_key: Optional[str], max_frames):
+        self.session_id = session_id
+        self.idempotency_key = idempotency_key
+        # (sequence number, frame); the sequence number matches the SSE id
+        self._frames: Deque[Tuple[int, str]] = deque(maxlen=max_frames)
+        self._last_seq = 0
+        self._changed = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def done(self) -> bool:
+        return self.finished_at is not None
+
+    def _append(self, frame: str) -> None:
+        self._last_seq += 1
+        self._frames.append((self._last_seq, frame))
+        self._wake()
+
+    def _finish(self) -> None:
+        self.finished_at = time.monotonic()
+        self._wake()
+
+    def _wake(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def can_resume(self, after: int) -> bool:
+        return not self._frames or self._frames[0][0] <= after + 1
+
+    async def frames(self, after: int = 0) -> AsyncIterator[str]:
+        """
+        Frames with a sequence number above `after`, waiting for new ones
+        until the turn finishes. Raises FramesExpired if some were dropped.
+        """
+        while True:
+            if not self.can_resume(after):
+                raise FramesExpired()
+            pending = [(seq, frame) for seq, frame in self._frames if seq > after]
+            changed, done = self._changed, self.done
+            for seq, frame in pending:
+                yield frame
+                after = seq
+            if done:
+                return
+            if not pending:
+                await changed.wait()
+
+
+class TurnRegistry:
+    """Running and recently finished turns, per worker process."""
+
+    def __init__(self, max_frames: int, retention: float):
+        self.max_frames = max_frames
+        self.retention = retention
+        self._by_session: Dict[str, Turn] = {}
+        self._by_key: Dict[Tuple[str, str], Turn] = {}
+
+    def get(self, session_id: str) -> Optional[Turn]:
+        self._evict()
+        return self._by_session.get(session_id)
+
+    def find(self, session_id: str, idempotency_key: str) -> Optional[Turn]:
+        self._evict()
+        return self._by_key.get((session_id, idempotency_key))
+
+    def start(
+        self,
+        session_id: str,
+        idempotency_key: Optional[str],
+        frames: Callable[[], AsyncIterator[str]],
+        ticket: Ticket,
+    ) -> Turn:
+        """Run `frames()` in the background; the turn owns `ticket` until it ends."""
+        self._evict()
+        turn = Turn(session_id, idempotency_key, self.max_frames)
+        self._by_session[session_id] = turn
+        if idempotency_key:
+            self._by_key[(session_id, idempotency_key)] = turn
+        turn.task = asyncio.create_task(self._run(turn, frames, ticket))
+        # A drain that times out cancels the turn itself, not a request.
+        ticket.task = turn.task
+        return turn
+
+    async def _run(self, turn: Turn, frames, ticket: Ticket) -> None:
+        try:
+            async for frame in frames():
+                turn._append(frame)
+        finally:
+            turn._finish()
+            ticket.release()
+
+    def _evict(self) -> None:
+        cutoff = time.monotonic() - self.retention
+        for session_id, turn in list(self._by_session.items()):
+            if turn.done and turn.finished_at < cutoff:
+                del self._by_session[session_id]
+        for key, turn in list(self._by_key.items()):
+            if turn.done and turn.finished_at < cutoff:
+                del self._by_key[key]
+
+
+turns = TurnRegistry(
+    max_frames=settings.CHAT_TURN_BUFFER_FRAMES,
+    retention=settings.CHAT_TURN_RETENTION,
+)
@@ -0,0 +1,28 @@
+import logging
+
+from app.core.database import AsyncSessionLocal
+from app.crud import persona as persona_crud
+from app.services.chat.agent import get_agent
+
+logger = logging.getLogger(__name__)
+
+
+async def warm_up(limit: int) -> int:
+    """
+    Cache snapshots and build the models and agents of the newest `limit`
+    active personas, so their first chat turn doesn't pay for it.
+    Returns how many were built.
+    """
+    async with AsyncSessionLocal() as db:
+        personas = await persona_crud.aget_active(db, limit=limit)
+
+    built = 0
+    for persona in personas:
+        snapshot = persona_crud.cache_snapshot(persona)
+        try:
+            get_agent(snapshot)
+        except Exception:
+            logger.warning("Could not warm up persona %s", snapshot.id, exc_info=True)
+            continue
+        built += 1
+    return built
@@ -0,0 +1,189 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DBAPIError, OperationalError
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models import ChatMessage
+
+logger = logging.getLogger(__name__)
+
+_Pending = Tuple[dict, Optional[asyncio.Future]]
+
+_WRITE_ATTEMPTS = 3
+
+DROPPED = metrics.Counter(
+    "chat_messages_dropped_total", "Chat messages that could not be written"
+)
+
+
+def _is_transient(exc: Exception) -> bool:
+    # Constraint and data errors fail the same way on every attempt.
+    return isinstance(exc, OperationalError) or (
+        isinstance(exc, DBAPIError) and exc.connection_invalidated
+    )
+
+
+class MessageWriter:
+    """
+    Write-behind queue for chat messages.
+
+    Messages are buffered in memory and inserted with one multi-row INSERT
+    per batch, flushed when `batch_size` rows are queued or `flush_interval`
+    seconds have passed since the first one, whichever comes first.
+    `save(..., wait=True)` resolves only after the batch holding the message
+    has committed, for callers that need read-your-writes.
+    """
+
+    def __init__(self, batch_size: int, flush_interval: float, max_queue: int):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue[_Pending] = asyncio.Queue(maxsize=max_queue)
+        self._task: Optional[asyncio.Task] = None
+        self._batch: List[_Pending] = []
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def flush(self) -> None:
+        """Wait until everything queued so far has been written."""
+        if self._task is not None:
+            await self._queue.join()
+
+    async def close(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop accepting work once everything queued has been written, or once
+        `timeout` seconds have passed; whatever is still queued then is lost.
+        """
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self.flush(), timeout)
+        except asyncio.TimeoutError:
+            unwritten = len(self._batch) + self._queue.qsize()
+            logger.warning(
+                "Dropping %d chat messages still unwritten after %.0fs",
+                unwritten,
+                timeout,
+            )
+            DROPPED.inc(unwritten, reason="shutdown")
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def save(
+        self,
+        session_id: UUID,
+        role: str,
+        content: str,
+        wait: Optional[bool] = None,
+        input_tokens: Optional[int] = None,
+        output_tokens: Optional[int] = None,
+        latency_ms: Optional[int] = None,
+    ) -> None:
+        if wait is None:
+            wait = settings.CHAT_WRITE_STRICT
+        row = {
+            "session_id": session_id,
+            "role": role,
+            "content": content,
+            "timestamp": datetime.now(),
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "latency_ms": latency_ms,
+        }
+        done = asyncio.get_running_loop().create_future() if wait else None
+        if self._task is None:
+            # Not running inside the app lifespan (scripts): write through.
+            await self._write([(row, done)])
+        else:
+            await self._queue.put((row, done))
+        if wait:
+            await done
+
+    async def _run(self) -> None:
+        while True:
+            self._batch = batch = [await self._queue.get()]
+            deadline = asyncio.get_running_loop().time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._write(batch)
+            finally:
+                self._batch = []
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _insert(self, rows: List[dict]) -> None:
+        for attempt in range(_WRITE_ATTEMPTS):
+            try:
+                async with AsyncSessionLocal() as db:
+                    # Core, not an ORM bulk insert: that leaves out None
+                    # values and splits the batch into an INSERT per key set
+                    await db.execute(insert(ChatMessage.__table__), rows)
+                    await db.commit()
+                return
+            except Exception as exc:
+                if not _is_transient(exc) or attempt == _WRITE_ATTEMPTS - 1:
+                    raise
+                await asyncio.sleep(0.5 * (attempt + 1))
+
+    async def _write(self, batch: List[_Pending]) -> None:
+        """
+        Insert the batch, retrying transient errors. If it fails for any
+        other reason the rows are inserted one by one, so only the rows that
+        are actually bad are dropped.
+        """
+        errors: List[Optional[Exception]] = [None] * len(batch)
+        try:
+            await self._insert([row for row, _ in batch])
+        except Exception as exc:
+            if _is_transient(exc) or len(batch) == 1:
+                errors = [exc] * len(batch)
+            else:
+                for i, (row, _) in enumerate(batch):
+                    try:
+                        await self._insert([row])
+                    except Exception as row_exc:
+                        errors[i] = row_exc
+
+        failed = [error for error in errors if error is not None]
+        if failed:
+            for error in failed:
+                DROPPED.inc(reason="transient" if _is_transient(error) else "rejected")
+            logger.error(
+                "Dropping %d of %d chat messages",
+                len(failed),
+                len(batch),
+                exc_info=failed[0],
+            )
+        for (_, done), error in zip(batch, errors):
+            if done is None or done.done():
+                continue
+            if error is None:
+                done.set_result(None)
+            else:
+                done.set_exception(error)
+
+
+message_writer = MessageWriter(
+    batch_size=settings.CHAT_WRITE_BATCH_SIZE,
+    flush_interval=settings.CHAT_WRITE_FLUSH_INTERVAL,
+    max_queue=settings.CHAT_WRITE_MAX_QUEUE,
+)
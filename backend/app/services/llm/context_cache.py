@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from cachetools import LRUCache
+
+from app.core import metrics
+from app.core.config import settings
+from app.crud import persona as persona_crud
+from app.schemas.persona import PersonaResponse
+from app.services.llm import providers
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_CACHES = metrics.Counter(
+    "llm_context_caches_total", "Provider context caches created, by result"
+)
+
+# Renew a handle this long before it expires so a call never uses a dead one
+_RENEW_MARGIN = 60.0
+
+# Don't retry creating a cache for a persona version that failed (e.g. the
+# prefix is below the provider's minimum size) for this long
+_FAILURE_BACKOFF = 600.0
+
+
+@dataclass(frozen=True)
+class ContextCachePolicy:
+    """Opt-in per persona via `custom_settings.context_cache`."""
+
+    enabled: bool = False
+    ttl: int = 3600
+
+    @classmethod
+    def from_persona(cls, persona: PersonaResponse) -> "ContextCachePolicy":
+        options = (persona.custom_settings or {}).get("context_cache") or {}
+        provider = providers.get_provider(persona.llm_provider)
+        return cls(
+            enabled=bool(options.get("enabled", settings.CONTEXT_CACHE_ENABLED))
+            and provider.create_context_cache is not None,
+            ttl=int(options.get("ttl", settings.CONTEXT_CACHE_TTL)),
+        )
+
+
+_Key = Tuple[str, object]
+
+# (persona id, updated_at) -> (handle or None after a failure, valid until),
+# bounded like the agent cache; evicted handles expire upstream
+_handles: LRUCache = LRUCache(maxsize=100)
+_locks: LRUCache = LRUCache(maxsize=100)
+
+
+async def get_handle(
+    persona: PersonaResponse, system_prompt: str, policy: ContextCachePolicy
+) -> Optional[str]:
+    """
+    Provider context-cache handle for the persona's current version.
+
+    Created on first use and renewed before it expires; one per worker and
+    persona version. Returns None when no cache can be used, in which case
+    the caller sends the system prompt as usual.
+    """
+    key = (str(persona.id), persona.updated_at)
+    cached = _handles.get(key)
+    if cached is not None and cached[1] > time.monotonic():
+        return cached[0]
+
+    lock = _locks.get(key)
+    if lock is None:
+        lock = _locks[key] = asyncio.Lock()
+    async with lock:
+        cached = _handles.get(key)
+        if cached is not None and cached[1] > time.monotonic():
+            return cached[0]
+
+        provider = providers.get_provider(persona.llm_provider)
+        try:
+            handle = await provider.create_context_cache(
+                providers.model_name(persona), system_prompt, policy.ttl
+            )
+        except Exception:
+            logger.warning(
+                "Could not create a context cache for persona %s",
+                persona.id,
+                exc_info=True,
+            )
+            CONTEXT_CACHES.inc(result="error")
+            _handles[key] = (None, time.monotonic() + _FAILURE_BACKOFF)
+            return None
+
+        CONTEXT_CACHES.inc(result="created")
+        _forget_versions(key)
+        _handles[key] = (handle, time.monotonic() + policy.ttl - _RENEW_MARGIN)
+        return handle
+
+
+def _forget_versions(key: _Key) -> None:
+    """Drop handles of older versions of the same persona; they expire upstream."""
+    for other in [k for k in _handles if k[0] == key[0] and k != key]:
+        _handles.pop(other, None)
+        _locks.pop(other, None)
+
+
+def invalidate_persona(persona_id) -> None:
+    """Drop the handles of a persona (None = all)."""
+    for cache in (_handles, _locks):
+        for key in [
+            key for key in cache if persona_id is None or key[0] == str(persona_id)
+        ]:
+            cache.pop(key, None)
+
+
+persona_crud.register_invalidation_hook(invalidate_persona)
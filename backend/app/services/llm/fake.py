@@ -0,0 +1,143 @@
+import asyncio
+import hashlib
+import random
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    BaseMessage,
+    SystemMessage,
+)
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+WORDS = (
+    "the quick answer depends on what you want to build and how much time "
+    "you have so start small ship often measure everything and keep the "
+    "parts that work while replacing the ones that do not"
+).split()
+
+
+# Fake provider context caches: handle -> approximate cached token count
+_context_caches: Dict[str, int] = {}
+
+
+async def create_fake_context_cache(model: str, system_prompt: str, ttl: int) -> str:
+    digest = hashlib.blake2b(system_prompt.encode(), digest_size=8).hexdigest()
+    name = f"cachedContents/fake-{digest}"
+    _context_caches[name] = count_tokens_approximately([SystemMessage(system_prompt)])
+    return name
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic local chat model for load tests and development.
+
+    The reply is a pseudo-random sentence seeded by the last message, so the
+    same question always gets the same answer. Streaming waits `latency`
+    seconds before the first token and then emits `tokens_per_second`.
+    A `cached_content` handle from `create_fake_context_cache` is reported as
+    cache-read input tokens, like the real providers do.
+    """
+
+    model: str = "fake"
+    latency: float = 0.3
+    tokens_per_second: float = 50.0
+    response_tokens: int = 60
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _reply(self, messages: List[BaseMessage], max_tokens: Optional[int]) -> list:
+        seed = messages[-1].text if messages else ""
+        rng = random.Random(hashlib.blake2b(seed.encode(), digest_size=8).digest())
+        count = min(self.response_tokens, max_tokens or self.response_tokens)
+        return [rng.choice(WORDS) for _ in range(count)]
+
+    def _usage(
+        self,
+        messages: List[BaseMessage],
+        output_tokens: int,
+        cached_content: Optional[str] = None,
+    ) -> dict:
+        cached = _context_caches.get(cached_content, 0) if cached_content else 0
+        input_tokens = count_tokens_approximately(messages) + cached
+        usage = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+        if cached:
+            usage["input_token_details"] = {"cache_read": cached}
+        return usage
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        max_tokens: Optional[int] = None,
+        cached_content: Optional[str] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        words = self._reply(messages, max_tokens)
+        message = AIMessage(
+            content=" ".join(words),
+            usage_metadata=self._usage(messages, len(words), cached_content),
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _chunks(
+        self, messages, max_tokens, cached_content
+    ) -> Iterator[ChatGenerationChunk]:
+        words = self._reply(messages, max_tokens)
+        for i, word in enumerate(words):
+            yield ChatGenerationChunk(
+                message=AIMessageChunk(content=word if i == 0 else f" {word}")
+            )
+        yield ChatGenerationChunk(
+            message=AIMessageChunk(
+                content="",
+                usage_metadata=self._usage(messages, len(words), cached_content),
+            )
+        )
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        max_tokens: Optional[int] = None,
+        cached_content: Optional[str] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency)
+        chunks = self._chunks(messages, max_tokens, cached_content)
+        for i, chunk in enumerate(chunks):
+            if i and chunk.text and self.tokens_per_second:
+                time.sleep(1 / self.tokens_per_second)
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        max_tokens: Optional[int] = None,
+        cached_content: Optional[str] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency)
+        chunks = self._chunks(messages, max_tokens, cached_content)
+        for i, chunk in enumerate(chunks):
+            if i and chunk.text and self.tokens_per_second:
+                await asyncio.sleep(1 / self.tokens_per_second)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
@@ -0,0 +1,146 @@
+import threading
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from langchain.agents.middleware import AgentMiddleware, ModelRequest
+from langchain_core.language_models import BaseChatModel
+
+from app.core.config import settings
+from app.schemas.persona import PersonaResponse
+from app.services.llm.fake import FakeChatModel, create_fake_context_cache
+
+
+@dataclass(frozen=True)
+class Provider:
+    """
+    How to build a chat model for an `llm_provider` value.
+
+    `create(model_name)` builds the shared client for one model and
+    `call_settings(temperature, max_tokens)` returns the per-call kwargs that
+    apply a persona's generation settings to it. Providers with explicit
+    context caching set `create_context_cache(model_name, system_prompt,
+    ttl_seconds)`, which returns a handle passed back as `cached_content`.
+    """
+
+    default_model: str
+    create: Callable[[str], BaseChatModel]
+    call_settings: Callable[[float, int], Dict[str, Any]]
+    create_context_cache: Optional[Callable[[str, str, int], Awaitable[str]]] = None
+
+
+_providers: Dict[str, Provider] = {}
+
+# One model (and so one HTTP/gRPC client) per (provider, model name), shared
+# by every persona that uses it.
+_models: Dict[Tuple[str, str], BaseChatModel] = {}
+_models_lock = threading.Lock()
+
+
+def register_provider(name: str, provider: Provider) -> None:
+    _providers[name] = provider
+
+
+def get_provider(name: str) -> Provider:
+    try:
+        return _providers[name]
+    except KeyError:
+        raise ValueError(f"Unknown LLM provider: {name!r}") from None
+
+
+def model_name(persona: PersonaResponse) -> str:
+    if persona.llm_model:
+        return persona.llm_model
+    provider = _providers.get(persona.llm_provider)
+    return provider.default_model if provider else persona.llm_provider
+
+
+def get_chat_model(persona: PersonaResponse) -> BaseChatModel:
+    provider = get_provider(persona.llm_provider)
+    key = (persona.llm_provider, model_name(persona))
+    with _models_lock:
+        model = _models.get(key)
+        if model is None:
+            model = _models[key] = provider.create(key[1])
+    return model
+
+
+def call_settings(persona: PersonaResponse) -> Dict[str, Any]:
+    provider = get_provider(persona.llm_provider)
+    return provider.call_settings(persona.temperature, persona.max_tokens)
+
+
+class ModelSettingsMiddleware(AgentMiddleware):
+    """Apply a persona's temperature and max_tokens to each model call."""
+
+    def __init__(self, model_settings: Dict[str, Any]):
+        super().__init__()
+        self.model_settings = model_settings
+
+    def wrap_model_call(self, request: ModelRequest, handler):
+        return handler(self._apply(request))
+
+    async def awrap_model_call(self, request: ModelRequest, handler):
+        return await handler(self._apply(request))
+
+    def _apply(self, request: ModelRequest) -> ModelRequest:
+        return request.override(
+            model_settings={**self.model_settings, **request.model_settings}
+        )
+
+
+def _create_google(model: str) -> BaseChatModel:
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    return ChatGoogleGenerativeAI(model=model, google_api_key=settings.GOOGLE_API_KEY)
+
+
+async def _create_google_context_cache(model: str, system_prompt: str, ttl: int) -> str:
+    from google.ai import generativelanguage_v1beta as genai
+    from google.protobuf import duration_pb2
+
+    client = genai.CacheServiceAsyncClient(
+        client_options={"api_key": settings.GOOGLE_API_KEY}
+    )
+    cache = await client.create_cached_content(
+        cached_content=genai.CachedContent(
+            model=model if model.startswith("models/") else f"models/{model}",
+            system_instruction=genai.Content(parts=[genai.Part(text=system_prompt)]),
+            ttl=duration_pb2.Duration(seconds=ttl),
+        )
+    )
+    return cache.name
+
+
+def _create_fake(model: str) -> BaseChatModel:
+    return FakeChatModel(
+        model=model,
+        latency=settings.FAKE_LLM_LATENCY_MS / 1000,
+        tokens_per_second=settings.FAKE_LLM_TOKENS_PER_SECOND,
+        response_tokens=settings.FAKE_LLM_RESPONSE_TOKENS,
+    )
+
+
+register_provider(
+    "google",
+    Provider(
+        default_model="gemini-2.5-flash-lite",
+        create=_create_google,
+        call_settings=lambda temperature, max_tokens: {
+            "generation_config": {
+                "temperature": temperature,
+                "max_output_tokens": max_tokens,
+            }
+        },
+        create_context_cache=_create_google_context_cache,
+    ),
+)
+
+register_provider(
+    "fake",
+    Provider(
+        default_model="fake",
+        create=_create_fake,
+        call_settings=lambda temperature, max_tokens: {"max_tokens": max_tokens},
+        create_context_cache=create_fake_context_cache,
+    ),
+)
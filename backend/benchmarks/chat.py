@@ -0,0 +1,326 @@
+"""
+Chat pipeline benchmark.
+
+    python -m benchmarks.chat [--conversations 50] [--concurrency 10]
+                              [--turns 3] [--output results.json]
+                              [--max-statements-per-turn N]
+                              [--max-sql-statements-per-init N]
+                              [--max-sql-statements-per-turn N]
+                              [--max-ttft-p95 SECONDS]
+
+Starts the real FastAPI app in-process (uvicorn on a free port, full
+lifespan) against the configured Postgres, creates a throwaway persona on
+the local fake LLM provider and drives `/v1/chat/init` + `/v1/chat/stream`
+over HTTP. Reports time-to-first-token, full-response latency, throughput,
+database statements per turn and checkpoint bytes per turn as JSON, then
+deletes everything it created.
+
+Exits with status 1 when a `--max-*` threshold is exceeded, so it can gate
+a deploy.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+import uuid
+from collections import Counter
+from typing import List, Optional, Tuple
+
+import httpx
+import psycopg
+import uvicorn
+from sqlalchemy import event, text
+
+from app.core.config import settings
+from app.core.database import SessionLocal, async_engine, engine
+from app.crud import persona as persona_crud
+from app.schemas.persona import PersonaCreate
+
+QUESTIONS = (
+    "What are you working on at the moment?",
+    "How did you get started?",
+    "What would you recommend to someone new to the field?",
+    "What is the hardest problem you have solved?",
+)
+
+_CHECKPOINT_BYTES = text("""
+    SELECT
+      (SELECT coalesce(sum(pg_column_size(c.*)), 0)
+         FROM checkpoints c WHERE thread_id = ANY(:threads))
+    + (SELECT coalesce(sum(pg_column_size(b.*)), 0)
+         FROM checkpoint_blobs b WHERE thread_id = ANY(:threads))
+    + (SELECT coalesce(sum(pg_column_size(w.*)), 0)
+         FROM checkpoint_writes w WHERE thread_id = ANY(:threads))
+    """)
+
+_CLEANUP = (
+    text("DELETE FROM chat_messages WHERE session_id = ANY(:sessions)"),
+    text("DELETE FROM checkpoints WHERE thread_id = ANY(:threads)"),
+    text("DELETE FROM checkpoint_blobs WHERE thread_id = ANY(:threads)"),
+    text("DELETE FROM checkpoint_writes WHERE thread_id = ANY(:threads)"),
+    text("DELETE FROM sessions WHERE id = ANY(:sessions)"),
+    text("DELETE FROM personas WHERE id = :persona_id"),
+)
+
+
+class StatementCounter:
+    """Counts statements sent by SQLAlchemy and by the psycopg checkpointer."""
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def install(self) -> None:
+        for name, target in (("sqlalchemy", engine), ("sqlalchemy", async_engine)):
+            sync_engine = getattr(target, "sync_engine", target)
+            event.listen(
+                sync_engine,
+                "before_cursor_execute",
+                lambda *args, _name=name, **kwargs: self.counts.update([_name]),
+            )
+
+        counts = self.counts
+        execute = psycopg.AsyncCursor.execute
+        executemany = psycopg.AsyncCursor.executemany
+
+        async def counted_execute(cursor, query, params=None, **kwargs):
+            counts["checkpointer"] += 1
+            return await execute(cursor, query, params, **kwargs)
+
+        async def counted_executemany(cursor, query, params_seq, **kwargs):
+            params_seq = list(params_seq)
+            counts["checkpointer"] += len(params_seq)
+            return await executemany(cursor, query, params_seq, **kwargs)
+
+        psycopg.AsyncCursor.execute = counted_execute
+        psycopg.AsyncCursor.executemany = counted_executemany
+
+    def take(self) -> Counter:
+        """Return the counts so far and start again from zero."""
+        counts = Counter(self.counts)
+        self.counts.clear()
+        return counts
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return round(ordered[rank - 1], 4)
+
+
+def summarize(values: List[float]) -> dict:
+    return {
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": round(max(values), 4) if values else None,
+    }
+
+
+async def start_server() -> Tuple[uvicorn.Server, asyncio.Task]:
+    from app.core.security import limiter
+    from app.main import app
+
+    # The benchmark drives every request from one IP.
+    limiter.enabled = False
+
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning")
+    )
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.05)
+    return server, task
+
+
+def server_url(server: uvicorn.Server) -> str:
+    host, port = server.servers[0].sockets[0].getsockname()[:2]
+    return f"http://{host}:{port}"
+
+
+async def run_turn(client: httpx.AsyncClient, session_id: str, question: str):
+    """Stream one reply; returns (ttft, total) or raises on an error event."""
+    started = time.perf_counter()
+    ttft = None
+    current_event = None
+    async with client.stream(
+        "POST", f"/v1/chat/stream/{session_id}", json={"input_message": question}
+    ) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if line.startswith("event:"):
+                current_event = line.split(":", 1)[1].strip()
+            elif line.startswith("data:"):
+                if current_event == "token" and ttft is None:
+                    ttft = time.perf_counter() - started
+                elif current_event == "error":
+                    raise RuntimeError(line)
+                elif current_event == "done":
+                    break
+    return ttft, time.perf_counter() - started
+
+
+async def run(args) -> dict:
+    settings.FAKE_LLM_LATENCY_MS = args.llm_latency_ms
+    settings.FAKE_LLM_TOKENS_PER_SECOND = args.llm_tokens_per_second
+
+    with SessionLocal() as db:
+        persona = persona_crud.create(
+            db,
+            PersonaCreate(
+                username=f"bench-{uuid.uuid4().hex[:12]}",
+                public_name="Benchmark",
+                prompt="You are a benchmark persona.",
+                llm_provider="fake",
+            ),
+        )
+
+    counter = StatementCounter()
+    counter.install()
+    server, server_task = await start_server()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    sessions: List[str] = []
+    ttfts: List[float] = []
+    totals: List[float] = []
+    errors = Counter()
+
+    try:
+        async with httpx.AsyncClient(
+            base_url=server_url(server),
+            timeout=60,
+            limits=httpx.Limits(max_connections=args.concurrency * 2),
+        ) as client:
+
+            async def init_session():
+                async with semaphore:
+                    response = await client.get(f"/v1/chat/init/{persona.id}")
+                    response.raise_for_status()
+                    sessions.append(response.json()["session_id"])
+
+            async def converse(session_id: str):
+                async with semaphore:
+                    for turn in range(args.turns):
+                        try:
+                            ttft, total = await run_turn(
+                                client, session_id, QUESTIONS[turn % len(QUESTIONS)]
+                            )
+                        except Exception as exc:
+                            errors[type(exc).__name__] += 1
+                            return
+                        if ttft is not None:
+                            ttfts.append(ttft)
+                        totals.append(total)
+
+            counter.take()
+            await asyncio.gather(*(init_session() for _ in range(args.conversations)))
+            init_statements = counter.take()
+
+            started = time.perf_counter()
+            await asyncio.gather(*(converse(session_id) for session_id in sessions))
+            elapsed = time.perf_counter() - started
+
+            from app.services.chat.writer import message_writer
+
+            await message_writer.flush()
+            turn_statements = counter.take()
+    finally:
+        server.should_exit = True
+        await server_task
+
+    turns = len(totals)
+    params = {
+        "sessions": [uuid.UUID(s) for s in sessions],
+        "threads": sessions,
+        "persona_id": persona.id,
+    }
+    with engine.begin() as conn:
+        checkpoint_bytes = conn.execute(_CHECKPOINT_BYTES, params).scalar_one()
+        if not args.keep:
+            for statement in _CLEANUP:
+                conn.execute(statement, params)
+
+    return {
+        "config": {
+            "conversations": args.conversations,
+            "concurrency": args.concurrency,
+            "turns": args.turns,
+            "llm_latency_ms": args.llm_latency_ms,
+            "llm_tokens_per_second": args.llm_tokens_per_second,
+        },
+        "turns": turns,
+        "errors": dict(errors),
+        "duration_seconds": round(elapsed, 3),
+        "turns_per_second": round(turns / elapsed, 3) if elapsed else None,
+        "ttft_seconds": summarize(ttfts),
+        "response_seconds": summarize(totals),
+        "db_statements_per_init": {
+            name: round(count / max(len(sessions), 1), 2)
+            for name, count in init_statements.items()
+        },
+        "db_statements_per_turn": {
+            name: round(count / max(turns, 1), 2)
+            for name, count in turn_statements.items()
+        },
+        "checkpoint_bytes_per_turn": round(checkpoint_bytes / max(turns, 1)),
+    }
+
+
+def check(result: dict, args) -> List[str]:
+    failures = []
+    per_turn = sum(result["db_statements_per_turn"].values())
+    if args.max_statements_per_turn is not None and (
+        per_turn > args.max_statements_per_turn
+    ):
+        failures.append(
+            f"{per_turn} statements per turn > {args.max_statements_per_turn}"
+        )
+    # SQLAlchemy only, i.e. the app's own data access without the checkpointer
+    for phase in ("init", "turn"):
+        limit = getattr(args, f"max_sql_statements_per_{phase}")
+        count = result[f"db_statements_per_{phase}"].get("sqlalchemy", 0)
+        if limit is not None and count > limit:
+            failures.append(f"{count} SQL statements per {phase} > {limit}")
+    p95 = result["ttft_seconds"]["p95"]
+    if args.max_ttft_p95 is not None and (p95 is None or p95 > args.max_ttft_p95):
+        failures.append(f"TTFT p95 {p95}s > {args.max_ttft_p95}s")
+    if result["errors"]:
+        failures.append(f"errors: {result['errors']}")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--conversations", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=100.0)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--max-statements-per-turn", type=float)
+    parser.add_argument("--max-sql-statements-per-init", type=float)
+    parser.add_argument("--max-sql-statements-per-turn", type=float)
+    parser.add_argument("--max-ttft-p95", type=float)
+    parser.add_argument("--keep", action="store_true", help="keep the benchmark's rows")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    failures = check(result, args)
+    result["failures"] = failures
+
+    report = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as out:
+            out.write(report + "\n")
+    print(report)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+import asyncio
+import os
+import re
+import uuid
+
+import pytest
+
+from app.api.v1.endpoints.chat import _admission_error
+from app.core.config import settings
+from app.services.chat.admission import (
+    CANCEL_GRACE,
+    AdmissionController,
+    AdmissionRejected,
+    SessionLocks,
+    per_worker,
+)
+
+
+def _controller(
+    max_streams=1,
+    max_streams_per_persona=0,
+    max_waiting=0,
+    wait_timeout=1.0,
+    session_locks=None,
+):
+    return AdmissionController(
+        max_streams=max_streams,
+        max_streams_per_persona=max_streams_per_persona,
+        max_waiting=max_waiting,
+        wait_timeout=wait_timeout,
+        session_locks=session_locks,
+    )
+
+
+def _idle(controller):
+    stats = controller.stats()
+    return (
+        stats["active"] == 0
+        and stats["waiting"] == 0
+        and stats["sessions"] == 0
+        and stats["per_persona"] == {}
+    )
+
+
+async def _queued(controller, count=1):
+    """Let queued acquires reach their wait."""
+    for _ in range(100):
+        if controller.stats()["waiting"] == count:
+            return
+        await asyncio.sleep(0)
+    raise AssertionError("acquire never queued")
+
+
+async def test_release_returns_the_slot():
+    controller = _controller()
+
+    ticket = await controller.acquire("p", "s1")
+    assert controller.stats()["active"] == 1
+    ticket.release()
+    ticket.release()  # idempotent
+
+    assert _idle(controller)
+    (await controller.acquire("p", "s2")).release()
+
+
+async def test_release_on_error_and_cancel_paths():
+    controller = _controller()
+
+    async def turn(fail):
+        ticket = await controller.acquire("p", "s")
+        try:
+            if fail:
+                raise RuntimeError("model failed")
+            await asyncio.sleep(3600)
+        finally:
+            ticket.release()
+
+    with pytest.raises(RuntimeError):
+        await turn(fail=True)
+    assert _idle(controller)
+
+    task = asyncio.create_task(turn(fail=False))
+    await asyncio.sleep(0)
+    assert controller.stats()["active"] == 1
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert _idle(controller)
+
+
+async def test_global_cap_rejects_without_a_queue():
+    controller = _controller(max_streams=1, max_waiting=0)
+    ticket = await controller.acquire("p1", "s1")
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        await controller.acquire("p2", "s2")
+
+    assert rejected.value.reason == "queue_full"
+    # The rejected turn doesn't keep its session reserved
+    assert controller.stats()["sessions"] == 1
+    ticket.release()
+    assert _idle(controller)
+
+
+async def test_per_persona_cap_only_limits_that_persona():
+    controller = _controller(max_streams=0, max_streams_per_persona=1)
+    first = await controller.acquire("p1", "s1")
+
+    other = await controller.acquire("p2", "s2")
+    with pytest.raises(AdmissionRejected) as rejected:
+        await controller.acquire("p1", "s3")
+
+    assert rejected.value.reason == "queue_full"
+    assert controller.stats()["per_persona"] == {"p1": 1, "p2": 1}
+    first.release()
+    other.release()
+    assert _idle(controller)
+
+
+async def test_one_turn_per_session():
+    controller = _controller(max_streams=0)
+    ticket = await controller.acquire("p", "s")
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        await controller.acquire("p", "s")
+
+    assert rejected.value.reason == "session_busy"
+    ticket.release()
+    (await controller.acquire("p", "s")).release()
+    assert _idle(controller)
+
+
+async def test_queued_turn_is_admitted_when_a_slot_frees():
+    controller = _controller(max_streams=1, max_waiting=1)
+    ticket = await controller.acquire("p", "s1")
+
+    waiter = asyncio.create_task(controller.acquire("p", "s2"))
+    await _queued(controller)
+    ticket.release()
+    queued_ticket = await asyncio.wait_for(waiter, 1)
+
+    assert queued_ticket.session_id == "s2"
+    assert controller.stats()["waiting"] == 0
+    queued_ticket.release()
+    assert _idle(controller)
+
+
+async def test_queue_timeout():
+    controller = _controller(max_streams=1, max_waiting=1, wait_timeout=0.05)
+    ticket = await controller.acquire("p", "s1")
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        await controller.acquire("p", "s2")
+
+    assert rejected.value.reason == "timeout"
+    assert rejected.value.retry_after == 0.05
+    assert controller.stats()["waiting"] == 0
+    assert controller.stats()["sessions"] == 1
+    ticket.release()
+    assert _idle(controller)
+
+
+async def test_cancelled_waiter_gives_back_its_place():
+    controller = _controller(max_streams=1, max_waiting=1)
+    ticket = await controller.acquire("p", "s1")
+
+    waiter = asyncio.create_task(controller.acquire("p", "s2"))
+    await _queued(controller)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    assert controller.stats()["waiting"] == 0
+    assert controller.stats()["sessions"] == 1
+    ticket.release()
+    assert _idle(controller)
+
+
+async def test_drain_rejects_new_and_queued_turns():
+    controller = _controller(max_streams=1, max_waiting=1)
+    ticket = await controller.acquire("p", "s1")
+    waiter = asyncio.create_task(controller.acquire("p", "s2"))
+    await _queued(controller)
+
+    drain = asyncio.create_task(controller.drain(timeout=1))
+    with pytest.raises(AdmissionRejected) as queued:
+        await waiter
+    with pytest.raises(AdmissionRejected) as new:
+        await controller.acquire("p", "s3")
+    ticket.release()
+    await asyncio.wait_for(drain, 1)
+
+    assert queued.value.reason == new.value.reason == "draining"
+    assert _idle(controller)
+
+
+async def test_drain_cancels_turns_still_running_after_the_timeout():
+    controller = _controller(max_streams=0)
+    cancelled = []
+
+    async def turn(session_id):
+        ticket = await controller.acquire("p", session_id)
+        try:
+            await asyncio.sleep(3600)
+        except asyncio.CancelledError:
+            cancelled.append(session_id)
+            raise
+        finally:
+            ticket.release()
+
+    tasks = [asyncio.create_task(turn(s)) for s in ("s1", "s2")]
+    await asyncio.sleep(0)
+
+    await asyncio.wait_for(controller.drain(timeout=0.05), 1)
+
+    assert sorted(cancelled) == ["s1", "s2"]
+    assert all(task.cancelled() for task in tasks)
+    assert _idle(controller)
+
+
+def test_shutdown_fits_in_the_compose_stop_grace_period():
+    compose = os.path.join(os.path.dirname(__file__), "..", "..", "docker-compose.yml")
+    with open(compose) as f:
+        grace = int(re.search(r"stop_grace_period: (\d+)s", f.read()).group(1))
+
+    # Drain, cancel grace, then partial replies and the write-behind queue,
+    # leaving a few seconds to close the pools
+    shutdown = (
+        settings.SHUTDOWN_DRAIN_TIMEOUT + CANCEL_GRACE + settings.SHUTDOWN_WRITE_TIMEOUT
+    )
+    assert shutdown <= grace - 5
+
+
+@pytest.mark.parametrize(
+    "reason, status_code",
+    [
+        ("session_busy", 409),
+        ("draining", 503),
+        ("queue_full", 429),
+        ("timeout", 429),
+    ],
+)
+def test_rejections_map_to_http_errors(reason, status_code):
+    error = _admission_error(AdmissionRejected(reason, "detail", 2.5))
+
+    assert error.status_code == status_code
+    if status_code != 409:
+        assert error.headers == {"Retry-After": "2"}
+
+
+@pytest.mark.parametrize(
+    "limit, workers, share", [(64, 1, 64), (64, 8, 8), (16, 3, 6), (0, 4, 0)]
+)
+def test_limits_are_split_between_workers(limit, workers, share):
+    assert per_worker(limit, workers) == share
+
+
+@pytest.mark.skipif(
+    not os.environ.get("TEST_DATABASE_URL"), reason="TEST_DATABASE_URL is not set"
+)
+async def test_one_turn_per_session_across_workers():
+    # Two controllers with their own lock pools, like two worker processes
+    first_locks = SessionLocks(settings.async_database_url)
+    second_locks = SessionLocks(settings.async_database_url)
+    first = _controller(max_streams=0, session_locks=first_locks)
+    second = _controller(max_streams=0, session_locks=second_locks)
+    session_id = str(uuid.uuid4())
+    try:
+        ticket = await first.acquire("p", session_id)
+
+        with pytest.raises(AdmissionRejected) as rejected:
+            await second.acquire("p", session_id)
+        assert rejected.value.reason == "session_busy"
+        assert _idle(second)
+        # Other sessions are not affected
+        (await second.acquire("p", str(uuid.uuid4()))).release()
+
+        ticket.release()
+        await first.drain(timeout=1)
+        (await second.acquire("p", session_id)).release()
+        await second.drain(timeout=1)
+        assert _idle(first) and _idle(second)
+    finally:
+        await first_locks.close()
+        await second_locks.close()
@@ -0,0 +1,39 @@
+import pytest
+
+from app.crud import persona as persona_crud
+from app.services.llm import context_cache
+from app.services.llm.context_cache import ContextCachePolicy
+
+
+@pytest.fixture(autouse=True)
+def empty():
+    context_cache._handles.clear()
+    context_cache._locks.clear()
+    yield
+    context_cache._handles.clear()
+    context_cache._locks.clear()
+
+
+async def test_invalidating_a_persona_drops_its_handles(make_persona):
+    persona, other = make_persona(llm_provider="fake"), make_persona(
+        llm_provider="fake"
+    )
+    policy = ContextCachePolicy(True)
+    for p in (persona, other):
+        assert await context_cache.get_handle(p, f"You are {p.id}", policy)
+
+    persona_crud.invalidate(persona.id)
+
+    assert [key[0] for key in context_cache._handles] == [str(other.id)]
+    assert [key[0] for key in context_cache._locks] == [str(other.id)]
+
+
+async def test_handles_and_locks_are_bounded(make_persona):
+    policy = ContextCachePolicy(True)
+    maxsize = context_cache._handles.maxsize
+    for _ in range(maxsize + 10):
+        persona = make_persona(llm_provider="fake")
+        await context_cache.get_handle(persona, f"You are {persona.id}", policy)
+
+    assert len(context_cache._handles) == maxsize
+    assert len(context_cache._locks) == maxsize
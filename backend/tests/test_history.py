@@ -0,0 +1,66 @@
+from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage
+
+from app.services.chat.history import HistoryMiddleware, HistoryPolicy, _cutoff
+
+
+def _conversation(turns: int, answered: bool = False):
+    """`turns` questions, all but the last one answered (unless `answered`)."""
+    messages = []
+    for turn in range(1, turns + 1):
+        messages.append(HumanMessage(f"question {turn}", id=f"h{turn}"))
+        if turn < turns or answered:
+            messages.append(AIMessage(f"answer {turn}", id=f"a{turn}"))
+    return messages
+
+
+def _questions(messages):
+    return [m.text for m in messages if isinstance(m, HumanMessage)]
+
+
+def test_within_limit_nothing_is_trimmed():
+    assert _cutoff(_conversation(2), HistoryPolicy(max_turns=2)) == 0
+
+
+def test_window_keeps_max_turns_including_the_current_one():
+    messages = _conversation(5)
+
+    cutoff = _cutoff(messages, HistoryPolicy(max_turns=2))
+
+    assert _questions(messages[cutoff:]) == ["question 4", "question 5"]
+
+
+def test_keep_turns_trims_further_for_hysteresis():
+    messages = _conversation(7)
+
+    cutoff = _cutoff(messages, HistoryPolicy(max_turns=6, keep_turns=3))
+
+    assert _questions(messages[cutoff:]) == ["question 5", "question 6", "question 7"]
+
+
+def test_keep_turns_above_the_limit_is_ignored():
+    messages = _conversation(4)
+
+    cutoff = _cutoff(messages, HistoryPolicy(max_turns=2, keep_turns=5))
+
+    assert _questions(messages[cutoff:]) == ["question 3", "question 4"]
+
+
+def test_summary_head_is_not_counted_as_a_turn():
+    summary = HumanMessage(
+        "Summary of the earlier conversation:\n...", id="history-summary"
+    )
+    messages = [summary, *_conversation(3)]
+
+    cutoff = _cutoff(messages, HistoryPolicy(max_turns=3))
+
+    assert cutoff == 0
+
+
+async def test_middleware_replaces_the_state_with_the_window():
+    middleware = HistoryMiddleware(HistoryPolicy(max_turns=2))
+
+    update = await middleware.abefore_model({"messages": _conversation(5)}, None)
+
+    remove_all, *kept = update["messages"]
+    assert isinstance(remove_all, RemoveMessage)
+    assert [m.id for m in kept] == ["h4", "a4", "h5"]
@@ -0,0 +1,62 @@
+import os
+import uuid
+
+import httpx
+import pytest
+
+from app.core.config import settings
+
+HEADERS = {"X-API-Key": settings.APP_AUTH_KEY}
+
+
+@pytest.fixture
+async def client():
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+        yield c
+
+
+async def test_skip_and_cursor_are_exclusive(client):
+    response = await client.get(
+        "/v1/personas/", params={"skip": 10, "cursor": "abc"}, headers=HEADERS
+    )
+
+    assert response.status_code == 400
+
+
+@pytest.mark.skipif(
+    not os.environ.get("TEST_DATABASE_URL"), reason="TEST_DATABASE_URL is not set"
+)
+async def test_deprecated_skip_pages_like_the_cursor(client):
+    from app.core.database import SessionLocal
+    from app.models import Persona
+
+    with SessionLocal() as db:
+        rows = [
+            Persona(username=f"page-{uuid.uuid4().hex[:12]}", public_name="Pages")
+            for _ in range(4)
+        ]
+        db.add_all(rows)
+        db.commit()
+    try:
+        params = {"limit": 2, "fields": "username"}
+        first = await client.get("/v1/personas/", params=params, headers=HEADERS)
+        second = await client.get(
+            "/v1/personas/",
+            params={**params, "cursor": first.headers["X-Next-Cursor"]},
+            headers=HEADERS,
+        )
+        skipped = await client.get(
+            "/v1/personas/", params={**params, "skip": 2}, headers=HEADERS
+        )
+
+        assert skipped.status_code == 200
+        assert skipped.json() == second.json()
+        assert skipped.headers["Deprecation"] == "true"
+        assert "Deprecation" not in second.headers
+    finally:
+        with SessionLocal() as db:
+            db.query(Persona).filter(Persona.id.in_([r.id for r in rows])).delete()
+            db.commit()
@@ -0,0 +1,158 @@
+"""
+SQL issued by the chat endpoints, counted on both engines.
+
+Needs a migrated-to-head Postgres with pgvector (e.g. the
+pgvector/pgvector image), given as TEST_DATABASE_URL; the database is
+migrated by the test. Only the LLM is stubbed: personas use the local fake
+provider, and the checkpointer and the message writer are real. Checkpoint
+I/O goes through its own psycopg pool and is not counted.
+"""
+
+import os
+import uuid
+from contextlib import contextmanager
+
+import httpx
+import pytest
+from sqlalchemy import event, text
+
+pytestmark = pytest.mark.skipif(
+    not os.environ.get("TEST_DATABASE_URL"), reason="TEST_DATABASE_URL is not set"
+)
+
+
+@pytest.fixture(scope="module")
+def migrated():
+    from alembic import command
+    from alembic.config import Config
+
+    command.upgrade(
+        Config(os.path.join(os.path.dirname(__file__), "..", "alembic.ini")), "head"
+    )
+
+
+@pytest.fixture
+def persona(migrated):
+    from app.core.database import SessionLocal
+    from app.crud import persona as persona_crud
+    from app.models import ChatMessage, Persona, Session as SessionModel
+
+    with SessionLocal() as db:
+        row = Persona(
+            username=f"count-{uuid.uuid4().hex[:12]}",
+            public_name="Statement counts",
+            llm_provider="fake",
+        )
+        db.add(row)
+        db.commit()
+    persona_crud.invalidate()
+    yield row
+    with SessionLocal() as db:
+        sessions = [
+            s.id for s in db.query(SessionModel.id).filter_by(persona_id=row.id)
+        ]
+        threads = [str(s) for s in sessions]
+        for table in ("checkpoints", "checkpoint_blobs", "checkpoint_writes"):
+            db.execute(
+                text(f"DELETE FROM {table} WHERE thread_id = ANY(:threads)"),
+                {"threads": threads},
+            )
+        db.query(ChatMessage).filter(ChatMessage.session_id.in_(sessions)).delete()
+        db.query(SessionModel).filter(SessionModel.persona_id == row.id).delete()
+        db.query(Persona).filter(Persona.id == row.id).delete()
+        db.commit()
+
+
+@pytest.fixture
+async def writer(monkeypatch):
+    from app.api.v1.endpoints import chat
+    from app.services.chat import agent
+    from app.services.chat.writer import MessageWriter
+
+    # A turn queues two messages, its question and the reply; a batch of two
+    # and a long flush interval make them one batch, as under load.
+    writer = MessageWriter(batch_size=2, flush_interval=5, max_queue=100)
+    monkeypatch.setattr(chat, "message_writer", writer)
+    monkeypatch.setattr(agent, "message_writer", writer)
+    writer.start()
+    yield writer
+    await writer.close()
+
+
+@pytest.fixture
+async def client(monkeypatch, writer):
+    from app.core.config import settings
+    from app.core.database import async_engine
+    from app.main import app
+    from app.memory.checkpointers import close_checkpointer, open_checkpointer
+
+    monkeypatch.setattr(settings, "FAKE_LLM_LATENCY_MS", 0)
+    monkeypatch.setattr(settings, "FAKE_LLM_TOKENS_PER_SECOND", 10_000)
+    await open_checkpointer()
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+            yield c
+    finally:
+        await close_checkpointer()
+        # Connections belong to this test's event loop
+        await async_engine.dispose()
+
+
+@contextmanager
+def statements():
+    from app.core.database import async_engine, engine
+
+    seen = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        seen.append(" ".join(statement.split()))
+
+    def commit(conn):
+        seen.append("COMMIT")
+
+    engines = (engine, async_engine.sync_engine)
+    for target in engines:
+        event.listen(target, "before_cursor_execute", record)
+        event.listen(target, "commit", commit)
+    try:
+        yield seen
+    finally:
+        for target in engines:
+            event.remove(target, "before_cursor_execute", record)
+            event.remove(target, "commit", commit)
+
+
+async def test_chat_init_issues_one_insert(client, persona):
+    # The first init also loads the persona into the cache
+    assert (await client.get(f"/v1/chat/init/{persona.id}")).status_code == 200
+
+    with statements() as seen:
+        response = await client.get(f"/v1/chat/init/{persona.id}")
+
+    assert response.status_code == 200
+    assert len(seen) == 2, seen
+    assert seen[0].startswith("INSERT INTO sessions")
+    assert seen[1] == "COMMIT"
+
+
+async def test_chat_turn_issues_one_select_and_one_batched_insert(
+    client, writer, persona
+):
+    session_id = (await client.get(f"/v1/chat/init/{persona.id}")).json()["session_id"]
+
+    with statements() as seen:
+        response = await client.post(
+            f"/v1/chat/stream/{session_id}", json={"input_message": "Hello"}
+        )
+        await writer.flush()
+
+    assert response.status_code == 201
+    assert "event: done" in response.text
+    # The joined session and persona lookup, then the question and the reply
+    # written together in one unit of work
+    assert len(seen) == 3, seen
+    assert seen[0].startswith("SELECT sessions.id")
+    assert "FROM sessions JOIN personas" in seen[0]
+    assert seen[1].startswith("INSERT INTO chat_messages")
+    assert seen[2] == "COMMIT"
@@ -0,0 +1,94 @@
+import asyncio
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from limits.storage import MemoryStorage
+from slowapi import _rate_limit_exceeded_handler
+from slowapi.errors import RateLimitExceeded
+
+from app.core.security import OffloopLimiter, get_real_ip
+
+
+class RecordingStorage(MemoryStorage):
+    """In-memory counters under a scheme the limiter treats as shared."""
+
+    STORAGE_SCHEME = ["recording"]
+    on_loop: list = []
+
+    def incr(self, key, expiry, amount=1):
+        try:
+            asyncio.get_running_loop()
+            self.on_loop.append(True)
+        except RuntimeError:
+            self.on_loop.append(False)
+        return super().incr(key, expiry, amount)
+
+
+class FailingStorage(MemoryStorage):
+    """A shared storage that is down."""
+
+    STORAGE_SCHEME = ["failing"]
+
+    @property
+    def base_exceptions(self):
+        return ConnectionError
+
+    def incr(self, key, expiry, amount=1):
+        raise ConnectionError("storage is down")
+
+
+def _client(storage_uri):
+    limiter = OffloopLimiter(key_func=get_real_ip, storage_uri=storage_uri)
+    app = FastAPI()
+    app.state.limiter = limiter
+    app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+
+    @app.get("/limited")
+    @limiter.limit("2/minute")
+    async def limited(request: Request):
+        return {"ok": True}
+
+    @app.get("/other")
+    @limiter.limit(["2/minute"])
+    async def other(request: Request):
+        return {"ok": True}
+
+    return TestClient(app)
+
+
+def test_shared_storage_is_checked_off_the_event_loop():
+    RecordingStorage.on_loop = []
+    client = _client("recording://")
+
+    responses = [client.get("/limited").status_code for _ in range(3)]
+
+    assert responses == [200, 200, 429]
+    assert RecordingStorage.on_loop == [False, False, False]
+
+
+def test_memory_storage_is_checked_inline():
+    client = _client("memory://")
+
+    responses = [client.get("/limited").status_code for _ in range(3)]
+
+    assert responses == [200, 200, 429]
+
+
+def test_shared_limits_are_per_endpoint_and_say_when_to_retry():
+    client = _client("recording://")
+
+    for _ in range(2):
+        client.get("/limited")
+    limited = client.get("/limited")
+
+    assert limited.status_code == 429
+    assert 1 <= int(limited.headers["Retry-After"]) <= 60
+    assert client.get("/other").status_code == 200
+
+
+def test_unavailable_storage_falls_back_to_memory():
+    client = _client("failing://")
+
+    responses = [client.get("/limited").status_code for _ in range(3)]
+
+    assert responses == [200, 200, 429]
@@ -0,0 +1,122 @@
+"""
+Usage rollups against Postgres: the run lock, the settle window and reads.
+
+Needs TEST_DATABASE_URL, like tests/test_query_counts.py. The rollups are
+rebuilt from the rows in the test database.
+"""
+
+import os
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+pytestmark = pytest.mark.skipif(
+    not os.environ.get("TEST_DATABASE_URL"), reason="TEST_DATABASE_URL is not set"
+)
+
+
+@pytest.fixture(scope="module")
+def migrated():
+    from alembic import command
+    from alembic.config import Config
+
+    command.upgrade(
+        Config(os.path.join(os.path.dirname(__file__), "..", "alembic.ini")), "head"
+    )
+
+
+@pytest.fixture
+def session(migrated):
+    from app.core.database import SessionLocal
+    from app.models import Persona, Session as SessionModel
+    from app.models.session import ChatMessage
+
+    with SessionLocal() as db:
+        persona = Persona(
+            username=f"rollup-{uuid.uuid4().hex[:12]}",
+            public_name="Rollups",
+            llm_provider="fake",
+        )
+        db.add(persona)
+        db.flush()
+        row = SessionModel(persona_id=persona.id)
+        db.add(row)
+        db.commit()
+        ids = (persona.id, row.id)
+    yield ids
+    with SessionLocal() as db:
+        db.query(ChatMessage).filter(ChatMessage.session_id == ids[1]).delete()
+        db.query(SessionModel).filter(SessionModel.id == ids[1]).delete()
+        db.query(Persona).filter(Persona.id == ids[0]).delete()
+        db.commit()
+
+
+def test_run_skips_while_another_process_holds_the_lock(migrated):
+    from app.core.database import engine
+    from app.jobs import rollups
+
+    with engine.connect() as other:
+        other.execute(text("SELECT pg_advisory_lock(:key)"), {"key": rollups.LOCK_KEY})
+        other.commit()
+        try:
+            assert rollups.run(100, 0) == {"skipped": True}
+        finally:
+            other.execute(
+                text("SELECT pg_advisory_unlock(:key)"), {"key": rollups.LOCK_KEY}
+            )
+            other.commit()
+
+    assert rollups.run(100, 0)["skipped"] is False
+
+
+def test_messages_settle_by_insert_time(session):
+    from app.core.database import SessionLocal
+    from app.jobs import rollups
+    from app.models.session import ChatMessage
+
+    rollups.run(100, 0, rebuild=True)
+    with SessionLocal() as db:
+        # Queued well before it was written, as under write-behind backlog
+        db.add(
+            ChatMessage(
+                session_id=session[1],
+                role="user",
+                content="hello",
+                timestamp=datetime.now() - timedelta(hours=1),
+            )
+        )
+        db.commit()
+
+    assert rollups.run(100, 600)["messages_read"] == 0
+    assert rollups.run(100, 0)["messages_read"] == 1
+
+
+async def test_usage_includes_the_hour_the_range_starts_in(session):
+    from app.core.database import AsyncSessionLocal, SessionLocal, async_engine
+    from app.crud import usage as usage_crud
+    from app.models.usage import PersonaUsageHourly
+
+    persona_id = session[0]
+    hour = datetime(2026, 3, 1, 10)
+    with SessionLocal() as db:
+        db.add(PersonaUsageHourly(persona_id=persona_id, hour=hour, user_messages=3))
+        db.commit()
+    try:
+        async with AsyncSessionLocal() as db:
+            usage = await usage_crud.aget_usage(
+                db,
+                hour + timedelta(minutes=30),
+                hour + timedelta(hours=2),
+                persona_id=persona_id,
+            )
+        await async_engine.dispose()
+    finally:
+        with SessionLocal() as db:
+            db.query(PersonaUsageHourly).filter(
+                PersonaUsageHourly.persona_id == persona_id
+            ).delete()
+            db.commit()
+
+    assert [(row["period"], row["user_messages"]) for row in usage] == [(hour, 3)]
@@ -0,0 +1,247 @@
+import math
+import os
+import uuid
+
+import pytest
+from sqlalchemy import text
+
+from app.services.chat import semantic_cache
+from app.services.chat.embeddings import HashEmbedder
+from app.services.chat.semantic_cache import SemanticCachePolicy
+
+
+def _cosine_distance(a, b):
+    return 1 - sum(x * y for x, y in zip(a, b))
+
+
+class InMemoryEntries:
+    """The lookup/store contract of app.crud.semantic_cache, without Postgres."""
+
+    def __init__(self):
+        self.entries = []
+
+    async def alookup(self, db, persona_id, persona_version, embedding, max_distance):
+        candidates = [
+            (_cosine_distance(entry["embedding"], embedding), entry["answer"])
+            for entry in self.entries
+            if entry["persona_id"] == persona_id
+            and entry["persona_version"] == persona_version
+        ]
+        candidates = [c for c in candidates if c[0] <= max_distance]
+        return min(candidates)[1] if candidates else None
+
+    async def astore(self, db, max_distance, **entry):
+        if await self.alookup(
+            db,
+            entry["persona_id"],
+            entry["persona_version"],
+            entry["embedding"],
+            max_distance,
+        ):
+            return False
+        self.entries.append(entry)
+        return True
+
+
+class NoSession:
+    async def __aenter__(self):
+        return None
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def entries(monkeypatch):
+    store = InMemoryEntries()
+    monkeypatch.setattr(semantic_cache, "semantic_cache_crud", store)
+    monkeypatch.setattr(semantic_cache, "AsyncSessionLocal", NoSession)
+    monkeypatch.setattr(semantic_cache, "get_embedder", HashEmbedder)
+    return store
+
+
+async def _remember(persona, question, answer, policy=SemanticCachePolicy(True)):
+    embedding = await HashEmbedder().aembed(question)
+    await semantic_cache.store(persona, question, embedding, answer, policy)
+
+
+async def test_hash_embedder_is_deterministic_and_normalized():
+    first = await HashEmbedder().aembed("What do you work on?")
+    second = await HashEmbedder().aembed("what do you   WORK on")
+
+    assert first == second
+    assert len(first) == HashEmbedder().dimensions
+    assert math.isclose(sum(value * value for value in first), 1.0)
+    assert first != await HashEmbedder().aembed("Where do you live?")
+
+
+async def test_hit_and_miss_around_the_threshold(entries, make_persona):
+    persona = make_persona()
+    stored = "What programming languages do you like to use at work"
+    rephrased = "Which programming languages do you like to use at work"
+    await _remember(persona, stored, "Python, mostly.")
+
+    similarity = 1 - _cosine_distance(
+        await HashEmbedder().aembed(stored), await HashEmbedder().aembed(rephrased)
+    )
+    assert 0 < similarity < 1
+
+    embedding, answer = await semantic_cache.lookup(
+        persona, rephrased, SemanticCachePolicy(True, threshold=similarity - 0.01)
+    )
+    assert answer == "Python, mostly."
+    assert embedding == await HashEmbedder().aembed(rephrased)
+
+    embedding, answer = await semantic_cache.lookup(
+        persona, rephrased, SemanticCachePolicy(True, threshold=similarity + 0.01)
+    )
+    assert answer is None
+    # A miss still returns the embedding, to store the generated answer
+    assert embedding is not None
+
+
+async def test_entries_are_isolated_per_persona(entries, make_persona):
+    persona, other = make_persona(), make_persona(username="other")
+    await _remember(persona, "Where are you based?", "Berlin.")
+
+    _, answer = await semantic_cache.lookup(
+        other, "Where are you based?", SemanticCachePolicy(True)
+    )
+
+    assert answer is None
+
+
+async def test_updating_a_persona_invalidates_its_entries(entries, make_persona):
+    persona = make_persona()
+    await _remember(persona, "Where are you based?", "Berlin.")
+    policy = SemanticCachePolicy(True)
+
+    _, before = await semantic_cache.lookup(persona, "Where are you based?", policy)
+    updated = persona.model_copy(
+        update={"updated_at": persona.updated_at.replace(year=2027)}
+    )
+    _, after = await semantic_cache.lookup(updated, "Where are you based?", policy)
+
+    assert before == "Berlin."
+    assert after is None
+
+
+async def test_near_duplicates_are_not_stored_again(entries, make_persona):
+    persona = make_persona()
+    await _remember(persona, "Where are you based?", "Berlin.")
+    await _remember(persona, "where are you based", "Berlin, Germany.")
+    await _remember(persona, "What do you work on?", "Search.")
+
+    assert [entry["answer"] for entry in entries.entries] == ["Berlin.", "Search."]
+
+
+def test_policy_reads_custom_settings(make_persona):
+    persona = make_persona(
+        custom_settings={"semantic_cache": {"enabled": True, "threshold": 0.8}}
+    )
+
+    assert SemanticCachePolicy.from_persona(persona) == SemanticCachePolicy(True, 0.8)
+    assert not SemanticCachePolicy.from_persona(make_persona()).enabled
+
+
+needs_db = pytest.mark.skipif(
+    not os.environ.get("TEST_DATABASE_URL"), reason="TEST_DATABASE_URL is not set"
+)
+
+
+@pytest.fixture
+async def personas():
+    from alembic import command
+    from alembic.config import Config
+
+    from app.core.database import SessionLocal, async_engine
+    from app.models import Persona
+
+    command.upgrade(
+        Config(os.path.join(os.path.dirname(__file__), "..", "alembic.ini")), "head"
+    )
+    with SessionLocal() as db:
+        rows = [
+            Persona(
+                username=f"cache-{uuid.uuid4().hex[:12]}",
+                public_name="Cache",
+                llm_provider="fake",
+            )
+            for _ in range(3)
+        ]
+        db.add_all(rows)
+        db.commit()
+        ids = [(row.id, row.updated_at) for row in rows]
+    yield ids
+    # Pooled connections belong to this test's event loop
+    await async_engine.dispose()
+    with SessionLocal() as db:
+        db.execute(
+            text("DELETE FROM semantic_cache_entries WHERE persona_id = ANY(:ids)"),
+            {"ids": [persona_id for persona_id, _ in ids]},
+        )
+        db.execute(
+            text("DELETE FROM personas WHERE id = ANY(:ids)"),
+            {"ids": [persona_id for persona_id, _ in ids]},
+        )
+        db.commit()
+
+
+@needs_db
+async def test_lookup_finds_entries_crowded_out_by_other_personas(personas):
+    from app.core.database import AsyncSessionLocal
+    from app.crud import semantic_cache as crud
+
+    (persona_id, version), *others = personas
+    question = await HashEmbedder().aembed("Where are you based?")
+    async with AsyncSessionLocal() as db:
+        # Other personas hold many closer entries than this persona's own
+        for other_id, other_version in others:
+            for i in range(100):
+                await crud.astore(
+                    db,
+                    other_id,
+                    other_version,
+                    f"q{i}",
+                    "elsewhere",
+                    question,
+                    max_distance=-1,
+                )
+        await crud.astore(
+            db,
+            persona_id,
+            version,
+            "Where are you based, roughly?",
+            "Berlin.",
+            await HashEmbedder().aembed("Where are you based, roughly?"),
+            0,
+        )
+
+        answer = await crud.alookup(db, persona_id, version, question, 0.5)
+
+    assert answer == "Berlin."
+
+
+@needs_db
+async def test_store_skips_near_duplicates_and_trim_caps_entries(personas):
+    from app.core.database import AsyncSessionLocal, SessionLocal
+    from app.crud import semantic_cache as crud
+
+    persona_id, version = personas[0]
+    async with AsyncSessionLocal() as db:
+        first = await HashEmbedder().aembed("Where are you based?")
+        assert await crud.astore(db, persona_id, version, "a", "Berlin.", first, 0.1)
+        assert not await crud.astore(db, persona_id, version, "b", "B.", first, 0.1)
+        for i in range(3):
+            embedding = await HashEmbedder().aembed(f"question number {i}")
+            assert await crud.astore(db, persona_id, version, "c", "C.", embedding, 0)
+        assert await crud.alookup(db, persona_id, version, first, 0.1) == "Berlin."
+
+    with SessionLocal() as db:
+        assert crud.trim(db, 2) == 2
+        remaining = db.execute(
+            text("SELECT answer FROM semantic_cache_entries WHERE persona_id = :id"),
+            {"id": persona_id},
+        ).scalars()
+        # The entry that was hit is kept first
+        assert "Berlin." in list(remaining)
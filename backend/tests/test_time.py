@@ -0,0 +1,16 @@
+from datetime import datetime, timedelta, timezone
+
+from app.core.time import naive_local
+
+
+def test_naive_values_are_kept():
+    value = datetime(2026, 1, 1, 12)
+    assert naive_local(value) is value
+    assert naive_local(None) is None
+
+
+def test_aware_values_become_naive_local_time():
+    value = datetime(2026, 1, 1, 12, tzinfo=timezone(timedelta(hours=5)))
+    local = naive_local(value)
+    assert local.tzinfo is None
+    assert local.astimezone() == value
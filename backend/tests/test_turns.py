@@ -0,0 +1,214 @@
+import asyncio
+import os
+import uuid
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from sqlalchemy import text
+
+from app.services.chat.admission import AdmissionController
+from app.services.chat.turns import FramesExpired, TurnRegistry
+
+
+def _controller():
+    return AdmissionController(
+        max_streams=0, max_streams_per_persona=0, max_waiting=0, wait_timeout=1
+    )
+
+
+def _source(count, gate=None):
+    async def frames():
+        for i in range(1, count + 1):
+            if gate is not None and i == count:
+                await gate.wait()
+            yield f"frame {i}"
+
+    return frames
+
+
+async def _collect(turn, after=0):
+    return [frame async for frame in turn.frames(after)]
+
+
+async def test_resume_after_an_event_id_gets_only_the_rest():
+    registry = TurnRegistry(max_frames=10, retention=60)
+    ticket = await _controller().acquire("p", "s")
+
+    turn = registry.start("s", None, _source(4), ticket)
+    await turn.task
+
+    assert await _collect(turn) == ["frame 1", "frame 2", "frame 3", "frame 4"]
+    assert await _collect(turn, after=2) == ["frame 3", "frame 4"]
+    assert await _collect(turn, after=4) == []
+
+
+async def test_attached_reader_receives_frames_as_they_arrive():
+    registry = TurnRegistry(max_frames=10, retention=60)
+    controller = _controller()
+    gate = asyncio.Event()
+
+    turn = registry.start(
+        "s", None, _source(3, gate), await controller.acquire("p", "s")
+    )
+    reader = asyncio.create_task(_collect(turn, after=1))
+    await asyncio.sleep(0.01)
+    assert not reader.done()
+    gate.set()
+
+    assert await asyncio.wait_for(reader, 1) == ["frame 2", "frame 3"]
+    # The turn released its admission slot when it finished
+    assert controller.stats()["active"] == 0
+
+
+async def test_frames_expired_once_the_buffer_rolled_over():
+    registry = TurnRegistry(max_frames=3, retention=60)
+    ticket = await _controller().acquire("p", "s")
+
+    turn = registry.start("s", None, _source(5), ticket)
+    await turn.task
+
+    # Frames 1 and 2 were dropped; resuming after 2 still works
+    assert turn.can_resume(2)
+    assert await _collect(turn, after=2) == ["frame 3", "frame 4", "frame 5"]
+    assert not turn.can_resume(1)
+    with pytest.raises(FramesExpired):
+        await _collect(turn, after=1)
+
+
+async def test_idempotency_keys_are_scoped_to_their_session():
+    registry = TurnRegistry(max_frames=10, retention=60)
+    ticket = await _controller().acquire("p", "s1")
+
+    turn = registry.start("s1", "key", _source(1), ticket)
+    await turn.task
+
+    assert registry.find("s1", "key") is turn
+    assert registry.find("s2", "key") is None
+
+
+async def test_finished_turns_expire_after_the_retention():
+    registry = TurnRegistry(max_frames=10, retention=0)
+    ticket = await _controller().acquire("p", "s")
+
+    turn = registry.start("s", "key", _source(1), ticket)
+    await turn.task
+    await asyncio.sleep(0.001)
+
+    assert registry.get("s") is None
+    assert registry.find("s", "key") is None
+
+
+SESSION_ID = "00000000-0000-0000-0000-000000000001"
+
+
+async def _replay(monkeypatch, row, local=True):
+    """
+    POST with an Idempotency-Key whose turn has already finished, in this
+    worker or (`local=False`) in another one.
+    """
+    from app.api.v1.endpoints import chat
+    from app.core.database import get_async_db
+    from app.main import app
+
+    monkeypatch.setattr(chat, "turns", TurnRegistry(max_frames=10, retention=60))
+    if local:
+        ticket = await _controller().acquire("p", SESSION_ID)
+        await chat.turns.start(SESSION_ID, "key", _source(1), ticket).task
+
+    async def session_with_persona(db, session_id):
+        return row
+
+    async def no_db():
+        yield None
+
+    monkeypatch.setattr(
+        chat.session_crud, "aget_session_with_persona", session_with_persona
+    )
+    monkeypatch.setitem(app.dependency_overrides, get_async_db, no_db)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+        return await c.post(
+            f"/v1/chat/stream/{SESSION_ID}",
+            json={"input_message": "Hello"},
+            headers={"Idempotency-Key": "key"},
+        )
+
+
+async def test_replayed_key_attaches_to_the_sessions_turn(monkeypatch):
+    session = SimpleNamespace(id=uuid.UUID(SESSION_ID))
+
+    response = await _replay(monkeypatch, (session, None))
+
+    assert response.status_code == 201
+    assert response.text == "frame 1"
+
+
+async def test_replayed_key_for_an_unknown_session_is_not_attached(monkeypatch):
+    response = await _replay(monkeypatch, None)
+
+    assert response.status_code == 404
+
+
+async def test_key_claimed_by_another_worker_is_not_generated_again(monkeypatch):
+    from app.api.v1.endpoints import chat
+
+    session = SimpleNamespace(id=uuid.UUID(SESSION_ID))
+    persona = SimpleNamespace(id=uuid.uuid4())
+    saved = []
+
+    async def claim(db, session_id, key):
+        return False
+
+    async def save(*args, **kwargs):
+        saved.append(args)
+
+    monkeypatch.setattr(chat.session_crud, "aclaim_turn_key", claim)
+    monkeypatch.setattr(chat.persona_crud, "cache_snapshot", lambda row: row)
+    monkeypatch.setattr(chat.message_writer, "save", save)
+
+    response = await _replay(monkeypatch, (session, persona), local=False)
+
+    assert response.status_code == 409
+    assert saved == []
+    assert chat.turns.get(SESSION_ID) is None
+    assert chat.admission.stats()["active"] == 0
+
+
+@pytest.mark.skipif(
+    not os.environ.get("TEST_DATABASE_URL"), reason="TEST_DATABASE_URL is not set"
+)
+async def test_turn_keys_are_claimed_once():
+    from app.core.database import AsyncSessionLocal, async_engine
+    from app.crud import session as session_crud
+    from app.models import Persona, Session as SessionModel
+
+    try:
+        async with AsyncSessionLocal() as db:
+            persona = Persona(
+                username=f"keys-{uuid.uuid4().hex[:12]}",
+                public_name="Turn keys",
+                llm_provider="fake",
+            )
+            db.add(persona)
+            await db.flush()
+            session = await session_crud.acreate_session(db, persona_id=persona.id)
+
+            assert await session_crud.aclaim_turn_key(db, session.id, "key")
+            assert not await session_crud.aclaim_turn_key(db, session.id, "key")
+            assert await session_crud.aclaim_turn_key(db, session.id, "other")
+
+            await session_crud.arelease_turn_key(db, session.id, "key")
+            assert await session_crud.aclaim_turn_key(db, session.id, "key")
+
+            for statement in (
+                "DELETE FROM chat_turn_keys WHERE session_id = :session",
+                "DELETE FROM sessions WHERE id = :session",
+                "DELETE FROM personas WHERE id = :persona",
+            ):
+                await db.execute(
+                    text(statement), {"session": session.id, "persona": persona.id}
+                )
+            await db.commit()
+    finally:
+        await async_engine.dispose()
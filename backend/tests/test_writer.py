@@ -0,0 +1,132 @@
+import asyncio
+import uuid
+
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from app.services.chat import writer as writer_module
+from app.services.chat.writer import DROPPED, MessageWriter
+
+
+class FakeSession:
+    """Stands in for AsyncSessionLocal(); rows with content "bad" violate a constraint."""
+
+    def __init__(self, db):
+        self.db = db
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement, rows):
+        self.db.attempts += 1
+        if self.db.transient_failures:
+            self.db.transient_failures -= 1
+            raise OperationalError("INSERT", {}, Exception("connection reset"))
+        if any(row["content"] == "bad" for row in rows):
+            raise IntegrityError("INSERT", {}, Exception("constraint"))
+        self.pending = rows
+
+    async def commit(self):
+        self.db.rows.extend(self.pending)
+
+
+class FakeDatabase:
+    def __init__(self, transient_failures=0):
+        self.rows = []
+        self.attempts = 0
+        self.transient_failures = transient_failures
+
+    def __call__(self):
+        return FakeSession(self)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    database = FakeDatabase()
+    monkeypatch.setattr(writer_module, "AsyncSessionLocal", database)
+
+    async def no_sleep(_):
+        pass
+
+    monkeypatch.setattr(writer_module.asyncio, "sleep", no_sleep)
+    return database
+
+
+def _dropped(reason):
+    return sum(
+        sample["value"]
+        for sample in DROPPED.samples()
+        if sample["labels"] == {"reason": reason}
+    )
+
+
+def _pending(content):
+    row = {"session_id": uuid.uuid4(), "role": "user", "content": content}
+    return row, asyncio.get_running_loop().create_future()
+
+
+async def test_batch_is_written_with_one_insert(db):
+    writer = MessageWriter(batch_size=10, flush_interval=0.01, max_queue=10)
+    batch = [_pending("a"), _pending("b")]
+
+    await writer._write(batch)
+
+    assert [row["content"] for row in db.rows] == ["a", "b"]
+    assert db.attempts == 1
+    assert all(done.result() is None for _, done in batch)
+
+
+async def test_rejected_row_only_drops_itself(db):
+    writer = MessageWriter(batch_size=10, flush_interval=0.01, max_queue=10)
+    batch = [_pending("a"), _pending("bad"), _pending("c")]
+    dropped = _dropped("rejected")
+
+    await writer._write(batch)
+
+    assert [row["content"] for row in db.rows] == ["a", "c"]
+    # The batch insert, then one per row; constraint errors aren't retried
+    assert db.attempts == 4
+    assert isinstance(batch[1][1].exception(), IntegrityError)
+    assert batch[0][1].result() is None and batch[2][1].result() is None
+    assert _dropped("rejected") == dropped + 1
+
+
+async def test_transient_errors_are_retried(db):
+    db.transient_failures = 2
+    writer = MessageWriter(batch_size=10, flush_interval=0.01, max_queue=10)
+    batch = [_pending("a"), _pending("b")]
+
+    await writer._write(batch)
+
+    assert [row["content"] for row in db.rows] == ["a", "b"]
+    assert db.attempts == 3
+
+
+async def test_batch_dropped_when_database_stays_unavailable(db):
+    db.transient_failures = 100
+    writer = MessageWriter(batch_size=10, flush_interval=0.01, max_queue=10)
+    batch = [_pending("a"), _pending("b")]
+    dropped = _dropped("transient")
+
+    await writer._write(batch)
+
+    assert db.rows == []
+    assert db.attempts == writer_module._WRITE_ATTEMPTS
+    assert _dropped("transient") == dropped + 2
+    assert all(isinstance(done.exception(), OperationalError) for _, done in batch)
+
+
+async def test_close_drops_what_is_still_queued_after_the_timeout(db):
+    writer = MessageWriter(batch_size=10, flush_interval=3600, max_queue=10)
+    writer.start()
+    dropped = _dropped("shutdown")
+    await writer.save(uuid.uuid4(), "user", "a")
+    await writer.save(uuid.uuid4(), "user", "b")
+
+    await asyncio.wait_for(writer.close(timeout=0.05), 1)
+
+    assert _dropped("shutdown") - dropped == 2
+    assert db.rows == []
@@ -42,48 +42,145 @@ export async function initChatSession(personaId: string): Promise<string | null>
     }
 }
 
+interface ServerSentEvent {
+    id?: string;
+    event: string;
+    data: any;
+}
+
+// Parse one SSE frame; comment-only frames (keepalives) return null.
+function parseServerSentEvent(frame: string): ServerSentEvent | null {
+    let id: string | undefined;
+    let event = 'message';
+    const data: string[] = [];
+
+    for (const line of frame.split('\n')) {
+        if (line.startsWith(':')) continue;
+        const separator = line.indexOf(':');
+        const field = separator === -1 ? line : line.slice(0, separator);
+        const value = separator === -1 ? '' : line.slice(separator + 1).replace(/^ /, '');
+
+        if (field === 'id') id = value;
+        else if (field === 'event') event = value;
+        else if (field === 'data') data.push(value);
+    }
+
+    if (data.length === 0) return null;
+    return { id, event, data: JSON.parse(data.join('\n')) };
+}
+
+// Read Server-Sent Events from a streaming response body.
+async function* readServerSentEvents(response: Response): AsyncGenerator<ServerSentEvent> {
+    const reader = response.body?.getReader();
+    if (!reader) {
+        throw new Error('Failed to get response reader');
+    }
+
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) return;
+
+        buffer += decoder.decode(value, { stream: true });
+
+        // Server-Sent Events are separated by a blank line.
+        let boundary = buffer.indexOf('\n\n');
+        while (boundary !== -1) {
+            const event = parseServerSentEvent(buffer.slice(0, boundary));
+            buffer = buffer.slice(boundary + 2);
+            boundary = buffer.indexOf('\n\n');
+            if (event) yield event;
+        }
+    }
+}
+
+function newIdempotencyKey(): string {
+    if (typeof crypto !== 'undefined' && 'randomUUID' in crypto) {
+        return crypto.randomUUID();
+    }
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+}
+
+const MAX_RECONNECTS = 3;
+
 // Stream chat response
+//
+// The reply is generated server-side independently of this connection. If
+// the connection drops, re-attach and continue after the last event seen:
+// before any event arrived the POST is repeated with the same
+// Idempotency-Key (so it joins the turn if it was started), afterwards the
+// stream is resumed with Last-Event-ID.
 export async function* streamChatResponse(
     sessionId: string,
     message: string
 ): AsyncGenerator<string> {
-    try {
-        const requestBody: ChatInvokeRequest = {
-            input_message: message,
-        };
+    const requestBody: ChatInvokeRequest = {
+        input_message: message,
+    };
+    const idempotencyKey = newIdempotencyKey();
+    let lastEventId: string | undefined;
+    let reconnects = 0;
 
-        const response = await fetch(`${API_URL}/v1/chat/stream/${sessionId}`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
+    while (true) {
+        let response: Response;
+        try {
+            const headers: Record<string, string> = {
                 'X-API-Key': APP_AUTH_KEY,
-            },
-            body: JSON.stringify(requestBody),
-        });
+            };
+            if (lastEventId) headers['Last-Event-ID'] = lastEventId;
+
+            response = lastEventId
+                ? await fetch(`${API_URL}/v1/chat/stream/${sessionId}`, { headers })
+                : await fetch(`${API_URL}/v1/chat/stream/${sessionId}`, {
+                      method: 'POST',
+                      headers: {
+                          ...headers,
+                          'Content-Type': 'application/json',
+                          'Idempotency-Key': idempotencyKey,
+                      },
+                      body: JSON.stringify(requestBody),
+                  });
+        } catch (error) {
+            if (reconnects++ < MAX_RECONNECTS) {
+                await new Promise(resolve => setTimeout(resolve, 500 * reconnects));
+                continue;
+            }
+            console.error('Error streaming chat response:', error);
+            throw error;
+        }
 
         if (!response.ok) {
-            if (response.status === 404) {
+            if (response.status === 404 && !lastEventId) {
                 throw new Error('SESSION_NOT_FOUND');
             }
             throw new Error(`HTTP error! status: ${response.status}`);
         }
 
-        const reader = response.body?.getReader();
-        if (!reader) {
-            throw new Error('Failed to get response reader');
+        try {
+            for await (const event of readServerSentEvents(response)) {
+                if (event.id) lastEventId = event.id;
+                if (event.event === 'token') {
+                    yield event.data.text;
+                } else if (event.event === 'error') {
+                    throw new Error(event.data.message);
+                } else if (event.event === 'done') {
+                    return;
+                }
+            }
+        } catch (error) {
+            // Network errors surface as TypeError; an error event is final.
+            if (!(error instanceof TypeError)) {
+                console.error('Error streaming chat response:', error);
+                throw error;
+            }
         }
 
-        const decoder = new TextDecoder();
-
-        while (true) {
-            const { done, value } = await reader.read();
-            if (done) break;
-
-            const chunk = decoder.decode(value, { stream: true });
-            yield chunk;
+        // The stream broke off or ended without a done event: re-attach.
+        if (reconnects++ >= MAX_RECONNECTS) {
+            throw new Error('Lost the connection to the reply');
         }
-    } catch (error) {
-        console.error('Error streaming chat response:', error);
-        throw error;
+        await new Promise(resolve => setTimeout(resolve, 500 * reconnects));
     }
 }